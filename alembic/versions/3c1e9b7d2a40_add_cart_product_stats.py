@@ -0,0 +1,121 @@
+"""Add cart_product_stats maintained by statement-level triggers
+
+Revision ID: 3c1e9b7d2a40
+Revises: 8fa287323a6e
+Create Date: 2026-10-19 12:05:47.201934
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c1e9b7d2a40"
+down_revision: Union[str, Sequence[str], None] = "8fa287323a6e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Триггеры уровня оператора с transition tables: один массовый UPDATE/DELETE
+# (очистка корзины, webhook'и, консьюмер) даёт одно агрегированное изменение
+# на товар, а не строку на каждую позицию. Строки счётчиков обновляются в
+# порядке product_id, чтобы параллельные транзакции не взаимоблокировались.
+_APPLY_DELTAS = """
+    INSERT INTO cart_product_stats AS s
+        (product_id, carts_count, total_quantity, selected_quantity, updated_at)
+    SELECT product_id, sum(carts), sum(quantity), sum(selected), now()
+    FROM ({changes}) AS changes
+    GROUP BY product_id
+    HAVING sum(carts) <> 0 OR sum(quantity) <> 0 OR sum(selected) <> 0
+    ORDER BY product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        carts_count = s.carts_count + EXCLUDED.carts_count,
+        total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+        selected_quantity = s.selected_quantity + EXCLUDED.selected_quantity,
+        updated_at = EXCLUDED.updated_at;
+"""
+
+_ROW_CHANGES = """
+    SELECT product_id, {sign} AS carts, {sign} * quantity AS quantity,
+           CASE WHEN is_selected THEN {sign} * quantity ELSE 0 END AS selected
+    FROM {table}
+"""
+
+_INSERTED = _ROW_CHANGES.format(sign=1, table="new_rows")
+_DELETED = _ROW_CHANGES.format(sign=-1, table="old_rows")
+
+# UPDATE: новая версия строки со знаком +, старая со знаком −; изменения
+# только цен и флагов взаимно сокращаются и отбрасываются HAVING
+_FUNCTION = f"""
+CREATE FUNCTION cart_product_stats_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_APPLY_DELTAS.format(changes=_INSERTED)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_APPLY_DELTAS.format(changes=_DELETED)}
+    ELSE
+        {_APPLY_DELTAS.format(changes=_INSERTED + " UNION ALL " + _DELETED)}
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        op.f("ix_cart_items_product_id"), "cart_items", ["product_id"], unique=False
+    )
+    op.create_table(
+        "cart_product_stats",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("carts_count", sa.Integer(), nullable=False),
+        sa.Column("total_quantity", sa.BigInteger(), nullable=False),
+        sa.Column("selected_quantity", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("product_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO cart_product_stats
+            (product_id, carts_count, total_quantity, selected_quantity)
+        SELECT product_id, count(*), sum(quantity),
+               coalesce(sum(quantity) FILTER (WHERE is_selected), 0)
+        FROM cart_items
+        GROUP BY product_id
+        """
+    )
+
+    op.execute(_FUNCTION)
+    for operation, referencing in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        op.execute(
+            f"""
+            CREATE TRIGGER cart_product_stats_{operation.lower()}
+            AFTER {operation} ON cart_items
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION cart_product_stats_apply()
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for operation in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER cart_product_stats_{operation} ON cart_items")
+    op.execute("DROP FUNCTION cart_product_stats_apply()")
+    op.drop_table("cart_product_stats")
+    op.drop_index(op.f("ix_cart_items_product_id"), table_name="cart_items")
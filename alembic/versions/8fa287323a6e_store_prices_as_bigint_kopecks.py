@@ -0,0 +1,59 @@
+"""Store product_price and current_price as BIGINT kopecks
+
+Revision ID: 8fa287323a6e
+Revises: 555df7455e61
+Create Date: 2026-10-19 10:12:31.418204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8fa287323a6e"
+down_revision: Union[str, Sequence[str], None] = "555df7455e61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Значения уже хранятся в копейках (Product Service присылает цены в копейках),
+    # дробная часть всегда нулевая — меняется только тип колонки.
+    op.alter_column(
+        "cart_items",
+        "product_price",
+        existing_type=sa.Numeric(precision=10, scale=2),
+        type_=sa.BigInteger(),
+        existing_nullable=False,
+        postgresql_using="product_price::bigint",
+    )
+    op.alter_column(
+        "cart_items",
+        "current_price",
+        existing_type=sa.Numeric(precision=10, scale=2),
+        type_=sa.BigInteger(),
+        existing_nullable=True,
+        postgresql_using="current_price::bigint",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        "cart_items",
+        "current_price",
+        existing_type=sa.BigInteger(),
+        type_=sa.Numeric(precision=10, scale=2),
+        existing_nullable=True,
+    )
+    op.alter_column(
+        "cart_items",
+        "product_price",
+        existing_type=sa.BigInteger(),
+        type_=sa.Numeric(precision=10, scale=2),
+        existing_nullable=False,
+    )
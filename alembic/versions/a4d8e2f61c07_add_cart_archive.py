@@ -0,0 +1,123 @@
+"""Cold cart archive: cart_activity, cart_archive, cart_archive_changes
+
+Revision ID: a4d8e2f61c07
+Revises: e5a9c3f18b62
+Create Date: 2026-10-19 18:12:40.318264
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d8e2f61c07"
+down_revision: Union[str, Sequence[str], None] = "e5a9c3f18b62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "cart_activity",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("last_seen_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index(
+        op.f("ix_cart_activity_last_seen_at"),
+        "cart_activity",
+        ["last_seen_at"],
+        unique=False,
+    )
+    # Отметок чтения корзин до этой миграции нет — считаем активностью
+    # последнее изменение корзины
+    op.execute(
+        """
+        INSERT INTO cart_activity (user_id, last_seen_at)
+        SELECT user_id, max(updated_at)
+        FROM cart_items
+        GROUP BY user_id
+        """
+    )
+
+    op.create_table(
+        "cart_archive",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("items", postgresql.JSONB(), nullable=False),
+        sa.Column("product_ids", postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column("change_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index(
+        "ix_cart_archive_product_ids",
+        "cart_archive",
+        ["product_ids"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+    op.create_table(
+        "cart_archive_changes",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("fields", postgresql.JSONB(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_cart_archive_changes_product_id",
+        "cart_archive_changes",
+        ["product_id", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Архивные корзины возвращаются в cart_items как есть: изменения из
+    # журнала к ним не применяются
+    op.execute(
+        """
+        INSERT INTO cart_items (
+            id, user_id, product_id, quantity, product_name, product_price,
+            product_image, price_changed, current_price, out_of_stock,
+            is_selected, product_deleted, version, created_at, updated_at
+        )
+        SELECT
+            (item ->> 'id')::uuid, a.user_id, (item ->> 'product_id')::integer,
+            (item ->> 'quantity')::integer, item ->> 'product_name',
+            (item ->> 'product_price')::bigint, item ->> 'product_image',
+            (item ->> 'price_changed')::boolean,
+            (item ->> 'current_price')::bigint,
+            (item ->> 'out_of_stock')::boolean, (item ->> 'is_selected')::boolean,
+            (item ->> 'product_deleted')::boolean, (item ->> 'version')::integer,
+            (item ->> 'created_at')::timestamptz,
+            (item ->> 'updated_at')::timestamptz
+        FROM cart_archive AS a, jsonb_array_elements(a.items) AS item
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.drop_index(
+        "ix_cart_archive_changes_product_id", table_name="cart_archive_changes"
+    )
+    op.drop_table("cart_archive_changes")
+    op.drop_index("ix_cart_archive_product_ids", table_name="cart_archive")
+    op.drop_table("cart_archive")
+    op.drop_index(op.f("ix_cart_activity_last_seen_at"), table_name="cart_activity")
+    op.drop_table("cart_activity")
@@ -0,0 +1,75 @@
+"""Unique cart item per (user_id, product_id) and cart_import_progress
+
+Revision ID: b7f41d9e6c25
+Revises: 3c1e9b7d2a40
+Create Date: 2026-10-19 14:31:09.552817
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7f41d9e6c25"
+down_revision: Union[str, Sequence[str], None] = "3c1e9b7d2a40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубликаты (параллельные add_item) сливаются в самую раннюю позицию
+    # с суммарным количеством, остальные удаляются
+    op.execute(
+        """
+        WITH ranked AS (
+            SELECT
+                id,
+                row_number() OVER (
+                    PARTITION BY user_id, product_id ORDER BY created_at, id
+                ) AS position,
+                sum(quantity) OVER (PARTITION BY user_id, product_id) AS total
+            FROM cart_items
+        ),
+        merged AS (
+            UPDATE cart_items
+            SET quantity = ranked.total
+            FROM ranked
+            WHERE cart_items.id = ranked.id
+              AND ranked.position = 1
+              AND cart_items.quantity <> ranked.total
+        )
+        DELETE FROM cart_items
+        USING ranked
+        WHERE cart_items.id = ranked.id AND ranked.position > 1
+        """
+    )
+    op.create_unique_constraint(
+        "uq_cart_items_user_product", "cart_items", ["user_id", "product_id"]
+    )
+
+    op.create_table(
+        "cart_import_progress",
+        sa.Column("job_id", sa.String(length=255), nullable=False),
+        sa.Column("rows_processed", sa.BigInteger(), nullable=False),
+        sa.Column("inserted", sa.BigInteger(), nullable=False),
+        sa.Column("updated", sa.BigInteger(), nullable=False),
+        sa.Column("skipped", sa.BigInteger(), nullable=False),
+        sa.Column("completed", sa.Boolean(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cart_import_progress")
+    op.drop_constraint("uq_cart_items_user_product", "cart_items", type_="unique")
@@ -0,0 +1,50 @@
+"""Document cart storage: cart_documents and cart_document_products
+
+Revision ID: c2b6f9a3d715
+Revises: a4d8e2f61c07
+Create Date: 2026-10-19 20:37:15.604128
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c2b6f9a3d715"
+down_revision: Union[str, Sequence[str], None] = "a4d8e2f61c07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "cart_documents",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("items", postgresql.JSONB(), nullable=False),
+        sa.Column("total_price", sa.BigInteger(), nullable=False),
+        sa.Column("total_items", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "cart_document_products",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.PrimaryKeyConstraint("product_id", "user_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cart_document_products")
+    op.drop_table("cart_documents")
@@ -0,0 +1,121 @@
+"""Let archive moves bypass cart_product_stats triggers
+
+Revision ID: d91f5b3e7a28
+Revises: f3c8d1a59e27
+Create Date: 2026-10-20 10:14:31.582907
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d91f5b3e7a28"
+down_revision: Union[str, Sequence[str], None] = "f3c8d1a59e27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Тела функции совпадают с 3c1e9b7d2a40; новая версия пропускает операторы,
+# выполненные с cart.product_stats_skip = 'on' (перенос корзин в архив:
+# архивные позиции продолжают учитываться в счётчиках)
+_APPLY_DELTAS = """
+    INSERT INTO cart_product_stats AS s
+        (product_id, carts_count, total_quantity, selected_quantity, updated_at)
+    SELECT product_id, sum(carts), sum(quantity), sum(selected), now()
+    FROM ({changes}) AS changes
+    GROUP BY product_id
+    HAVING sum(carts) <> 0 OR sum(quantity) <> 0 OR sum(selected) <> 0
+    ORDER BY product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        carts_count = s.carts_count + EXCLUDED.carts_count,
+        total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+        selected_quantity = s.selected_quantity + EXCLUDED.selected_quantity,
+        updated_at = EXCLUDED.updated_at;
+"""
+
+_ROW_CHANGES = """
+    SELECT product_id, {sign} AS carts, {sign} * quantity AS quantity,
+           CASE WHEN is_selected THEN {sign} * quantity ELSE 0 END AS selected
+    FROM {table}
+"""
+
+_INSERTED = _ROW_CHANGES.format(sign=1, table="new_rows")
+_DELETED = _ROW_CHANGES.format(sign=-1, table="old_rows")
+
+_SKIP_CHECK = """
+    IF current_setting('cart.product_stats_skip', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+"""
+
+
+def _function(skip_check: str) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION cart_product_stats_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    {skip_check}
+    IF TG_OP = 'INSERT' THEN
+        {_APPLY_DELTAS.format(changes=_INSERTED)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_APPLY_DELTAS.format(changes=_DELETED)}
+    ELSE
+        {_APPLY_DELTAS.format(changes=_INSERTED + " UNION ALL " + _DELETED)}
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(_function(_SKIP_CHECK))
+    # Уже заархивированные корзины были вычтены триггером при переносе —
+    # возвращаем их вклад в счётчики
+    op.execute(
+        """
+        INSERT INTO cart_product_stats AS s
+            (product_id, carts_count, total_quantity, selected_quantity)
+        SELECT (item ->> 'product_id')::integer, count(*),
+               sum((item ->> 'quantity')::integer),
+               coalesce(sum((item ->> 'quantity')::integer)
+                        FILTER (WHERE (item ->> 'is_selected')::boolean), 0)
+        FROM cart_archive AS a, jsonb_array_elements(a.items) AS item
+        GROUP BY 1
+        ORDER BY 1
+        ON CONFLICT (product_id) DO UPDATE SET
+            carts_count = s.carts_count + EXCLUDED.carts_count,
+            total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+            selected_quantity = s.selected_quantity + EXCLUDED.selected_quantity,
+            updated_at = now()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        """
+        UPDATE cart_product_stats AS s SET
+            carts_count = s.carts_count - a.carts_count,
+            total_quantity = s.total_quantity - a.total_quantity,
+            selected_quantity = s.selected_quantity - a.selected_quantity,
+            updated_at = now()
+        FROM (
+            SELECT (item ->> 'product_id')::integer AS product_id,
+                   count(*) AS carts_count,
+                   sum((item ->> 'quantity')::integer) AS total_quantity,
+                   coalesce(sum((item ->> 'quantity')::integer)
+                            FILTER (WHERE (item ->> 'is_selected')::boolean), 0)
+                       AS selected_quantity
+            FROM cart_archive AS a, jsonb_array_elements(a.items) AS item
+            GROUP BY 1
+        ) AS a
+        WHERE s.product_id = a.product_id
+        """
+    )
+    op.execute(_function(""))
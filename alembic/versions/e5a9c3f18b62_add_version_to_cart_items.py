@@ -0,0 +1,33 @@
+"""Add version column to cart_items for optimistic concurrency
+
+Revision ID: e5a9c3f18b62
+Revises: b7f41d9e6c25
+Create Date: 2026-10-19 16:48:22.903115
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a9c3f18b62"
+down_revision: Union[str, Sequence[str], None] = "b7f41d9e6c25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Константный DEFAULT не переписывает таблицу (PostgreSQL 11+)
+    op.add_column(
+        "cart_items",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("cart_items", "version")
@@ -0,0 +1,34 @@
+"""Snapshot reconciliation state: cart_product_sync
+
+Revision ID: f3c8d1a59e27
+Revises: c2b6f9a3d715
+Create Date: 2026-10-19 21:52:08.317442
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c8d1a59e27"
+down_revision: Union[str, Sequence[str], None] = "c2b6f9a3d715"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "cart_product_sync",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("checked_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("product_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cart_product_sync")
@@ -1,20 +1,28 @@
 import uuid
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import Depends, Header, HTTPException, status, Request
+from fastapi import Depends, Header, HTTPException, Query, Response, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.database import async_session_maker
+from src.db.database import async_session_maker, internal_session_maker
+from src.schemas.cart import MINIMAL_ITEM_FIELDS, CartItemResponseSchema
 from src.services.cart import CartService
 from src.services.product_client import ProductClient
+from src.services.product_stats import ProductStatsService
 
 
 async def get_db() -> AsyncSession:
-    """Открывает сессию БД и закрывает после запроса."""
+    """Открывает сессию БД (пул interactive) и закрывает после запроса."""
     async with async_session_maker() as session:
         yield session
 
 
+async def get_internal_db() -> AsyncSession:
+    """Сессия БД из пула internal — для Order Service и webhook'ов."""
+    async with internal_session_maker() as session:
+        yield session
+
+
 def get_user_id(x_user_id: str | None = Header(None)) -> uuid.UUID:
     """Извлекает UUID пользователя из заголовка X-User-ID.
 
@@ -39,6 +47,75 @@ def get_user_id(x_user_id: str | None = Header(None)) -> uuid.UUID:
         )
 
 
+def get_return_cart(
+    response: Response,
+    return_: Annotated[
+        Literal["cart"] | None,
+        Query(alias="return", description="cart — вернуть всю обновлённую корзину"),
+    ] = None,
+    prefer: Annotated[str | None, Header()] = None,
+) -> bool:
+    """Клиент просит вернуть корзину целиком: ?return=cart или
+    Prefer: return=representation (RFC 7240)."""
+    if prefer and "return=representation" in prefer:
+        response.headers["Preference-Applied"] = "return=representation"
+        return True
+    return return_ == "cart"
+
+
+def get_if_match(if_match: Annotated[str | None, Header()] = None) -> int | None:
+    """Ожидаемая версия позиции из If-Match (ETag вида "3" или W/"3").
+
+    Отсутствие заголовка или * — изменение без проверки версии.
+
+    Raises:
+        HTTPException: 400, если заголовок не содержит версию позиции.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='If-Match must contain a cart item ETag, e.g. "3"',
+        )
+
+
+def get_cart_fields(
+    fields: Annotated[
+        str | None,
+        Query(description="Поля позиций через запятую, например id,quantity"),
+    ] = None,
+    view: Annotated[
+        Literal["full", "minimal"],
+        Query(description="minimal — только количество, цены, выбор и флаги"),
+    ] = "full",
+) -> frozenset[str] | None:
+    """Поля позиций в ответе корзины; None — все поля. id возвращается всегда.
+
+    Raises:
+        HTTPException: 400, если поле неизвестно или fields передан вместе
+            с view=minimal.
+    """
+    if fields is None:
+        return MINIMAL_ITEM_FIELDS if view == "minimal" else None
+    if view == "minimal":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either fields or view=minimal, not both",
+        )
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - CartItemResponseSchema.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown cart item fields: {', '.join(sorted(unknown))}",
+        )
+    return frozenset(requested | {"id"})
+
+
 def get_product_client(request: Request) -> ProductClient:
     return request.app.state.product_client
 
@@ -53,6 +130,28 @@ def get_cart_service(
     return CartService(session, product_client)
 
 
+def get_internal_cart_service(
+    session: Annotated[AsyncSession, Depends(get_internal_db)],
+    product_client: ProductClientDep,
+) -> CartService:
+    """Фабрика сервиса корзины для internal API (пул internal)."""
+    return CartService(session, product_client)
+
+
+def get_product_stats_service(
+    session: Annotated[AsyncSession, Depends(get_internal_db)],
+) -> ProductStatsService:
+    """Фабрика сервиса счётчиков популярности товаров (пул internal)."""
+    return ProductStatsService(session)
+
+
 SessionDep = Annotated[AsyncSession, Depends(get_db)]
 UserIdDep = Annotated[uuid.UUID, Depends(get_user_id)]
+ReturnCartDep = Annotated[bool, Depends(get_return_cart)]
+IfMatchDep = Annotated[int | None, Depends(get_if_match)]
+CartFieldsDep = Annotated[frozenset[str] | None, Depends(get_cart_fields)]
 CartServiceDep = Annotated[CartService, Depends(get_cart_service)]
+InternalCartServiceDep = Annotated[CartService, Depends(get_internal_cart_service)]
+ProductStatsServiceDep = Annotated[
+    ProductStatsService, Depends(get_product_stats_service)
+]
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get("", status_code=status.HTTP_200_OK)
+@router.get("/live", status_code=status.HTTP_200_OK)
+async def liveness() -> dict:
+    """Liveness-проба: процесс жив, зависимости не проверяются."""
+    return {"status": "healthy", "service": "cart-service"}
+
+
+@router.get(
+    "/ready",
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Обязательные зависимости недоступны или идёт прогрев"
+        },
+    },
+)
+async def readiness(request: Request) -> JSONResponse:
+    """Readiness-проба: прогрев завершён, обязательные зависимости доступны.
+
+    Проверяет пул БД, RabbitMQ и Product Service; результаты кешируются.
+    """
+    ready, checks = await request.app.state.health.readiness()
+    return JSONResponse(
+        status_code=(
+            status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+        content={
+            "status": "ready" if ready else "not_ready",
+            "service": "cart-service",
+            "checks": checks,
+        },
+    )
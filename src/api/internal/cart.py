@@ -1,11 +1,24 @@
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, status
-from fastapi.responses import Response
+from fastapi import APIRouter, Query, status
+from fastapi.responses import Response, StreamingResponse
 
-from src.api.dependencies import CartServiceDep, UserIdDep
-from src.schemas.cart import CartItemSelectedResponseSchema
-from src.schemas.internal import InternalCartItemSchema
+from src.api.dependencies import InternalCartServiceDep, UserIdDep
+from src.config import settings
+from src.schemas.cart import CartItemSelectedResponseSchema, CartValidationSchema
+from src.schemas.internal import (
+    CartBatchRequestSchema,
+    CartBatchResponseSchema,
+    CartExportParamsSchema,
+    CheckoutSnapshotSchema,
+    InternalCartItemSchema,
+)
+from src.services.export import (
+    EXPORT_MEDIA_TYPES,
+    export_cart_items,
+    stream_user_carts,
+)
 
 router = APIRouter(prefix="/cart", tags=["Internal — Cart"])
 
@@ -17,7 +30,7 @@ router = APIRouter(prefix="/cart", tags=["Internal — Cart"])
 )
 async def get_selected_internal(
     user_id: UserIdDep,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> list[CartItemSelectedResponseSchema]:
     """
     Получить только выбранные товары из корзины.
@@ -27,6 +40,59 @@ async def get_selected_internal(
     return await cart_service.get_list_selected_items(user_id)
 
 
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    summary="Потоковая выгрузка всех позиций корзин",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}
+        },
+    },
+)
+async def export_cart_items_internal(
+    params: Annotated[CartExportParamsSchema, Query()],
+) -> StreamingResponse:
+    """
+    Выгрузить позиции корзин (cart_items и архив) в NDJSON или CSV одним потоком.
+
+    Используется аналитикой и пайплайном брошенных корзин. Строки идут в порядке
+    id; при обрыве выгрузку можно продолжить, передав в `after` id последней
+    полученной строки.
+    """
+    return StreamingResponse(
+        export_cart_items(params),
+        media_type=EXPORT_MEDIA_TYPES[params.format],
+    )
+
+
+@router.post(
+    "/batch-get",
+    status_code=status.HTTP_200_OK,
+    summary="Получить корзины нескольких пользователей",
+    response_model=CartBatchResponseSchema,
+)
+async def get_carts_batch_internal(
+    body: CartBatchRequestSchema,
+    cart_service: InternalCartServiceDep,
+) -> CartBatchResponseSchema | StreamingResponse:
+    """
+    Получить корзины нескольких пользователей одним запросом к БД.
+
+    Используется Marketing и Order Service для массовой перепроверки корзин.
+    Корзины возвращаются в порядке user_ids; при числе пользователей больше
+    CART_BATCH_STREAM_THRESHOLD ответ отдаётся потоком.
+    """
+    if len(body.user_ids) > settings.CART_BATCH_STREAM_THRESHOLD:
+        return StreamingResponse(
+            stream_user_carts(body.user_ids), media_type="application/json"
+        )
+
+    carts = await cart_service.get_user_carts(body.user_ids)
+    return CartBatchResponseSchema(carts=carts)
+
+
 @router.get(
     "/{user_id}",
     status_code=status.HTTP_200_OK,
@@ -34,7 +100,7 @@ async def get_selected_internal(
 )
 async def get_cart_internal(
     user_id: UUID,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> list[InternalCartItemSchema]:
     """
     Получить содержимое корзины пользователя.
@@ -53,7 +119,7 @@ async def get_cart_internal(
 )
 async def clear_cart_internal(
     user_id: UUID,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> Response:
     """
     Очистить корзину пользователя.
@@ -62,3 +128,67 @@ async def clear_cart_internal(
     """
     await cart_service.clear_user_cart(user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/{user_id}/validate",
+    status_code=status.HTTP_200_OK,
+    summary="Перепроверить выбранные товары в Product Service",
+    responses={
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Product Service недоступен"
+        },
+    },
+)
+async def validate_cart_internal(
+    user_id: UUID,
+    cart_service: InternalCartServiceDep,
+) -> CartValidationSchema:
+    """
+    Обновить снапшоты выбранных товаров свежими данными Product Service.
+
+    Используется Order Service перед checkout-snapshot, чтобы заказ
+    оформлялся по актуальным ценам и наличию.
+    """
+    return await cart_service.validate_selected(user_id)
+
+
+@router.get(
+    "/{user_id}/checkout-snapshot",
+    status_code=status.HTTP_200_OK,
+    summary="Получить снапшот корзины для оформления заказа",
+)
+async def get_checkout_snapshot(
+    user_id: UUID,
+    cart_service: InternalCartServiceDep,
+) -> CheckoutSnapshotSchema:
+    """
+    Получить выбранные доступные товары с эффективными ценами, итоги и версию.
+
+    Используется Order Service при оформлении заказа вместо нескольких запросов.
+    """
+    return await cart_service.get_checkout_snapshot(user_id)
+
+
+@router.delete(
+    "/{user_id}/checkout-snapshot",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Удалить из корзины товары снапшота",
+    responses={
+        status.HTTP_409_CONFLICT: {
+            "description": "Корзина изменилась после получения снапшота"
+        },
+    },
+)
+async def clear_checkout_snapshot(
+    user_id: UUID,
+    cart_service: InternalCartServiceDep,
+    version: str = Query(..., description="Версия снапшота из checkout-snapshot"),
+) -> Response:
+    """
+    Удалить из корзины ровно те товары, что вошли в снапшот с указанной версией.
+
+    Используется Order Service после успешного оформления заказа.
+    """
+    await cart_service.clear_checkout_snapshot(user_id, version)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, status
+
+from src.db.database import pool_stats
+from src.db.invalidation import invalidation_bus
+from src.loop_monitor import loop_monitor
+from src.middleware.admission import admission_limiters
+from src.services.cart_events import cart_event_hub
+from src.services.product_cache import product_cache
+
+router = APIRouter(prefix="/diagnostics", tags=["Internal — Diagnostics"])
+
+
+@router.get(
+    "/pools",
+    status_code=status.HTTP_200_OK,
+    summary="Состояние пулов соединений БД",
+)
+async def get_pool_stats() -> dict[str, dict]:
+    """
+    Занятость именованных пулов (interactive, internal, background).
+
+    Показывает, какой класс работы держит соединения: сколько занято сейчас,
+    сколько было выдач и как долго соединения удерживались.
+    """
+    return pool_stats()
+
+
+@router.get(
+    "/admission",
+    status_code=status.HTTP_200_OK,
+    summary="Состояние адаптивных лимитов конкурентности",
+)
+async def get_admission_stats() -> dict[str, dict]:
+    """Текущий лимит, число выполняющихся и ожидающих запросов по группам."""
+    return {name: limiter.stats() for name, limiter in admission_limiters.items()}
+
+
+@router.get(
+    "/invalidation",
+    status_code=status.HTTP_200_OK,
+    summary="Состояние шины инвалидации кешей",
+)
+async def get_invalidation_stats() -> dict:
+    """Подключение LISTEN, число подписчиков и полученных уведомлений."""
+    return {
+        **invalidation_bus.stats(),
+        "cart_events": cart_event_hub.stats(),
+        "product_cache": product_cache.stats(),
+    }
+
+
+@router.get(
+    "/event-loop",
+    status_code=status.HTTP_200_OK,
+    summary="Задержка event loop'а и медленные колбэки",
+)
+async def get_event_loop_stats() -> dict:
+    """
+    Перцентили задержки event loop'а процесса за последние замеры.
+
+    top_call_sites — места в коде сервиса, где loop чаще всего был занят
+    синхронной работой дольше LOOP_MONITOR_SLOW_THRESHOLD_MS; recent_stalls —
+    последние такие остановки со свёрнутым стеком.
+    """
+    return loop_monitor.stats()
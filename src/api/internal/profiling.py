@@ -0,0 +1,93 @@
+import asyncio
+from typing import Annotated
+
+import structlog
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from src.config import settings
+from src.exceptions import ConflictException, NotFoundException
+from src.profiler import (
+    SamplingProfiler,
+    is_profiling_allowed,
+    load_report,
+    profiling_lock,
+    save_report,
+)
+
+logger = structlog.get_logger(__name__)
+
+
+def verify_profiling_token(x_profile_token: str | None = Header(None)) -> None:
+    """Доступ к профилированию только при PROFILING_ENABLED и верном токене.
+
+    Не зависит от DEBUG: при выключенном профилировании эндпоинты отвечают 404.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise NotFoundException("Profiling is disabled")
+    if not is_profiling_allowed(x_profile_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Valid X-Profile-Token header is required",
+        )
+
+
+router = APIRouter(
+    prefix="/profiling",
+    tags=["Internal — Profiling"],
+    dependencies=[Depends(verify_profiling_token)],
+)
+
+
+@router.post(
+    "/window",
+    status_code=status.HTTP_200_OK,
+    summary="Профилировать event loop в течение окна времени",
+    response_class=PlainTextResponse,
+)
+async def profile_window(
+    seconds: Annotated[
+        float, Query(gt=0, le=settings.PROFILING_MAX_WINDOW, description="Длина окна")
+    ] = 10.0,
+) -> PlainTextResponse:
+    """
+    Снять профиль всех запросов, обрабатываемых этим процессом, за окно времени.
+
+    Возвращает отчёт в folded-формате (flamegraph.pl, speedscope); ID сохранённой
+    копии — в заголовке X-Profile-Report.
+    """
+    if not profiling_lock.acquire(blocking=False):
+        raise ConflictException("Another profiling session is already running")
+
+    try:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            report = profiler.stop()
+    finally:
+        profiling_lock.release()
+
+    report_id = await asyncio.to_thread(save_report, report)
+    logger.info(
+        "event_loop_profiled",
+        seconds=seconds,
+        report_id=report_id,
+        samples=profiler.samples,
+    )
+    return PlainTextResponse(report, headers={"X-Profile-Report": report_id})
+
+
+@router.get(
+    "/reports/{report_id}",
+    status_code=status.HTTP_200_OK,
+    summary="Получить сохранённый отчёт профилирования",
+    response_class=PlainTextResponse,
+)
+async def get_profile_report(report_id: str) -> PlainTextResponse:
+    """Отчёт в folded-формате по ID из заголовка X-Profile-Report."""
+    report = await asyncio.to_thread(load_report, report_id)
+    if report is None:
+        raise NotFoundException(f"Profile report id={report_id} not found")
+    return PlainTextResponse(report)
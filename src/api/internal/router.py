@@ -1,7 +1,12 @@
 from fastapi import APIRouter
 
-from src.api.internal import sync, cart
+from src.api.internal import sync, cart, diagnostics, profiling, stats
+from src.config import settings
 
 internal_router = APIRouter(prefix="/internal")
 internal_router.include_router(sync.router)
+if settings.PRODUCT_STATS_ENABLED:
+    internal_router.include_router(stats.router)
 internal_router.include_router(cart.router)
+internal_router.include_router(profiling.router)
+internal_router.include_router(diagnostics.router)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, status
+
+from src.api.dependencies import ProductStatsServiceDep
+from src.schemas.internal import (
+    ProductStatsBatchRequestSchema,
+    ProductStatsBatchResponseSchema,
+    ProductStatsSchema,
+)
+
+router = APIRouter(prefix="/cart/products", tags=["Internal — Product Stats"])
+
+
+@router.post(
+    "/stats/batch-get",
+    status_code=status.HTTP_200_OK,
+    summary="[Internal] Счётчики нескольких товаров",
+)
+async def get_products_stats(
+    body: ProductStatsBatchRequestSchema,
+    stats_service: ProductStatsServiceDep,
+) -> ProductStatsBatchResponseSchema:
+    """
+    Счётчики популярности нескольких товаров одним запросом.
+
+    Возвращаются в порядке product_ids; для товаров, которых нет
+    ни в одной корзине, — нули.
+    """
+    stats = await stats_service.get_stats(body.product_ids)
+    return ProductStatsBatchResponseSchema(stats=stats)
+
+
+@router.get(
+    "/{product_id}/stats",
+    status_code=status.HTTP_200_OK,
+    summary="[Internal] Сколько корзин содержат товар",
+)
+async def get_product_stats(
+    product_id: int,
+    stats_service: ProductStatsServiceDep,
+) -> ProductStatsSchema:
+    """
+    Счётчики популярности товара для Product Service и мерчандайзинга.
+
+    Количество корзин с товаром, суммарное и выбранное для оформления
+    количество. Поддерживаются инкрементально, без сканирования cart_items.
+    """
+    [stats] = await stats_service.get_stats([product_id])
+    return stats
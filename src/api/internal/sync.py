@@ -1,6 +1,6 @@
 from fastapi import APIRouter, status
 
-from src.api.dependencies import CartServiceDep
+from src.api.dependencies import InternalCartServiceDep
 from src.schemas.internal import ProductUpdatedWebhook, WebhookResponseSchema
 
 router = APIRouter(prefix="/cart/products", tags=["Internal — Product Sync"])
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/cart/products", tags=["Internal — Product Sync"])
 async def product_updated(
     product_id: int,
     data: ProductUpdatedWebhook,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> WebhookResponseSchema:
     """
     Webhook от Product Service: товар обновлён.
@@ -38,7 +38,7 @@ async def product_updated(
 )
 async def product_out_of_stock(
     product_id: int,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> WebhookResponseSchema:
     """
     Webhook от Product Service: stock товара стал 0.
@@ -56,7 +56,7 @@ async def product_out_of_stock(
 )
 async def product_back_in_stock(
     product_id: int,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> WebhookResponseSchema:
     """
     Webhook от Product Service: stock товара снова > 0.
@@ -74,7 +74,7 @@ async def product_back_in_stock(
 )
 async def product_deleted(
     product_id: int,
-    cart_service: CartServiceDep,
+    cart_service: InternalCartServiceDep,
 ) -> WebhookResponseSchema:
     """
     Webhook от Product Service: товар удалён из каталога.
@@ -1,26 +1,93 @@
 import uuid
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Response, status
+from fastapi.responses import StreamingResponse
 
-from src.api.dependencies import CartServiceDep, UserIdDep
+from src.api.dependencies import (
+    CartFieldsDep,
+    CartServiceDep,
+    IfMatchDep,
+    ReturnCartDep,
+    UserIdDep,
+)
 from src.schemas.cart import (
     AddToCartSchema,
+    BulkUpdateItemsSchema,
     CartItemResponseSchema,
     CartResponseSchema,
+    CartValidationSchema,
     ItemSelectionSchema,
     UpdateQuantitySchema,
 )
+from src.services.cart_events import cart_event_hub
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 
-@router.get("", status_code=status.HTTP_200_OK)
+def _set_etag(
+    response: Response, result: CartItemResponseSchema | CartResponseSchema
+) -> CartItemResponseSchema | CartResponseSchema:
+    """ETag позиции — её версия; передаётся обратно в If-Match."""
+    if isinstance(result, CartItemResponseSchema):
+        response.headers["ETag"] = f'"{result.version}"'
+    return result
+
+
+@router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    response_model=CartResponseSchema,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Неизвестное поле в fields"},
+    },
+)
 async def get_cart(
     user_id: UserIdDep,
     service: CartServiceDep,
-) -> CartResponseSchema:
-    """Получить корзину текущего пользователя со снапшотами и флагами изменений."""
-    return await service.get_cart(user_id)
+    fields: CartFieldsDep,
+) -> CartResponseSchema | Response:
+    """Получить корзину текущего пользователя со снапшотами и флагами изменений.
+
+    `?fields=id,quantity,is_selected` — в позициях только перечисленные поля
+    (`id` всегда), `?view=minimal` — количество, цены, выбор и флаги без
+    названия, изображения, версии и дат. Итоги возвращаются всегда; из БД
+    читаются только нужные колонки.
+
+    Raises:
+        HTTPException: 400, если поле неизвестно или fields передан вместе
+            с view=minimal.
+    """
+    if fields is None:
+        return await service.get_cart(user_id)
+
+    cart = await service.get_cart_fields(user_id, fields)
+    return Response(cart.model_dump_json(), media_type="application/json")
+
+
+@router.get(
+    "/events",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {"content": {"text/event-stream": {}}},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Превышен лимит SSE-соединений процесса"
+        },
+    },
+)
+async def stream_cart_events(user_id: UserIdDep) -> StreamingResponse:
+    """Поток изменений корзины (Server-Sent Events).
+
+    Первым приходит событие `snapshot` с корзиной целиком, затем — `delta`
+    при каждом изменении: `upserted` (новые и изменённые позиции), `removed`
+    (id удалённых) и итоги. Изменения из webhook'ов Product Service тоже
+    попадают в поток. В паузах отправляется heartbeat-комментарий.
+    """
+    return StreamingResponse(
+        cart_event_hub.open(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post(
@@ -37,17 +104,54 @@ async def add_item(
     body: AddToCartSchema,
     user_id: UserIdDep,
     service: CartServiceDep,
-) -> CartItemResponseSchema:
+    return_cart: ReturnCartDep,
+    response: Response,
+) -> CartItemResponseSchema | CartResponseSchema:
     """Добавить товар в корзину.
 
     Если товар уже есть — увеличивает количество.
     Запрашивает снапшот данных у Product Service.
+    С `?return=cart` (или `Prefer: return=representation`) возвращает всю корзину.
 
     Raises:
         HTTPException: 404, если товар не найден в Product Service.
         HTTPException: 503, если Product Service недоступен.
     """
-    return await service.add_item(user_id, body.product_id, body.quantity)
+    result = await service.add_item(
+        user_id, body.product_id, body.quantity, return_cart
+    )
+    return _set_etag(response, result)
+
+
+@router.patch(
+    "/items",
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_404_NOT_FOUND: {
+            "description": "Позиция не найдена или не принадлежит пользователю"
+        },
+        status.HTTP_409_CONFLICT: {
+            "description": "Версия позиции не совпала с ожидаемой"
+        },
+    },
+)
+async def bulk_update_items(
+    body: BulkUpdateItemsSchema,
+    user_id: UserIdDep,
+    service: CartServiceDep,
+) -> CartResponseSchema:
+    """Изменить несколько позиций корзины одним запросом.
+
+    Для каждой позиции можно задать количество и/или выбор либо удалить её,
+    а также ожидаемую версию (`version`). Все изменения применяются в одной
+    транзакции. Возвращает обновлённую корзину.
+
+    Raises:
+        HTTPException: 404, если хотя бы одна позиция не найдена или не
+            принадлежит пользователю — тогда изменения не применяются.
+        HTTPException: 409, если версия хотя бы одной позиции не совпала.
+    """
+    return await service.bulk_update_items(user_id, body.operations)
 
 
 @router.patch(
@@ -57,6 +161,9 @@ async def add_item(
         status.HTTP_404_NOT_FOUND: {
             "description": "Позиция не найдена или не принадлежит пользователю"
         },
+        status.HTTP_409_CONFLICT: {
+            "description": "Версия позиции не совпала с ожидаемой"
+        },
     },
 )
 async def update_quantity(
@@ -64,13 +171,24 @@ async def update_quantity(
     body: UpdateQuantitySchema,
     user_id: UserIdDep,
     service: CartServiceDep,
-) -> CartItemResponseSchema:
+    return_cart: ReturnCartDep,
+    if_match: IfMatchDep,
+    response: Response,
+) -> CartItemResponseSchema | CartResponseSchema:
     """Изменить количество товара в корзине.
 
+    С `?return=cart` (или `Prefer: return=representation`) возвращает всю корзину.
+    С `If-Match: "<version>"` изменение применяется, только если позицию не
+    изменили с момента чтения.
+
     Raises:
         HTTPException: 404, если позиция не найдена или не принадлежит пользователю.
+        HTTPException: 409, если версия позиции не совпала с If-Match.
     """
-    return await service.update_quantity(user_id, item_id, body.quantity)
+    result = await service.update_quantity(
+        user_id, item_id, body.quantity, return_cart, if_match
+    )
+    return _set_etag(response, result)
 
 
 @router.patch(
@@ -80,6 +198,9 @@ async def update_quantity(
         status.HTTP_404_NOT_FOUND: {
             "description": "Позиция не найдена или не принадлежит пользователю"
         },
+        status.HTTP_409_CONFLICT: {
+            "description": "Версия позиции не совпала с ожидаемой"
+        },
     },
 )
 async def change_item_selection(
@@ -87,13 +208,49 @@ async def change_item_selection(
     body: ItemSelectionSchema,
     user_id: UserIdDep,
     service: CartServiceDep,
-) -> CartItemResponseSchema:
+    return_cart: ReturnCartDep,
+    if_match: IfMatchDep,
+    response: Response,
+) -> CartItemResponseSchema | CartResponseSchema:
     """Изменить статус выбора товара в корзине (чекбокс).
 
+    С `?return=cart` (или `Prefer: return=representation`) возвращает всю корзину.
+    С `If-Match: "<version>"` — только если позицию не изменили с момента чтения.
+
     Raises:
         HTTPException: 404, если позиция не найдена или не принадлежит пользователю.
+        HTTPException: 409, если версия позиции не совпала с If-Match.
     """
-    return await service.change_item_selection(user_id, item_id, body.is_selected)
+    result = await service.change_item_selection(
+        user_id, item_id, body.is_selected, return_cart, if_match
+    )
+    return _set_etag(response, result)
+
+
+@router.post(
+    "/validate",
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "description": "Product Service недоступен"
+        },
+    },
+)
+async def validate_cart(
+    user_id: UserIdDep,
+    service: CartServiceDep,
+) -> CartValidationSchema:
+    """Перепроверить выбранные товары в Product Service перед оформлением заказа.
+
+    Актуальные цены, названия, изображения, наличие и удаление товаров
+    применяются к корзине; в `changes` — что изменилось, `valid=false`, если
+    хоть что-то. Позиции, изменённые во время проверки, не обновляются и
+    возвращаются в `conflicts`. Возвращает обновлённую корзину.
+
+    Raises:
+        HTTPException: 503, если Product Service недоступен.
+    """
+    return await service.validate_selected(user_id)
 
 
 @router.patch("/select-all", status_code=status.HTTP_200_OK)
@@ -113,29 +270,67 @@ async def select_all(
 @router.delete(
     "/items/{item_id}",
     status_code=status.HTTP_204_NO_CONTENT,
+    response_model=None,
     responses={
+        status.HTTP_200_OK: {
+            "model": CartResponseSchema,
+            "description": "Оставшаяся корзина (?return=cart)",
+        },
         status.HTTP_404_NOT_FOUND: {
             "description": "Позиция не найдена или не принадлежит пользователю"
         },
+        status.HTTP_409_CONFLICT: {
+            "description": "Версия позиции не совпала с ожидаемой"
+        },
     },
 )
 async def remove_item(
     item_id: uuid.UUID,
     user_id: UserIdDep,
     service: CartServiceDep,
-) -> None:
+    return_cart: ReturnCartDep,
+    if_match: IfMatchDep,
+    response: Response,
+) -> CartResponseSchema | None:
     """Удалить конкретный товар из корзины.
 
+    С `?return=cart` (или `Prefer: return=representation`) отвечает 200
+    с оставшейся корзиной вместо 204. С `If-Match: "<version>"` позиция
+    удаляется, только если её не изменили с момента чтения.
+
     Raises:
         HTTPException: 404, если позиция не найдена или не принадлежит пользователю.
+        HTTPException: 409, если версия позиции не совпала с If-Match.
     """
-    await service.remove_item(user_id, item_id)
+    cart = await service.remove_item(user_id, item_id, return_cart, if_match)
+    if cart is not None:
+        response.status_code = status.HTTP_200_OK
+    return cart
 
 
-@router.delete("", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_model=None,
+    responses={
+        status.HTTP_200_OK: {
+            "model": CartResponseSchema,
+            "description": "Пустая корзина (?return=cart)",
+        },
+    },
+)
 async def clear_cart(
     user_id: UserIdDep,
     service: CartServiceDep,
-) -> None:
-    """Очистить всю корзину пользователя."""
-    await service.clear_cart(user_id)
+    return_cart: ReturnCartDep,
+    response: Response,
+) -> CartResponseSchema | None:
+    """Очистить всю корзину пользователя.
+
+    С `?return=cart` (или `Prefer: return=representation`) отвечает 200
+    с пустой корзиной вместо 204.
+    """
+    cart = await service.clear_cart(user_id, return_cart)
+    if cart is not None:
+        response.status_code = status.HTTP_200_OK
+    return cart
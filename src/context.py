@@ -0,0 +1,49 @@
+"""Состояние текущего запроса, доступное из любого слоя через contextvars."""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+
+@dataclass
+class RequestTimings:
+    """Счётчики обращений к БД и Product Service в рамках одного запроса."""
+
+    db_queries: int = 0
+    db_time: float = 0.0  # секунды
+    product_calls: int = 0
+    product_time: float = 0.0  # секунды
+
+    def server_timing(self, total_ms: float) -> str:
+        """Значение заголовка Server-Timing."""
+        db_ms = self.db_time * 1000
+        product_ms = self.product_time * 1000
+        return ", ".join(
+            [
+                f'db;dur={db_ms:.2f};desc="{self.db_queries} queries"',
+                f'product;dur={product_ms:.2f};desc="{self.product_calls} calls"',
+                f"total;dur={total_ms:.2f}",
+            ]
+        )
+
+
+# Устанавливается RequestLoggingMiddleware; вне HTTP-запроса (консьюмеры,
+# фоновые задачи) равен None и счётчики не ведутся.
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+# Дедлайн текущего запроса по часам time.monotonic(); None — без ограничения.
+# Устанавливается DeadlineMiddleware.
+request_deadline: ContextVar[float | None] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def remaining_time() -> float | None:
+    """Сколько секунд осталось до дедлайна запроса; None — дедлайна нет."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
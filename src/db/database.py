@@ -1,13 +1,110 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import Connection, event, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session, SessionTransaction
 
 from src.config import settings
+from src.context import remaining_time
+from src.db.instrumentation import instrument_engine, pool_usage
+from src.exceptions import DeadlineExceededException
+
+# Именованные пулы соединений: пользовательский трафик, internal API
+# (Order Service, webhook'и Product Service) и фоновая работа (консьюмеры,
+# выгрузки, задачи) не отбирают соединения друг у друга.
+INTERACTIVE_POOL = "interactive"
+INTERNAL_POOL = "internal"
+BACKGROUND_POOL = "background"
+
+
+def _create_engine(pool_name: str) -> AsyncEngine:
+    pool_engine = create_async_engine(
+        url=settings.DATABASE_URL,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZES[pool_name],
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW[pool_name],
+        connect_args={
+            "server_settings": {
+                "application_name": f"cart-service:{pool_name}",
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUTS_MS[pool_name]),
+            }
+        },
+    )
+    instrument_engine(pool_engine, pool_name)
+    return pool_engine
+
+
+engines: dict[str, AsyncEngine] = {
+    pool_name: _create_engine(pool_name)
+    for pool_name in (INTERACTIVE_POOL, INTERNAL_POOL, BACKGROUND_POOL)
+}
+engine = engines[INTERACTIVE_POOL]
+
+# statement_timeout пула, заданный при подключении, по sync-движку
+_pool_statement_timeouts_ms = {
+    pool_engine.sync_engine: settings.DB_STATEMENT_TIMEOUTS_MS[pool_name]
+    for pool_name, pool_engine in engines.items()
+}
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_request_deadline(
+    session: Session, transaction: SessionTransaction, connection: Connection
+) -> None:
+    """Ограничивает statement_timeout транзакции остатком дедлайна запроса.
+
+    SET LOCAL выполняется, только если остаток меньше таймаута пула, — в
+    обычном случае лишнего запроса к БД нет. Запрос с истёкшим дедлайном
+    до БД не доходит.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return
+    if remaining <= 0:
+        raise DeadlineExceededException()
+
+    timeout_ms = max(int(remaining * 1000), 1)
+    if timeout_ms < _pool_statement_timeouts_ms.get(connection.engine, 0):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
 
-engine = create_async_engine(url=settings.DATABASE_URL, echo=settings.DB_ECHO)
 
 async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+internal_session_maker = async_sessionmaker(
+    engines[INTERNAL_POOL], class_=AsyncSession, expire_on_commit=False
+)
+background_session_maker = async_sessionmaker(
+    engines[BACKGROUND_POOL], class_=AsyncSession, expire_on_commit=False
+)
+
+
+def asyncpg_dsn() -> str:
+    """DSN для прямых asyncpg-соединений вне пулов (LISTEN, COPY)."""
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def pool_stats() -> dict[str, dict]:
+    """Текущее состояние и накопленная статистика занятости каждого пула."""
+    stats = {}
+    for pool_name, pool_engine in engines.items():
+        pool = pool_engine.pool
+        usage = pool_usage[pool_name]
+        stats[pool_name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": usage.checkouts,
+            "avg_hold_ms": round(usage.hold_time / usage.checkouts * 1000, 2)
+            if usage.checkouts
+            else 0.0,
+            "max_hold_ms": round(usage.max_hold_time * 1000, 2),
+        }
+    return stats
 
 
 class Base(DeclarativeBase):
@@ -0,0 +1,71 @@
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.context import request_timings
+
+
+@dataclass
+class PoolUsage:
+    """Сколько раз и как долго соединения пула были заняты."""
+
+    checkouts: int = 0
+    hold_time: float = 0.0  # секунды, суммарно
+    max_hold_time: float = 0.0  # секунды
+
+
+# Статистика использования по имени пула
+pool_usage: dict[str, PoolUsage] = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append((context, time.perf_counter()))
+
+
+def _record_query(conn) -> None:
+    _, started = conn.info["query_start"].pop()
+    timings = request_timings.get()
+    if timings is not None:
+        timings.db_queries += 1
+        timings.db_time += time.perf_counter() - started
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(conn)
+
+
+def _handle_error(exception_context) -> None:
+    # Упавший запрос не доходит до after_cursor_execute: без этого его метка
+    # осталась бы в стеке и исказила время следующего запроса на соединении.
+    # Метка снимается, только если ошибка случилась после before_cursor_execute
+    # того же выражения.
+    conn = exception_context.connection
+    stack = conn.info.get("query_start") if conn is not None else None
+    if stack and stack[-1][0] is exception_context.execution_context:
+        _record_query(conn)
+
+
+def instrument_engine(engine: AsyncEngine, pool_name: str) -> None:
+    """Подключает подсчёт SQL-запросов для текущего запроса и статистику пула."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+    usage = pool_usage.setdefault(pool_name, PoolUsage())
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checkout_time"] = time.perf_counter()
+
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checkout_time", None)
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        usage.checkouts += 1
+        usage.hold_time += held
+        usage.max_hold_time = max(usage.max_hold_time, held)
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
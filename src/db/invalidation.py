@@ -0,0 +1,216 @@
+"""Шина инвалидации кешей между воркерами через LISTEN/NOTIFY Postgres.
+
+Запись в репозитории помечает затронутых пользователей и товары в сессии;
+перед commit помеченные ключи отправляются одним pg_notify в той же
+транзакции, поэтому уведомление уходит только вместе с зафиксированными
+изменениями. Каждый процесс держит отдельное asyncpg-соединение с LISTEN и
+рассылает накопленные ключи подписчикам (кешам, SSE).
+
+Формат ключей: "u:<user_id>" и "p:<product_id>", в payload — через запятую.
+"""
+
+import asyncio
+import uuid
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+import asyncpg
+import structlog
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.database import asyncpg_dsn
+
+logger = structlog.get_logger(__name__)
+
+
+# Ошибки соединения LISTEN, после которых нужно переподключиться. OSError
+# включает ConnectionError и TimeoutError от wait_for; InterfaceError —
+# обращение к уже закрытому соединению
+_CONNECTION_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+
+_SESSION_KEY = "invalidations"
+# Лимит payload в Postgres — 8000 байт, оставляем запас
+_MAX_PAYLOAD_SIZE = 7000
+
+
+def invalidate_user(session: AsyncSession, user_id: uuid.UUID) -> None:
+    """Помечает корзину пользователя изменённой в текущей транзакции."""
+    session.info.setdefault(_SESSION_KEY, set()).add(f"u:{user_id}")
+
+
+def invalidate_product(session: AsyncSession, product_id: int) -> None:
+    """Помечает изменёнными позиции товара во всех корзинах."""
+    session.info.setdefault(_SESSION_KEY, set()).add(f"p:{product_id}")
+
+
+def invalidation_payloads(keys: Iterable[str]) -> Iterable[str]:
+    """Ключи, упакованные в payload'ы pg_notify не длиннее лимита Postgres."""
+    chunk: list[str] = []
+    size = 0
+    for key in sorted(keys):
+        if chunk and size + len(key) + 1 > _MAX_PAYLOAD_SIZE:
+            yield ",".join(chunk)
+            chunk, size = [], 0
+        chunk.append(key)
+        size += len(key) + 1
+    if chunk:
+        yield ",".join(chunk)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session) -> None:
+    keys = session.info.pop(_SESSION_KEY, None)
+    if not keys or not settings.INVALIDATION_ENABLED:
+        return
+    connection = session.connection()
+    for payload in invalidation_payloads(keys):
+        connection.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": settings.INVALIDATION_CHANNEL, "payload": payload},
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+@dataclass
+class Invalidation:
+    """Пачка инвалидаций; full=True — сбросить всё (уведомления могли потеряться)."""
+
+    user_ids: set[uuid.UUID] = field(default_factory=set)
+    product_ids: set[int] = field(default_factory=set)
+    full: bool = False
+
+
+Subscriber = Callable[[Invalidation], None]
+
+
+class InvalidationBus:
+    """LISTEN-соединение процесса и рассылка инвалидаций подписчикам.
+
+    Подписчики вызываются синхронно в event loop и должны быть быстрыми
+    (сбросить запись кеша, положить событие в очередь). Пока LISTEN-соединение
+    не установлено (connected=False), уведомления теряются — кеши не должны
+    отдавать данные из памяти; после переподключения рассылается full=True.
+    """
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.received = 0
+        self.dispatched = 0
+        self.reconnects = 0
+        self._subscribers: list[Subscriber] = []
+        self._pending: set[str] = set()
+        self._full = False
+        self._wakeup = asyncio.Event()
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Подписывает callback; возвращает функцию отписки."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    async def run(self) -> None:
+        """Держит LISTEN-соединение и рассылает уведомления до отмены задачи."""
+        dispatcher = asyncio.create_task(self._dispatch_loop())
+        try:
+            await self._listen_loop()
+        finally:
+            dispatcher.cancel()
+            await asyncio.gather(dispatcher, return_exceptions=True)
+
+    async def _listen_loop(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                connection = await asyncpg.connect(asyncpg_dsn())
+            except _CONNECTION_ERRORS as e:
+                attempt += 1
+                await self._backoff(attempt, e)
+                continue
+
+            try:
+                await connection.add_listener(
+                    settings.INVALIDATION_CHANNEL, self._on_notification
+                )
+                self.connected = True
+                # Во время разрыва уведомления не доставлялись
+                self._full = True
+                self._wakeup.set()
+                attempt = 0
+                logger.info(
+                    "invalidation_listener_connected",
+                    channel=settings.INVALIDATION_CHANNEL,
+                )
+
+                while True:
+                    await asyncio.sleep(settings.INVALIDATION_PING_INTERVAL)
+                    await asyncio.wait_for(
+                        connection.fetchval("SELECT 1"),
+                        timeout=settings.INVALIDATION_PING_INTERVAL,
+                    )
+            except _CONNECTION_ERRORS as e:
+                self.reconnects += 1
+                logger.warning("invalidation_listener_lost", error=str(e))
+            finally:
+                self.connected = False
+                connection.terminate()
+
+            attempt += 1
+            await self._backoff(attempt)
+
+    async def _backoff(self, attempt: int, error: Exception | None = None) -> None:
+        delay = min(2**attempt, settings.INVALIDATION_RECONNECT_MAX_DELAY)
+        logger.warning(
+            "invalidation_listener_retry",
+            attempt=attempt,
+            delay=delay,
+            error=str(error) if error else None,
+        )
+        await asyncio.sleep(delay)
+
+    def _on_notification(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        self.received += 1
+        self._pending.update(payload.split(","))
+        self._wakeup.set()
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Окно склейки: всплеск уведомлений рассылается одной пачкой
+            await asyncio.sleep(settings.INVALIDATION_COALESCE_WINDOW)
+            self._wakeup.clear()
+
+            invalidation = Invalidation(full=self._full)
+            keys, self._pending, self._full = self._pending, set(), False
+            for key in keys:
+                kind, _, value = key.partition(":")
+                if kind == "u":
+                    invalidation.user_ids.add(uuid.UUID(value))
+                elif kind == "p":
+                    invalidation.product_ids.add(int(value))
+
+            self.dispatched += 1
+            for callback in list(self._subscribers):
+                try:
+                    callback(invalidation)
+                except Exception:
+                    logger.exception("invalidation_subscriber_failed")
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "subscribers": len(self._subscribers),
+            "received": self.received,
+            "dispatched": self.dispatched,
+            "reconnects": self.reconnects,
+        }
+
+
+invalidation_bus = InvalidationBus()
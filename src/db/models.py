@@ -1,23 +1,28 @@
 import uuid
 from datetime import datetime
-from decimal import Decimal
 
 from sqlalchemy import (
+    BigInteger,
+    Identity,
+    Index,
     Integer,
     String,
-    Numeric,
     Boolean,
     DateTime,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 
 from src.db.database import Base
 
 
 class CartItemModel(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_cart_items_user_product"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
@@ -26,18 +31,24 @@ class CartItemModel(Base):
         UUID(as_uuid=True), nullable=False, index=True
     )
 
-    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     product_name: Mapped[str] = mapped_column(String(255), nullable=False)
-    product_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    # Цены хранятся в копейках, как их присылает Product Service
+    product_price: Mapped[int] = mapped_column(BigInteger, nullable=False)
     product_image: Mapped[str | None] = mapped_column(String(512), nullable=True)
     price_changed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
-    current_price: Mapped[Decimal | None] = mapped_column(Numeric(10, 2), nullable=True)
+    current_price: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     out_of_stock: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     is_selected: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
     product_deleted: Mapped[bool] = mapped_column(
         Boolean, nullable=False, default=False
     )
+    # Версия позиции для оптимистичной блокировки: каждое изменение позиции
+    # увеличивает её, If-Match / version проверяются в UPDATE ... WHERE version
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1"
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
@@ -51,3 +62,147 @@ class CartItemModel(Base):
 
     def __repr__(self) -> str:
         return f"<CartItemModel(id={self.id}, user_id={self.user_id}, product_id={self.product_id}, quantity={self.quantity})>"
+
+
+class CartProductStatsModel(Base):
+    """Сколько корзин содержат товар.
+
+    Поддерживается триггерами на cart_items (см. миграцию 3c1e9b7d2a40) и
+    периодически сверяется с cart_items фоновой задачей.
+    """
+
+    __tablename__ = "cart_product_stats"
+
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    carts_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_quantity: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    selected_quantity: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class CartImportProgressModel(Base):
+    """Прогресс массового импорта корзин (python -m src.importer).
+
+    Обновляется в одной транзакции с каждой загруженной пачкой, поэтому
+    прерванный импорт продолжается ровно с первой незагруженной строки.
+    """
+
+    __tablename__ = "cart_import_progress"
+
+    job_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    rows_processed: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    inserted: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    skipped: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    completed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class CartActivityModel(Base):
+    """Когда пользователь последний раз обращался к корзине.
+
+    Обновляется не чаще раза в CART_ACTIVITY_TOUCH_INTERVAL секунд на процесс;
+    по ней задача архивации находит холодные корзины.
+    """
+
+    __tablename__ = "cart_activity"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    last_seen_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
+
+
+class CartArchiveModel(Base):
+    """Холодная корзина, вынесенная из cart_items: все позиции одним JSONB.
+
+    Изменения товаров из webhook'ов сюда не пишутся — они копятся в
+    cart_archive_changes и применяются при возврате корзины (change_id —
+    последнее уже учтённое изменение).
+    """
+
+    __tablename__ = "cart_archive"
+    __table_args__ = (
+        Index("ix_cart_archive_product_ids", "product_ids", postgresql_using="gin"),
+    )
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    # Позиции в виде колонок cart_items без user_id, в порядке created_at
+    items: Mapped[list[dict]] = mapped_column(JSONB, nullable=False)
+    product_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    change_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class CartArchiveChangeModel(Base):
+    """Журнал изменений товаров для архивных корзин (одна запись на webhook)."""
+
+    __tablename__ = "cart_archive_changes"
+    __table_args__ = (Index("ix_cart_archive_changes_product_id", "product_id", "id"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Значения колонок cart_items, установленные webhook'ом
+    fields: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class CartDocumentModel(Base):
+    """Корзина пользователя одним документом (CART_STORAGE_BACKEND=document).
+
+    Позиции хранятся JSONB-массивом в формате колонок cart_items; итоги по
+    выбранным доступным позициям пересчитываются при каждой записи.
+    """
+
+    __tablename__ = "cart_documents"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    items: Mapped[list[dict]] = mapped_column(JSONB, nullable=False)
+    total_price: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    total_items: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class CartDocumentProductModel(Base):
+    """Индекс товар → корзины-документы с этим товаром (для webhook'ов)."""
+
+    __tablename__ = "cart_document_products"
+
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+
+
+class CartProductSyncModel(Base):
+    """Когда снапшоты товара в корзинах последний раз сверялись с Product Service.
+
+    Строка обновляется после каждой сверки товара; по ней фоновая сверка
+    выбирает давно не проверенные товары и продолжает работу после перезапуска.
+    """
+
+    __tablename__ = "cart_product_sync"
+
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    checked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
@@ -15,3 +15,11 @@ class NotFoundException(CartServiceException):
 
 class ServiceUnavailableException(CartServiceException):
     detail = "External service is temporarily unavailable"
+
+
+class ConflictException(CartServiceException):
+    detail = "Resource state conflict"
+
+
+class DeadlineExceededException(CartServiceException):
+    detail = "Request deadline exceeded"
@@ -0,0 +1,93 @@
+"""Массовый импорт корзин: `python -m src.importer carts.ndjson`.
+
+Повторный запуск с тем же --job-id (по умолчанию — имя и размер файла)
+продолжает прерванный импорт. Пример:
+
+    python -m src.importer legacy.csv --hydrate --on-conflict keep
+"""
+
+import argparse
+from pathlib import Path
+
+import asyncpg
+import httpx
+import uvloop
+
+from src.config import settings
+from src.db.database import BACKGROUND_POOL, asyncpg_dsn
+from src.logger import get_logger, setup_logging
+from src.services.cart_import import CartImporter
+from src.services.product_client import ProductClient
+
+setup_logging()
+logger = get_logger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Импорт корзин из NDJSON/CSV")
+    parser.add_argument("path", type=Path, help="Файл с позициями корзин")
+    parser.add_argument(
+        "--format",
+        choices=["ndjson", "csv"],
+        help="Формат файла (по умолчанию — по расширению)",
+    )
+    parser.add_argument(
+        "--job-id", help="ID импорта для продолжения (по умолчанию — имя:размер)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.IMPORT_BATCH_SIZE,
+        help="Строк в пачке",
+    )
+    parser.add_argument(
+        "--on-conflict",
+        choices=["keep", "replace"],
+        default="keep",
+        help="Позиция уже есть в корзине: оставить (keep) или перезаписать (replace)",
+    )
+    parser.add_argument(
+        "--hydrate",
+        action="store_true",
+        help="Дозаполнять снапшоты без названия/цены из Product Service",
+    )
+    args = parser.parse_args()
+    if settings.CART_STORAGE_BACKEND != "rows":
+        # Импорт пишет COPY в cart_items
+        parser.error("импорт поддерживает только CART_STORAGE_BACKEND=rows")
+    return args
+
+
+async def run(args: argparse.Namespace) -> None:
+    import_format = args.format or ("csv" if args.path.suffix == ".csv" else "ndjson")
+    job_id = args.job_id or f"{args.path.name}:{args.path.stat().st_size}"
+
+    connection = await asyncpg.connect(
+        asyncpg_dsn(),
+        server_settings={
+            "application_name": "cart-service:import",
+            "statement_timeout": str(
+                settings.DB_STATEMENT_TIMEOUTS_MS[BACKGROUND_POOL]
+            ),
+        },
+    )
+    http_client = httpx.AsyncClient(timeout=httpx.Timeout(timeout=10.0, connect=5.0))
+    try:
+        importer = CartImporter(
+            connection,
+            job_id=job_id,
+            on_conflict=args.on_conflict,
+            product_client=ProductClient(http_client) if args.hydrate else None,
+        )
+        await importer.run(args.path, import_format, args.batch_size)
+    finally:
+        await http_client.aclose()
+        await connection.close()
+
+
+def main() -> None:
+    uvloop.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
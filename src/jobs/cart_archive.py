@@ -0,0 +1,78 @@
+"""Фоновая архивация холодных корзин (см. src.services.cart_archive).
+
+Раз в CART_ARCHIVE_INTERVAL секунд переносит в архив корзины без обращений
+CART_ARCHIVE_IDLE_DAYS дней, применяет накопленный журнал изменений товаров
+к архивам и удаляет из журнала учтённые записи. Работает в процессе
+src.worker; при нескольких воркерах проход выполняет один — под advisory lock.
+"""
+
+import asyncio
+
+import structlog
+from sqlalchemy import func, select
+
+from src.config import settings
+from src.db.database import BACKGROUND_POOL, background_session_maker, engines
+from src.services.cart_archive import CartArchiveService
+
+logger = structlog.get_logger(__name__)
+
+
+# Ключ advisory lock архивации (произвольная константа сервиса)
+_ARCHIVE_LOCK_KEY = 4_002_044
+
+
+async def archive_carts() -> dict[str, int] | None:
+    """Один полный проход; None — его уже выполняет другой процесс.
+
+    Каждая пачка — отдельная короткая транзакция: журнал изменений
+    блокируется от webhook'ов только на время пачки.
+    """
+    async with engines[BACKGROUND_POOL].connect() as lock_connection:
+        acquired = await lock_connection.scalar(
+            select(func.pg_try_advisory_lock(_ARCHIVE_LOCK_KEY))
+        )
+        if not acquired:
+            return None
+
+        batch_size = settings.CART_ARCHIVE_BATCH_SIZE
+        result = {"archived": 0, "folded": 0, "pruned": 0}
+        try:
+            while settings.CART_ARCHIVE_IDLE_DAYS:
+                async with background_session_maker() as session:
+                    released, archived = await CartArchiveService(session).archive_idle(
+                        batch_size
+                    )
+                    await session.commit()
+                result["archived"] += archived
+                if released < batch_size:
+                    break
+
+            while True:
+                async with background_session_maker() as session:
+                    folded = await CartArchiveService(session).fold_changes(batch_size)
+                    await session.commit()
+                result["folded"] += folded
+                if folded < batch_size:
+                    break
+
+            async with background_session_maker() as session:
+                result["pruned"] = await CartArchiveService(session).prune_changes()
+                await session.commit()
+        finally:
+            await lock_connection.scalar(
+                select(func.pg_advisory_unlock(_ARCHIVE_LOCK_KEY))
+            )
+
+    logger.info("carts_archived", **result)
+    return result
+
+
+async def run_cart_archiving() -> None:
+    """Периодическая архивация до отмены задачи."""
+    while True:
+        await asyncio.sleep(settings.CART_ARCHIVE_INTERVAL)
+        try:
+            await archive_carts()
+        except Exception:
+            logger.exception("cart_archive_failed")
@@ -0,0 +1,76 @@
+"""Фоновая сверка счётчиков популярности товаров с cart_items.
+
+Счётчики поддерживаются триггерами, но могут разойтись с данными (ручные
+правки, восстановление из бэкапа, гонка при создании строки счётчика).
+Задача раз в PRODUCT_STATS_RECONCILE_INTERVAL секунд пересчитывает их
+пачками и исправляет расхождения. Работает в процессе src.worker; при
+нескольких воркерах сверку выполняет один — под advisory lock.
+"""
+
+import asyncio
+
+import structlog
+from sqlalchemy import func, select
+
+from src.config import settings
+from src.db.database import BACKGROUND_POOL, background_session_maker, engines
+from src.repositories.product_stats import ProductStatsRepository
+from src.services.product_stats import ProductStatsService
+
+logger = structlog.get_logger(__name__)
+
+
+# Ключ advisory lock сверки (произвольная константа сервиса)
+_RECONCILE_LOCK_KEY = 4_002_040
+
+
+async def reconcile_product_stats() -> int | None:
+    """Один полный проход сверки; None — сверку уже выполняет другой процесс.
+
+    Каждая пачка — отдельная короткая транзакция, чтобы не держать блокировки
+    строк счётчиков дольше необходимого.
+    """
+    async with engines[BACKGROUND_POOL].connect() as lock_connection:
+        acquired = await lock_connection.scalar(
+            select(func.pg_try_advisory_lock(_RECONCILE_LOCK_KEY))
+        )
+        if not acquired:
+            return None
+
+        try:
+            corrected = 0
+            checked = 0
+            after = None
+            while True:
+                async with background_session_maker() as session:
+                    product_ids = await ProductStatsRepository(
+                        session
+                    ).get_next_product_ids(
+                        after, settings.PRODUCT_STATS_RECONCILE_BATCH_SIZE
+                    )
+                    if not product_ids:
+                        break
+                    corrected += await ProductStatsService(session).reconcile(
+                        product_ids
+                    )
+                    await session.commit()
+
+                checked += len(product_ids)
+                after = product_ids[-1]
+        finally:
+            await lock_connection.scalar(
+                select(func.pg_advisory_unlock(_RECONCILE_LOCK_KEY))
+            )
+
+    logger.info("product_stats_reconciled", checked=checked, corrected=corrected)
+    return corrected
+
+
+async def run_product_stats_reconciliation() -> None:
+    """Периодическая сверка до отмены задачи."""
+    while True:
+        await asyncio.sleep(settings.PRODUCT_STATS_RECONCILE_INTERVAL)
+        try:
+            await reconcile_product_stats()
+        except Exception:
+            logger.exception("product_stats_reconcile_failed")
@@ -0,0 +1,107 @@
+"""Фоновая сверка снапшотов товаров в корзинах с Product Service.
+
+Webhook'и Product Service теряются при деплоях и сбоях, и корзины
+показывают старую цену или не знают, что товар закончился. Задача раз в
+SNAPSHOT_SYNC_INTERVAL секунд обходит товары из корзин (см.
+SnapshotSyncRepository.get_next_product_ids), запрашивает их в Product
+Service и применяет пропущенные изменения. Время сверки каждого товара
+сохраняется, поэтому прерванный проход продолжается с несверенных товаров.
+Работает в процессе src.worker; при нескольких воркерах проход выполняет
+один — под advisory lock.
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import structlog
+from sqlalchemy import func, select
+
+from src.config import settings
+from src.db.database import BACKGROUND_POOL, background_session_maker, engines
+from src.exceptions import ServiceUnavailableException
+from src.repositories.snapshot_sync import SnapshotSyncRepository
+from src.services.product_client import ProductClient
+from src.services.snapshot_sync import SnapshotSyncService
+
+logger = structlog.get_logger(__name__)
+
+
+# Ключ advisory lock сверки снапшотов (произвольная константа сервиса)
+_SYNC_LOCK_KEY = 4_002_047
+
+
+async def sync_snapshots(product_client: ProductClient) -> dict[str, int] | None:
+    """Один проход по всем товарам; None — его уже выполняет другой процесс.
+
+    Пачки запрашиваются не быстрее SNAPSHOT_SYNC_RATE_LIMIT товаров в секунду
+    и не больше SNAPSHOT_SYNC_CONCURRENCY запросов одновременно. Если Product
+    Service недоступен, проход прерывается до следующего запуска.
+    """
+    async with engines[BACKGROUND_POOL].connect() as lock_connection:
+        acquired = await lock_connection.scalar(
+            select(func.pg_try_advisory_lock(_SYNC_LOCK_KEY))
+        )
+        if not acquired:
+            return None
+
+        result: Counter[str] = Counter(checked=0)
+        try:
+            # Товары, сверенные после начала прохода, в нём больше не выбираются
+            started_at = await lock_connection.scalar(select(func.now()))
+            while True:
+                async with background_session_maker() as session:
+                    repo = SnapshotSyncRepository(session)
+                    product_ids = await repo.get_next_product_ids(
+                        started_at, settings.SNAPSHOT_SYNC_BATCH_SIZE
+                    )
+                    if not product_ids:
+                        break
+                    # До запроса в Product Service: webhook, пришедший после
+                    # него, свежее ответа (см. SnapshotSyncService.apply)
+                    last_changes = await repo.get_last_changes(product_ids)
+
+                fetch_started = time.monotonic()
+                try:
+                    products = await product_client.get_products(
+                        product_ids, settings.SNAPSHOT_SYNC_CONCURRENCY
+                    )
+                except ServiceUnavailableException as e:
+                    logger.warning("snapshot_sync_interrupted", error=str(e))
+                    break
+
+                async with background_session_maker() as session:
+                    result.update(
+                        await SnapshotSyncService(session).apply(
+                            product_ids, products, last_changes
+                        )
+                    )
+                result["checked"] += len(product_ids)
+
+                pace = len(product_ids) / settings.SNAPSHOT_SYNC_RATE_LIMIT
+                await asyncio.sleep(max(0.0, pace - (time.monotonic() - fetch_started)))
+
+            async with background_session_maker() as session:
+                result["pruned"] = await SnapshotSyncService(session).prune()
+        finally:
+            await lock_connection.scalar(
+                select(func.pg_advisory_unlock(_SYNC_LOCK_KEY))
+            )
+
+    logger.info("snapshots_synced", **result)
+    return dict(result)
+
+
+async def run_snapshot_sync() -> None:
+    """Периодическая сверка до отмены задачи."""
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout=10.0, connect=5.0)
+    ) as http_client:
+        product_client = ProductClient(http_client)
+        while True:
+            await asyncio.sleep(settings.SNAPSHOT_SYNC_INTERVAL)
+            try:
+                await sync_snapshots(product_client)
+            except Exception:
+                logger.exception("snapshot_sync_failed")
@@ -0,0 +1,196 @@
+"""Монитор задержек event loop'а и медленных колбэков.
+
+Фоновый поток раз в LOOP_MONITOR_INTERVAL секунд ставит в event loop пустой
+колбэк (call_soon_threadsafe) и замеряет, через сколько он выполнится, —
+это задержка event loop'а (lag). Если колбэк не выполнился за
+LOOP_MONITOR_SLOW_THRESHOLD_MS, loop чем-то занят синхронно: поток, пока
+колбэк не выполнится, раз в LOOP_MONITOR_SAMPLE_INTERVAL секунд снимает стек
+потока event loop'а (как SamplingProfiler). Из стеков выбирается место в коде
+сервиса, которое держит loop, и по этим местам ведётся рейтинг.
+
+Пока loop свободен, поток только ставит колбэк раз в интервал: стеки не
+снимаются, запросы не инструментируются.
+"""
+
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import UTC, datetime
+from pathlib import Path
+from types import FrameType
+
+import structlog
+
+from src.config import settings
+from src.profiler import fold_stack
+
+logger = structlog.get_logger(__name__)
+
+
+# Кадры из этого каталога считаются кодом сервиса
+_SOURCE_ROOT = str(Path(__file__).parent)
+
+# Сколько последних остановок хранить для /internal/diagnostics/event-loop
+_RECENT_STALLS = 20
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def call_site(frame: FrameType) -> str:
+    """Самый глубокий кадр кода сервиса; без него — вершина стека.
+
+    Вершина стека обычно внутри библиотеки (json, pydantic, structlog),
+    а исправлять нужно вызывающее место в src/.
+    """
+    top = frame
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(_SOURCE_ROOT):
+            if frame is top:
+                return _frame_label(frame)
+            return f"{_frame_label(frame)} -> {top.f_code.co_name}"
+        frame = frame.f_back
+    return _frame_label(top)
+
+
+class EventLoopMonitor:
+    """Замеряет задержку event loop'а, в котором вызван start()."""
+
+    def __init__(self) -> None:
+        self.probes = 0
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self._lags: deque[float] = deque(maxlen=settings.LOOP_MONITOR_WINDOW)
+        self._recent: deque[dict] = deque(maxlen=_RECENT_STALLS)
+        self._sites: Counter[str] = Counter()
+        self._blocked_ms: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Запускает поток монитора; вызывается из работающего event loop'а."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="event-loop-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        threshold = settings.LOOP_MONITOR_SLOW_THRESHOLD_MS / 1000
+        report_at = time.monotonic() + settings.LOOP_MONITOR_REPORT_INTERVAL
+        while not self._stop.wait(settings.LOOP_MONITOR_INTERVAL):
+            executed = threading.Event()
+            sent = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(executed.set)
+            except RuntimeError:
+                # Loop закрыт — процесс завершается
+                return
+
+            stacks: Counter[str] = Counter()
+            sites: Counter[str] = Counter()
+            if not executed.wait(threshold):
+                while not executed.wait(settings.LOOP_MONITOR_SAMPLE_INTERVAL):
+                    if self._stop.is_set():
+                        return
+                    frame = sys._current_frames().get(self._loop_thread_id)
+                    if frame is not None:
+                        stacks[fold_stack(frame)] += 1
+                        sites[call_site(frame)] += 1
+            self._record((time.perf_counter() - sent) * 1000, stacks, sites)
+
+            if time.monotonic() >= report_at:
+                report_at = time.monotonic() + settings.LOOP_MONITOR_REPORT_INTERVAL
+                logger.info("event_loop_lag", **self.stats(top=5, recent=0))
+
+    def _record(self, lag_ms: float, stacks: Counter[str], sites: Counter[str]) -> None:
+        with self._lock:
+            self.probes += 1
+            self._lags.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if not stacks:
+                return
+            self.stalls += 1
+            self._sites.update(sites)
+            # Длительность остановки делится между местами пропорционально
+            # числу стеков: интервал сэмплинга под нагрузкой неточен
+            samples = sum(sites.values())
+            for site, count in sites.items():
+                self._blocked_ms[site] += lag_ms * count / samples
+            stall = {
+                "at": datetime.now(UTC).isoformat(),
+                "lag_ms": round(lag_ms, 1),
+                "samples": samples,
+                "call_site": sites.most_common(1)[0][0],
+                "stack": stacks.most_common(1)[0][0],
+            }
+            self._recent.append(stall)
+
+        logger.warning(
+            "event_loop_stall",
+            lag_ms=stall["lag_ms"],
+            samples=stall["samples"],
+            call_site=stall["call_site"],
+        )
+
+    def stats(self, top: int = 10, recent: int = _RECENT_STALLS) -> dict:
+        """Перцентили задержки за окно, самые частые места остановок."""
+        with self._lock:
+            lags = list(self._lags)
+            sites = [
+                (site, self._sites[site], blocked_ms)
+                for site, blocked_ms in self._blocked_ms.most_common(top)
+            ]
+            stalls = list(self._recent)[-recent:] if recent else []
+
+        if len(lags) > 1:
+            percentiles = statistics.quantiles(lags, n=100, method="inclusive")
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = lags[0] if lags else 0.0
+
+        result = {
+            "running": self.running,
+            "probes": self.probes,
+            "stalls": self.stalls,
+            "lag_p50_ms": round(p50, 2),
+            "lag_p95_ms": round(p95, 2),
+            "lag_p99_ms": round(p99, 2),
+            "lag_max_ms": round(self.max_lag_ms, 2),
+            "top_call_sites": [
+                {
+                    "call_site": site,
+                    "samples": count,
+                    "blocked_ms": round(blocked_ms, 1),
+                }
+                for site, count, blocked_ms in sites
+            ],
+        }
+        if recent:
+            result["recent_stalls"] = stalls
+        return result
+
+
+loop_monitor = EventLoopMonitor()
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,14 +7,29 @@ import structlog
 from contextlib import asynccontextmanager
 import httpx
 
+from src.api.health import router as health_router
 from src.api.v1.router import router as v1_router
 from src.api.internal.router import internal_router
 from src.config import settings
+from src.db.invalidation import invalidation_bus
 from src.logger import setup_logging, get_logger
+from src.loop_monitor import loop_monitor
+from src.middleware.admission import AdmissionControlMiddleware
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.deadline import DeadlineMiddleware
+from src.middleware.profiling import ProfilingMiddleware
 from src.middleware.request_logger import RequestLoggingMiddleware
-from src.exceptions import NotFoundException, ServiceUnavailableException
+from src.exceptions import (
+    ConflictException,
+    DeadlineExceededException,
+    NotFoundException,
+    ServiceUnavailableException,
+)
+from src.services.cart_events import cart_event_hub
+from src.services.health import HealthService
+from src.services.product_cache import product_cache
 from src.services.product_client import ProductClient
-from src.messaging.broker import broker, connect_broker
+from src.messaging.broker import broker, run_broker_connection
 from src.messaging.consumer import router as messaging_router
 
 setup_logging()
@@ -21,16 +38,38 @@ logger = get_logger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await connect_broker()
-
     # Инициализация HTTP клиента для Connection Pooling
     http_client = httpx.AsyncClient(timeout=httpx.Timeout(timeout=10.0, connect=5.0))
-    app.state.product_client = ProductClient(http_client)
+    app.state.product_client = ProductClient(http_client, product_cache)
+    app.state.health = HealthService(app.state.product_client)
+
+    # Прогрев БД и подключение к RabbitMQ идут в фоне: сервер сразу принимает
+    # трафик, а /health/ready становится успешным после прогрева.
+    # В режиме API_ONLY сообщения обрабатывает отдельный процесс src.worker.
+    background_tasks = [asyncio.create_task(app.state.health.warm_up())]
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if settings.INVALIDATION_ENABLED:
+        background_tasks.append(asyncio.create_task(invalidation_bus.run()))
+    unsubscribe_cart_events = invalidation_bus.subscribe(cart_event_hub.on_invalidation)
+    unsubscribe_product_cache = invalidation_bus.subscribe(
+        product_cache.on_invalidation
+    )
+    if not settings.API_ONLY:
+        background_tasks.append(asyncio.create_task(run_broker_connection()))
 
     yield
 
+    unsubscribe_cart_events()
+    unsubscribe_product_cache()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    loop_monitor.stop()
+
     await http_client.aclose()
-    await broker.close()
+    if not settings.API_ONLY:
+        await broker.close()
 
 
 app = FastAPI(
@@ -49,20 +88,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Профилирование подключается только явно — выключенное ничего не стоит
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
 
+# Дедлайн снаружи admission control: ожидание в очереди тратит бюджет запроса
+app.add_middleware(DeadlineMiddleware)
+# Сжатие снаружи дедлайна: готовый ответ не обрывается по 504 при сжатии
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
 
 
+app.include_router(health_router)
 app.include_router(v1_router)
 broker.include_router(messaging_router)
 app.include_router(internal_router)
 
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "cart-service"}
-
-
 @app.exception_handler(NotFoundException)
 async def not_found_handler(request: Request, exc: NotFoundException):
     return JSONResponse(
@@ -71,6 +117,14 @@ async def not_found_handler(request: Request, exc: NotFoundException):
     )
 
 
+@app.exception_handler(ConflictException)
+async def conflict_handler(request: Request, exc: ConflictException):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": exc.detail, "error_type": "conflict"},
+    )
+
+
 @app.exception_handler(ServiceUnavailableException)
 async def service_unavailable_handler(
     request: Request, exc: ServiceUnavailableException
@@ -81,6 +135,14 @@ async def service_unavailable_handler(
     )
 
 
+@app.exception_handler(DeadlineExceededException)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededException):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": exc.detail, "error_type": "deadline_exceeded"},
+    )
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
     # request_id АВТОМАТИЧЕСКИ добавляется в логи из контекста structlog
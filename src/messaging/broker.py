@@ -1,11 +1,15 @@
 import asyncio
+from aio_pika.exceptions import AMQPConnectionError
 from faststream.rabbit import RabbitBroker, RabbitQueue
 from src.config import settings
 from src.logger import get_logger
 
 logger = get_logger(__name__)
 
-broker = RabbitBroker(settings.RABBITMQ_URL)
+# graceful_timeout — сколько ждать обработки уже полученных сообщений при остановке
+broker = RabbitBroker(
+    settings.RABBITMQ_URL, graceful_timeout=settings.BROKER_GRACEFUL_SHUTDOWN_TIMEOUT
+)
 
 cart_items_remove_queue = RabbitQueue(
     "cart.items.remove",
@@ -13,6 +17,7 @@ cart_items_remove_queue = RabbitQueue(
 )
 
 _MAX_RETRIES = 5
+_RECONNECT_MAX_DELAY = 30  # секунды — потолок backoff для фонового подключения
 
 
 async def connect_broker() -> None:
@@ -34,3 +39,29 @@ async def connect_broker() -> None:
                 error=str(e),
             )
             await asyncio.sleep(2**attempt)
+
+
+async def run_broker_connection() -> None:
+    """Фоновое подключение к RabbitMQ: повторяет попытки, пока не подключится.
+
+    В отличие от connect_broker не ограничено числом попыток и не блокирует
+    старт HTTP-сервера. После подключения переподключение при обрывах
+    выполняет robust-соединение aio-pika.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await broker.connect()
+            await broker.start()
+            logger.info("rabbitmq_broker_connected", attempt=attempt)
+            return
+        except (AMQPConnectionError, OSError) as e:
+            delay = min(2**attempt, _RECONNECT_MAX_DELAY)
+            logger.warning(
+                "rabbitmq_broker_retry",
+                attempt=attempt,
+                retry_in=delay,
+                error=str(e),
+            )
+            await asyncio.sleep(delay)
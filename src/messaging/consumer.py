@@ -3,7 +3,7 @@ from faststream.rabbit import RabbitRouter
 
 from src.messaging.broker import cart_items_remove_queue
 from src.messaging.schemas import CartItemsRemoveMessageSchema
-from src.db.database import async_session_maker
+from src.db.database import background_session_maker
 from src.services.cart import CartService
 
 logger = structlog.get_logger(__name__)
@@ -20,7 +20,7 @@ async def cart_items_remove_subscriber(msg: CartItemsRemoveMessageSchema):
         message_id=str(msg.message_id),
     )
     try:
-        async with async_session_maker() as session:
+        async with background_session_maker() as session:
             cart_service = CartService(session)
             products_ids = [item.product_id for item in msg.items]
             deleted_count = await cart_service.delete_selected_items(
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from collections import deque
+
+import structlog
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.config import settings
+
+logger = structlog.get_logger()
+
+
+# Множитель лимита при медленном или неуспешном ответе (multiplicative decrease)
+_DECREASE_FACTOR = 0.9
+
+
+class AdaptiveLimiter:
+    """Адаптивный лимит одновременных запросов (AIMD) с ограниченной очередью.
+
+    Быстрый успешный ответ увеличивает лимит примерно на 1 за «окно» из limit
+    запросов, медленный (дольше цели группы) или 5xx — уменьшает в
+    _DECREASE_FACTOR раз, но не чаще раза за окно: запросы, которые уже
+    выполнялись в момент снижения, начаты при старом лимите, и их медленные
+    ответы лимит повторно не снижают. Запросы сверх лимита ждут в очереди не
+    дольше ADMISSION_QUEUE_TIMEOUT; при переполненной очереди отклоняются сразу.
+    """
+
+    def __init__(self, name: str, max_limit: int, latency_target_ms: float) -> None:
+        self.name = name
+        self.min_limit = min(settings.ADMISSION_MIN_LIMIT, max_limit)
+        self.max_limit = max_limit
+        self.latency_target_ms = latency_target_ms
+        self.limit = float(min(settings.ADMISSION_INITIAL_LIMIT, max_limit))
+        self.inflight = 0
+        self.rejected = 0
+        self.completed = 0
+        # Номер завершённого запроса, до которого снижения лимита пропускаются
+        self._decrease_after = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Занимает слот; False — запрос нужно отклонить."""
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return True
+
+        if len(self._waiters) >= settings.ADMISSION_QUEUE_SIZE:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(settings.ADMISSION_QUEUE_TIMEOUT):
+                await waiter
+        except TimeoutError:
+            self._abandon(waiter)
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            # Клиент отключился или сервер останавливается, пока запрос ждал
+            self._abandon(waiter)
+            raise
+        return True
+
+    def release(self, latency: float, success: bool) -> None:
+        """Освобождает слот и корректирует лимит по результату запроса."""
+        self.completed += 1
+        if success and latency * 1000 <= self.latency_target_ms:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif self.completed > self._decrease_after:
+            self.limit = max(self.min_limit, self.limit * _DECREASE_FACTOR)
+            # Следующее снижение — только после завершения остальных запросов,
+            # выполняющихся сейчас (inflight включает текущий)
+            self._decrease_after = self.completed + self.inflight - 1
+        self._release_slot()
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Убирает ожидание из очереди; уже выданный ему слот возвращает."""
+        if waiter.done() and not waiter.cancelled():
+            # Слот выдали одновременно с таймаутом или отменой
+            self._release_slot()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def _release_slot(self) -> None:
+        self.inflight -= 1
+        # Слоты передаются ожидающим напрямую, в порядке очереди
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "latency_target_ms": self.latency_target_ms,
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+# Отдельные бюджеты: шторм webhook'ов не должен вытеснять оформление заказов
+admission_limiters: dict[str, AdaptiveLimiter] = {
+    name: AdaptiveLimiter(
+        name,
+        max_limit,
+        settings.ADMISSION_LATENCY_TARGETS_MS.get(
+            name, settings.ADMISSION_LATENCY_TARGET_MS
+        ),
+    )
+    for name, max_limit in settings.ADMISSION_MAX_LIMITS.items()
+}
+
+
+# Окончания путей webhook'ов Product Service (POST /internal/cart/products/{id}/...)
+_WEBHOOK_SUFFIXES = ("/updated", "/out-of-stock", "/back-in-stock", "/deleted")
+
+
+def route_group(method: str, path: str) -> str | None:
+    """Группа бюджета для запроса; None — запрос не ограничивается."""
+    if path == "/api/v1/cart/events":
+        # Долгоживущий SSE-поток занимал бы слот всё время соединения
+        return None
+    if method == "POST" and (
+        path in ("/api/v1/cart/items", "/api/v1/cart/validate")
+        or (path.startswith("/internal/cart/") and path.endswith("/validate"))
+    ):
+        # Ждут Product Service с повторами: его задержки не должны снижать
+        # лимит для запросов, которые работают только с БД
+        return "product_calls"
+    if (
+        method == "POST"
+        and path.startswith("/internal/cart/products/")
+        and path.endswith(_WEBHOOK_SUFFIXES)
+    ):
+        # Счётчики товаров под тем же префиксом — чтение, их бюджет — orders
+        return "webhooks"
+    if path.startswith("/internal/cart"):
+        return "orders"
+    if path.startswith("/api/v1/"):
+        return "public"
+    return None
+
+
+class AdmissionControlMiddleware(BaseHTTPMiddleware):
+    """Отклоняет запросы с 503 и Retry-After, когда лимит группы исчерпан."""
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        limiter = admission_limiters.get(route_group(request.method, request.url.path))
+        if limiter is None:
+            return await call_next(request)
+
+        if not await limiter.acquire():
+            logger.warning(
+                "request_shed",
+                group=limiter.name,
+                path=request.url.path,
+                **limiter.stats(),
+            )
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={
+                    "detail": "Service is overloaded, retry later",
+                    "error_type": "overloaded",
+                },
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+            )
+
+        start_time = time.perf_counter()
+        success = False
+        try:
+            response = await call_next(request)
+            success = response.status_code < status.HTTP_500_INTERNAL_SERVER_ERROR
+            return response
+        finally:
+            limiter.release(time.perf_counter() - start_time, success)
@@ -0,0 +1,99 @@
+import asyncio
+import gzip
+
+import brotli
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.config import settings
+
+
+def _accepted_encodings(header: str) -> dict[str, float]:
+    """Кодировки из Accept-Encoding с их q-значениями."""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(header: str) -> str | None:
+    """br, если клиент его принимает, иначе gzip."""
+    encodings = _accepted_encodings(header)
+    for encoding in ("br", "gzip"):
+        if encodings.get(encoding, encodings.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware(BaseHTTPMiddleware):
+    """Сжимает ответы (gzip/br) от COMPRESSION_MIN_SIZE байт.
+
+    Сжимаются только ответы с Content-Length и типом из COMPRESSION_MEDIA_TYPES:
+    потоковые ответы (SSE, выгрузки, пакетное чтение) не буферизуются и
+    проходят как есть. Тела от COMPRESSION_THREAD_MIN_SIZE байт сжимаются в
+    пуле потоков, чтобы не блокировать event loop.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        response = await call_next(request)
+
+        encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None or not self._compressible(request, response):
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        if len(body) >= settings.COMPRESSION_THREAD_MIN_SIZE:
+            compressed = await asyncio.to_thread(compress, body, encoding)
+        else:
+            compressed = compress(body, encoding)
+
+        headers = dict(response.headers)
+        headers.pop("content-length", None)
+        if len(compressed) >= len(body):
+            return Response(body, response.status_code, headers)
+
+        headers["Content-Encoding"] = encoding
+        headers["Vary"] = ", ".join(
+            filter(None, [headers.pop("vary", None), "Accept-Encoding"])
+        )
+        # Сжатое представление не совпадает побайтно — ETag становится слабым
+        etag = headers.pop("etag", None)
+        if etag is not None:
+            headers["ETag"] = etag if etag.startswith("W/") else f"W/{etag}"
+        return Response(compressed, response.status_code, headers)
+
+    @staticmethod
+    def _compressible(request: Request, response: Response) -> bool:
+        if "content-encoding" in response.headers:
+            return False
+        if any(
+            request.url.path.startswith(prefix)
+            for prefix in settings.COMPRESSION_EXCLUDE_PATHS
+        ):
+            return False
+
+        content_length = response.headers.get("content-length")
+        if (
+            content_length is None
+            or int(content_length) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return False
+
+        media_type = response.headers.get("content-type", "").partition(";")[0]
+        return media_type.strip() in settings.COMPRESSION_MEDIA_TYPES
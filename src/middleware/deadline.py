@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import structlog
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.config import settings
+from src.context import remaining_time, request_deadline
+
+logger = structlog.get_logger()
+
+
+def _route_timeout_ms(path: str) -> int:
+    """Бюджет маршрута по самому длинному совпавшему префиксу."""
+    matches = [
+        prefix for prefix in settings.REQUEST_TIMEOUTS_MS if path.startswith(prefix)
+    ]
+    if not matches:
+        return settings.REQUEST_TIMEOUT_MS
+    return settings.REQUEST_TIMEOUTS_MS[max(matches, key=len)]
+
+
+def _timeout_ms(request: Request) -> int:
+    """Бюджет запроса: бюджет маршрута, сокращённый заголовком X-Request-Timeout."""
+    timeout_ms = _route_timeout_ms(request.url.path)
+    try:
+        requested_ms = int(request.headers.get("X-Request-Timeout", ""))
+    except ValueError:
+        return timeout_ms
+
+    if requested_ms <= 0:
+        return timeout_ms
+    return min(timeout_ms, requested_ms) if timeout_ms else requested_ms
+
+
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """Устанавливает дедлайн запроса и прерывает обработку после него (504).
+
+    Дедлайн хранится в contextvar: ProductClient ограничивает по нему таймауты
+    и ретраи, сессии БД — statement_timeout.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        timeout_ms = _timeout_ms(request)
+        if not timeout_ms:
+            return await call_next(request)
+
+        request_deadline.set(time.monotonic() + timeout_ms / 1000)
+        try:
+            async with asyncio.timeout(timeout_ms / 1000):
+                return await call_next(request)
+        except Exception:
+            # Любая ошибка после истечения дедлайна (в т.ч. отмена запроса
+            # по statement_timeout) — следствие нехватки времени
+            remaining = remaining_time()
+            if remaining is None or remaining > 0:
+                raise
+
+        logger.warning(
+            "request_deadline_exceeded",
+            path=request.url.path,
+            timeout_ms=timeout_ms,
+        )
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content={
+                "detail": "Request deadline exceeded",
+                "error_type": "deadline_exceeded",
+            },
+        )
@@ -0,0 +1,55 @@
+import asyncio
+
+import structlog
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.profiler import (
+    SamplingProfiler,
+    is_profiling_allowed,
+    profiling_lock,
+    save_report,
+)
+
+logger = structlog.get_logger()
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """Профилирует запрос с заголовками X-Profile: 1 и X-Profile-Token.
+
+    ID сохранённого отчёта возвращается в заголовке X-Profile-Report, сам отчёт
+    доступен через GET /internal/profiling/reports/{report_id}. Подключается
+    только при PROFILING_ENABLED=True.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        if request.headers.get("X-Profile") != "1" or not is_profiling_allowed(
+            request.headers.get("X-Profile-Token")
+        ):
+            return await call_next(request)
+
+        if not profiling_lock.acquire(blocking=False):
+            response = await call_next(request)
+            response.headers["X-Profile-Report"] = "busy"
+            return response
+
+        try:
+            profiler = SamplingProfiler()
+            profiler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                report = profiler.stop()
+        finally:
+            profiling_lock.release()
+
+        report_id = await asyncio.to_thread(save_report, report)
+        logger.info(
+            "request_profiled",
+            path=request.url.path,
+            report_id=report_id,
+            samples=profiler.samples,
+        )
+        response.headers["X-Profile-Report"] = report_id
+        return response
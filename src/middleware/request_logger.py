@@ -6,6 +6,9 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
+from src.config import settings
+from src.context import RequestTimings, request_timings
+
 logger = structlog.get_logger()
 
 
@@ -20,6 +23,11 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             client_ip=client_ip,
         )
 
+        # Объект общий для всего запроса: хуки SQLAlchemy и ProductClient
+        # увеличивают его счётчики из дочерних задач
+        timings = RequestTimings()
+        request_timings.set(timings)
+
         start_time = time.perf_counter()
         response = await call_next(request)
         duration_ms = (time.perf_counter() - start_time) * 1000
@@ -33,7 +41,30 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             status_code=response.status_code,
             path=request.url.path,
             duration_ms=round(duration_ms, 2),
+            db_queries=timings.db_queries,
+            db_time_ms=round(timings.db_time * 1000, 2),
+            product_calls=timings.product_calls,
+            product_time_ms=round(timings.product_time * 1000, 2),
         )
+        self._check_query_budget(request, timings)
 
         response.headers["X-Request-ID"] = request_id
+        response.headers["Server-Timing"] = timings.server_timing(duration_ms)
         return response
+
+    @staticmethod
+    def _check_query_budget(request: Request, timings: RequestTimings) -> None:
+        """Предупреждает, если маршрут выполнил больше SQL-запросов, чем положено."""
+        route = request.scope.get("route")
+        if route is None:
+            return
+
+        route_key = f"{request.method} {route.path}"
+        budget = settings.SQL_QUERY_BUDGETS.get(route_key, settings.SQL_QUERY_BUDGET)
+        if timings.db_queries > budget:
+            logger.warning(
+                "sql_query_budget_exceeded",
+                route=route_key,
+                db_queries=timings.db_queries,
+                budget=budget,
+            )
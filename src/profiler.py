@@ -0,0 +1,100 @@
+"""Сэмплирующий профайлер для живых запросов.
+
+Фоновый поток раз в PROFILING_INTERVAL секунд снимает стек потока event loop'а
+через sys._current_frames() и копит свёрнутые стеки (folded-формат, который
+понимают flamegraph.pl, speedscope и inferno). Код запросов не
+инструментируется, поэтому накладные расходы — только на сам сэмплинг.
+"""
+
+import hmac
+import sys
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+from src.config import settings
+
+
+def is_profiling_allowed(token: str | None) -> bool:
+    """Профилирование включено и передан верный PROFILING_TOKEN."""
+    if not settings.PROFILING_ENABLED or not settings.PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, settings.PROFILING_TOKEN)
+
+
+def fold_stack(frame: FrameType | None) -> str:
+    """Стек в folded-формате: кадры от корня к вершине через ';'."""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Сэмплирует стек потока, в котором был создан (поток event loop'а)."""
+
+    def __init__(self, interval: float | None = None) -> None:
+        self.interval = interval or settings.PROFILING_INTERVAL
+        self.samples = 0
+        self._thread_id = threading.get_ident()
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Останавливает сэмплинг и возвращает отчёт в folded-формате."""
+        self._stop.set()
+        self._thread.join()
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self._stacks.most_common()
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stacks[fold_stack(frame)] += 1
+                self.samples += 1
+
+
+# Одновременно работает не больше одного профайлера на процесс
+profiling_lock = threading.Lock()
+
+
+def save_report(report: str) -> str:
+    """Сохраняет отчёт в PROFILING_OUTPUT_DIR и возвращает его ID.
+
+    Хранятся последние PROFILING_MAX_REPORTS отчётов, старые удаляются.
+    """
+    output_dir = Path(settings.PROFILING_OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    report_id = uuid.uuid4().hex
+    (output_dir / f"{report_id}.folded").write_text(report)
+
+    reports = sorted(output_dir.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old_report in reports[: -settings.PROFILING_MAX_REPORTS]:
+        old_report.unlink(missing_ok=True)
+    return report_id
+
+
+def load_report(report_id: str) -> str | None:
+    """Читает сохранённый отчёт; None, если его нет."""
+    try:
+        report_id = uuid.UUID(report_id).hex
+    except ValueError:
+        return None
+
+    path = Path(settings.PROFILING_OUTPUT_DIR) / f"{report_id}.folded"
+    if not path.exists():
+        return None
+    return path.read_text()
@@ -1,13 +1,162 @@
 import uuid
+from collections.abc import AsyncIterator, Collection, Iterable, Mapping, Sequence
+from datetime import datetime
 from typing import Any
 
-from sqlalchemy import Row, delete, select, update
+from sqlalchemy import (
+    BigInteger,
+    Delete,
+    Insert,
+    Row,
+    Update,
+    and_,
+    any_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from src.db.models import CartItemModel
+from src.db.invalidation import invalidate_product, invalidate_user
+from src.db.models import CartArchiveModel, CartItemModel
+
+
+def _effective_price():
+    """Цена для расчёта итогов: current_price, если цена изменилась, иначе снапшот."""
+    return case(
+        (
+            and_(
+                CartItemModel.price_changed,
+                CartItemModel.current_price.is_not(None),
+            ),
+            CartItemModel.current_price,
+        ),
+        else_=CartItemModel.product_price,
+    )
+
+
+# Колонки позиции в JSON-представлении (архив, документное хранилище):
+# все колонки cart_items, кроме user_id
+ITEM_DOCUMENT_COLUMNS = [
+    column for column in CartItemModel.__table__.columns if column.key != "user_id"
+]
+_DATETIME_COLUMNS = ("created_at", "updated_at")
+
+
+def item_to_document(item: CartItemModel) -> dict[str, Any]:
+    """Позиция в JSON-совместимый словарь (UUID и даты — строками)."""
+    document = {}
+    for column in ITEM_DOCUMENT_COLUMNS:
+        value = getattr(item, column.key)
+        if isinstance(value, (uuid.UUID, datetime)):
+            value = str(value) if isinstance(value, uuid.UUID) else value.isoformat()
+        document[column.key] = value
+    return document
+
+
+def item_from_document(user_id: uuid.UUID, document: dict[str, Any]) -> dict[str, Any]:
+    """Значения колонок cart_items из JSON-представления позиции."""
+    values = {
+        column.key: document[column.key]
+        for column in ITEM_DOCUMENT_COLUMNS
+        if column.key in document
+    }
+    values["id"] = uuid.UUID(values["id"])
+    for key in _DATETIME_COLUMNS:
+        values[key] = datetime.fromisoformat(values[key])
+    values["user_id"] = user_id
+    return values
+
+
+def _archived_items():
+    """Позиции архивных корзин в виде строк cart_items.
+
+    Товар, который пользователь добавил заново после архивации, берётся из
+    cart_items — как при возврате корзины.
+    """
+    item = (
+        func.jsonb_to_recordset(CartArchiveModel.items)
+        .table_valued(*(literal_column(c.key, c.type) for c in ITEM_DOCUMENT_COLUMNS))
+        .render_derived("item", with_types=True)
+    )
+    live = aliased(CartItemModel)
+    return (
+        select(
+            *(
+                CartArchiveModel.user_id if c.key == "user_id" else item.c[c.key]
+                for c in CartItemModel.__table__.columns
+            )
+        )
+        .select_from(CartArchiveModel)
+        .join(item, true())
+        .where(
+            ~exists().where(
+                live.user_id == CartArchiveModel.user_id,
+                live.product_id == item.c.product_id,
+            )
+        )
+    )
+
+
+# Состояние позиции в результате изменения с возвратом корзины
+ROW_UNCHANGED = "unchanged"
+ROW_CHANGED = "changed"
+ROW_DELETED = "deleted"
+
+
+def _next_version():
+    """Новая версия позиции для массовых UPDATE (ORM-flush увеличивает сам)."""
+    return CartItemModel.version + 1
+
+
+def _matches(item_ids: Iterable[uuid.UUID], versions: dict[uuid.UUID, int]):
+    """Условие на позиции: с ожидаемой версией — только если она совпадает."""
+    unversioned = [item_id for item_id in item_ids if item_id not in versions]
+    return or_(
+        CartItemModel.id.in_(unversioned),
+        *(
+            and_(CartItemModel.id == item_id, CartItemModel.version == version)
+            for item_id, version in versions.items()
+            if item_id in item_ids
+        ),
+    )
+
+
+def _upsert(item: CartItemModel) -> Insert:
+    """INSERT позиции; товар уже в корзине — прибавляет количество к его позиции."""
+    values = {
+        column.key: getattr(item, column.key)
+        for column in CartItemModel.__table__.columns
+        if getattr(item, column.key) is not None
+    }
+    values.setdefault("id", uuid.uuid4())
+    query = insert(CartItemModel).values(**values)
+    return query.on_conflict_do_update(
+        constraint="uq_cart_items_user_product",
+        set_={
+            "quantity": CartItemModel.quantity + query.excluded.quantity,
+            "version": _next_version(),
+            "updated_at": func.now(),
+        },
+    )
 
 
 class CartRepository:
+    # Корзины переносятся в архив холодных корзин (src.services.cart_archive)
+    archivable = True
+
     def __init__(self, session: AsyncSession):
         self.session = session
 
@@ -21,6 +170,35 @@ class CartRepository:
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
+    async def get_fields_by_user(
+        self, user_id: uuid.UUID, columns: Collection[str]
+    ) -> list[Row]:
+        """Позиции корзины пользователя, только колонки columns."""
+        query = (
+            select(*(getattr(CartItemModel, column) for column in sorted(columns)))
+            .where(CartItemModel.user_id == user_id)
+            .order_by(CartItemModel.created_at)
+        )
+        result = await self.session.execute(query)
+        return list(result.all())
+
+    async def get_by_users(self, user_ids: list[uuid.UUID]) -> list[CartItemModel]:
+        """Все элементы корзин указанных пользователей (user_id = ANY(:ids)).
+
+        Порядок пользователей совпадает с порядком user_ids.
+        """
+        ids = bindparam("user_ids", user_ids, type_=ARRAY(UUID(as_uuid=True)))
+        query = (
+            select(CartItemModel)
+            .where(CartItemModel.user_id == any_(ids))
+            .order_by(
+                func.array_position(ids, CartItemModel.user_id),
+                CartItemModel.created_at,
+            )
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
     async def get_item(
         self, item_id: uuid.UUID, user_id: uuid.UUID
     ) -> CartItemModel | None:
@@ -41,6 +219,87 @@ class CartRepository:
         result = await self.session.execute(query)
         return list(result.all())
 
+    def _checkout_snapshot_query(self, user_id: uuid.UUID):
+        """Выбранные и доступные для заказа позиции с эффективной ценой."""
+        return (
+            select(
+                CartItemModel.id,
+                CartItemModel.product_id,
+                CartItemModel.quantity,
+                CartItemModel.product_name,
+                CartItemModel.product_image,
+                _effective_price().label("price"),
+            )
+            .where(
+                CartItemModel.user_id == user_id,
+                CartItemModel.is_selected,
+                CartItemModel.out_of_stock.is_(False),
+                CartItemModel.product_deleted.is_(False),
+            )
+            .order_by(CartItemModel.created_at, CartItemModel.id)
+        )
+
+    async def get_checkout_snapshot(self, user_id: uuid.UUID) -> list[Row]:
+        """Снапшот корзины для оформления заказа одним запросом.
+
+        Итоги считаются оконными функциями, поэтому total_price и total_items
+        повторяются в каждой строке.
+        """
+        price = _effective_price()
+        query = self._checkout_snapshot_query(user_id).add_columns(
+            # sum(bigint) в PostgreSQL возвращает numeric — приводим обратно
+            cast(func.sum(price * CartItemModel.quantity).over(), BigInteger).label(
+                "total_price"
+            ),
+            func.sum(CartItemModel.quantity).over().label("total_items"),
+        )
+        result = await self.session.execute(query)
+        return list(result.all())
+
+    async def lock_checkout_snapshot(self, user_id: uuid.UUID) -> list[Row]:
+        """Снапшот корзины с блокировкой строк (FOR UPDATE) до конца транзакции."""
+        query = self._checkout_snapshot_query(user_id).with_for_update(of=CartItemModel)
+        result = await self.session.execute(query)
+        return list(result.all())
+
+    async def stream_items(
+        self,
+        batch_size: int,
+        *,
+        after: uuid.UUID | None = None,
+        updated_since: datetime | None = None,
+        product_id: int | None = None,
+        flags: Mapping[str, bool] | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Потоковое чтение позиций пачками через server-side курсор.
+
+        Вместе с cart_items выгружаются позиции архивных корзин — в том виде,
+        в каком лежат в cart_archive (изменения из журнала применяет задача
+        архивации). Строки идут в порядке id, что позволяет продолжить
+        выгрузку с места обрыва (after). flags — значения флагов позиции
+        (is_selected, price_changed, ...). Память не зависит от размера таблицы.
+        """
+        table = union_all(select(CartItemModel.__table__), _archived_items()).subquery()
+        query = select(table).order_by(table.c.id)
+
+        if after is not None:
+            query = query.where(table.c.id > after)
+        if updated_since is not None:
+            query = query.where(table.c.updated_at >= updated_since)
+        if product_id is not None:
+            query = query.where(table.c.product_id == product_id)
+        for flag, value in (flags or {}).items():
+            query = query.where(table.c[flag].is_(value))
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await self.session.stream(
+            query.execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+
     async def get_by_user_and_product(
         self, user_id: uuid.UUID, product_id: int
     ) -> CartItemModel | None:
@@ -53,37 +312,239 @@ class CartRepository:
         return result.scalar_one_or_none()
 
     async def create(self, item: CartItemModel) -> CartItemModel:
-        """Создание нового элемента корзины."""
-        self.session.add(item)
-        await self.session.flush()
-        await self.session.refresh(item)
-        return item
+        """Создание элемента корзины.
+
+        Товар уже в корзине (его добавил параллельный запрос) — количество
+        его позиции увеличивается.
+        """
+        invalidate_user(self.session, item.user_id)
+        query = _upsert(item).returning(CartItemModel)
+        result = await self.session.execute(
+            query, execution_options={"populate_existing": True}
+        )
+        return result.scalar_one()
+
+    async def _update_item(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+        **values: Any,
+    ) -> CartItemModel | None:
+        """UPDATE одной позиции; None — позиции нет или версия не совпала.
+
+        Версия проверяется, только если передана expected_version.
+        """
+        invalidate_user(self.session, user_id)
+        versions = {item_id: expected_version} if expected_version is not None else {}
+        query = (
+            update(CartItemModel)
+            .where(CartItemModel.user_id == user_id, _matches([item_id], versions))
+            .values(**values, version=_next_version())
+            .returning(CartItemModel)
+        )
+        result = await self.session.execute(
+            query, execution_options={"populate_existing": True}
+        )
+        return result.scalar_one_or_none()
 
     async def update_quantity(
-        self, item: CartItemModel, quantity: int
-    ) -> CartItemModel:
+        self, item: CartItemModel, quantity: int, expected_version: int | None = None
+    ) -> CartItemModel | None:
         """Обновление количества товара в корзине."""
-        item.quantity = quantity
-        await self.session.flush()
-        await self.session.refresh(item)
-        return item
+        return await self._update_item(
+            item.user_id, item.id, expected_version, quantity=quantity
+        )
+
+    async def add_quantity(
+        self, user_id: uuid.UUID, item_id: uuid.UUID, delta: int
+    ) -> CartItemModel | None:
+        """Атомарное увеличение количества позиции."""
+        return await self._update_item(
+            user_id, item_id, quantity=CartItemModel.quantity + delta
+        )
 
     async def update_selection(
-        self, item: CartItemModel, is_selected: bool
-    ) -> CartItemModel:
+        self,
+        item: CartItemModel,
+        is_selected: bool,
+        expected_version: int | None = None,
+    ) -> CartItemModel | None:
         """Обновление статуса выбора товара."""
-        item.is_selected = is_selected
-        await self.session.flush()
-        await self.session.refresh(item)
-        return item
+        return await self._update_item(
+            item.user_id, item.id, expected_version, is_selected=is_selected
+        )
+
+    async def _apply_returning_cart(
+        self, user_id: uuid.UUID, *changes: Insert | Update | Delete
+    ) -> list[tuple[CartItemModel, str]]:
+        """Выполняет изменения и читает корзину пользователя одним оператором.
+
+        Изменения выполняются в CTE с RETURNING. Основной SELECT видит снимок
+        до изменений, поэтому затронутые строки берутся из RETURNING, остальные —
+        из cart_items. Каждая позиция помечена состоянием ROW_UNCHANGED,
+        ROW_CHANGED или ROW_DELETED — по нему сервис проверяет, что изменение
+        нашло строки, и исключает удалённые из ответа.
+        """
+        invalidate_user(self.session, user_id)
+        columns = list(CartItemModel.__table__.columns)
+        ctes = [
+            change.returning(*columns).cte(f"change_{number}")
+            for number, change in enumerate(changes)
+        ]
+        touched = union_all(*(select(cte.c.id) for cte in ctes))
+
+        parts = [
+            select(*columns, literal_column(f"'{ROW_UNCHANGED}'").label("row_state"))
+            .where(CartItemModel.user_id == user_id)
+            .where(CartItemModel.id.not_in(touched))
+        ]
+        for change, cte in zip(changes, ctes):
+            state = ROW_DELETED if isinstance(change, Delete) else ROW_CHANGED
+            parts.append(
+                select(*cte.c, literal_column(f"'{state}'").label("row_state"))
+            )
+
+        cart = union_all(*parts).subquery("cart")
+        item = aliased(CartItemModel, cart)
+        query = (
+            select(item, cart.c.row_state)
+            .order_by(cart.c.created_at)
+            .execution_options(populate_existing=True)
+        )
+        result = await self.session.execute(query)
+        return [(row[0], row[1]) for row in result.all()]
+
+    async def create_returning_cart(
+        self, item: CartItemModel
+    ) -> list[tuple[CartItemModel, str]]:
+        """Создание элемента корзины (как create) с возвратом всей корзины."""
+        return await self._apply_returning_cart(item.user_id, _upsert(item))
+
+    async def update_item_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+        **values: Any,
+    ) -> list[tuple[CartItemModel, str]]:
+        """Обновление одной позиции пользователя с возвратом всей корзины.
+
+        С expected_version — compare-and-swap: позиция с другой версией
+        останется в корзине неизменённой.
+        """
+        versions = {item_id: expected_version} if expected_version is not None else {}
+        query = (
+            update(CartItemModel)
+            .where(CartItemModel.user_id == user_id, _matches([item_id], versions))
+            .values(**values, version=_next_version())
+        )
+        return await self._apply_returning_cart(user_id, query)
+
+    async def add_quantity_returning_cart(
+        self, user_id: uuid.UUID, item_id: uuid.UUID, delta: int
+    ) -> list[tuple[CartItemModel, str]]:
+        """Атомарное увеличение количества позиции с возвратом всей корзины."""
+        return await self.update_item_returning_cart(
+            user_id, item_id, quantity=CartItemModel.quantity + delta
+        )
+
+    async def update_items_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        values: dict[uuid.UUID, dict[str, Any]],
+        versions: dict[uuid.UUID, int],
+    ) -> list[tuple[CartItemModel, str]]:
+        """Обновление нескольких позиций разными значениями одним UPDATE.
+
+        values — новые значения колонок по id позиции; набор колонок у позиций
+        может различаться. Значения подставляются через CASE по id позиции.
+        Позиции из versions изменяются, только если их версия совпадает с
+        ожидаемой.
+        """
+        columns = {column for item_values in values.values() for column in item_values}
+        assignments = {"version": _next_version()}
+        for column in columns:
+            attribute = getattr(CartItemModel, column)
+            assignments[column] = case(
+                {
+                    item_id: literal(item_values[column], attribute.type)
+                    for item_id, item_values in values.items()
+                    if column in item_values
+                },
+                value=CartItemModel.id,
+                else_=attribute,
+            )
+        query = (
+            update(CartItemModel)
+            .where(CartItemModel.user_id == user_id, _matches(values.keys(), versions))
+            .values(**assignments)
+        )
+        return await self._apply_returning_cart(user_id, query)
+
+    async def delete_item_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+    ) -> list[tuple[CartItemModel, str]]:
+        """Удаление одной позиции пользователя с возвратом всей корзины."""
+        versions = {item_id: expected_version} if expected_version is not None else {}
+        query = delete(CartItemModel).where(
+            CartItemModel.user_id == user_id, _matches([item_id], versions)
+        )
+        return await self._apply_returning_cart(user_id, query)
+
+    async def bulk_update_items(
+        self,
+        user_id: uuid.UUID,
+        quantities: dict[uuid.UUID, int],
+        selections: dict[uuid.UUID, bool],
+        removals: list[uuid.UUID],
+        versions: dict[uuid.UUID, int],
+    ) -> list[tuple[CartItemModel, str]]:
+        """Пакетное изменение позиций и чтение корзины одним оператором.
+
+        Количество и выбор обновляются одним UPDATE (значения подставляются
+        через CASE по id позиции), удаление — одним DELETE. Позиции из versions
+        изменяются, только если их версия совпадает с ожидаемой.
+        """
+        changes = []
+        if quantities or selections:
+            values = {"version": _next_version()}
+            if quantities:
+                values["quantity"] = case(
+                    quantities, value=CartItemModel.id, else_=CartItemModel.quantity
+                )
+            if selections:
+                values["is_selected"] = case(
+                    selections,
+                    value=CartItemModel.id,
+                    else_=CartItemModel.is_selected,
+                )
+            changes.append(
+                update(CartItemModel)
+                .where(
+                    CartItemModel.user_id == user_id,
+                    _matches(quantities.keys() | selections.keys(), versions),
+                )
+                .values(**values)
+            )
+        if removals:
+            changes.append(
+                delete(CartItemModel).where(
+                    CartItemModel.user_id == user_id,
+                    _matches(removals, versions),
+                )
+            )
+        return await self._apply_returning_cart(user_id, *changes)
 
     async def update_selection_for_all(
         self, user_id: uuid.UUID, is_selected: bool
-    ) -> int:
-        """Массовое обновление is_selected для всей корзины пользователя.
+    ) -> list[tuple[CartItemModel, str]]:
+        """Массовое обновление is_selected с возвратом всей корзины.
 
         При is_selected=True пропускает товары с out_of_stock=True или product_deleted=True.
-        Возвращает количество затронутых строк.
         """
         query = update(CartItemModel).where(CartItemModel.user_id == user_id)
 
@@ -93,19 +554,42 @@ class CartRepository:
                 CartItemModel.product_deleted.is_(False),
             )
 
-        query = query.values(is_selected=is_selected)
-        result = await self.session.execute(query)
-        await self.session.flush()
-        return result.rowcount
+        query = query.values(is_selected=is_selected, version=_next_version())
+        return await self._apply_returning_cart(user_id, query)
 
-    async def delete_item(self, item: CartItemModel) -> None:
-        """Удаление одного элемента из корзины."""
-        await self.session.delete(item)
-        await self.session.flush()
+    async def delete_item(
+        self, item: CartItemModel, expected_version: int | None = None
+    ) -> bool:
+        """Удаление одного элемента из корзины.
+
+        False — позиции нет или версия не совпала (проверяется, только если
+        передана expected_version).
+        """
+        invalidate_user(self.session, item.user_id)
+        versions = {item.id: expected_version} if expected_version is not None else {}
+        query = (
+            delete(CartItemModel)
+            .where(CartItemModel.user_id == item.user_id, _matches([item.id], versions))
+            .returning(CartItemModel.id)
+        )
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none() is not None
 
     async def delete_all(self, user_id: uuid.UUID) -> int:
         """Очистка всей корзины пользователя. Возвращает количество удалённых строк."""
         query = delete(CartItemModel).where(CartItemModel.user_id == user_id)
+        invalidate_user(self.session, user_id)
+        result = await self.session.execute(query)
+        await self.session.flush()
+        return result.rowcount
+
+    async def delete_items(self, user_id: uuid.UUID, item_ids: list[uuid.UUID]) -> int:
+        """Удаление позиций пользователя по id. Возвращает количество удалённых строк."""
+        query = delete(CartItemModel).where(
+            CartItemModel.user_id == user_id,
+            CartItemModel.id.in_(item_ids),
+        )
+        invalidate_user(self.session, user_id)
         result = await self.session.execute(query)
         await self.session.flush()
         return result.rowcount
@@ -115,6 +599,7 @@ class CartRepository:
             CartItemModel.user_id == user_id,
             CartItemModel.product_id.in_(items),
         )
+        invalidate_user(self.session, user_id)
         result = await self.session.execute(query)
         await self.session.flush()
         return result.rowcount
@@ -141,15 +626,17 @@ class CartRepository:
                 price_changed=CartItemModel.product_price != new_price,
                 product_name=new_name,
                 product_image=new_image,
+                version=_next_version(),
             )
         )
+        invalidate_product(self.session, product_id)
         result = await self.session.execute(query)
         await self.session.flush()
         return result.rowcount
 
     async def mark_out_of_stock(self, product_id: int, value: bool) -> int:
         """Установить или сбросить флаг out_of_stock для всех позиций с product_id."""
-        values = {"out_of_stock": value}
+        values = {"out_of_stock": value, "version": _next_version()}
         if value is True:
             values["is_selected"] = False
 
@@ -158,6 +645,7 @@ class CartRepository:
             .where(CartItemModel.product_id == product_id)
             .values(**values)
         )
+        invalidate_product(self.session, product_id)
         result = await self.session.execute(query)
         await self.session.flush()
         return result.rowcount
@@ -167,8 +655,9 @@ class CartRepository:
         query = (
             update(CartItemModel)
             .where(CartItemModel.product_id == product_id)
-            .values(product_deleted=True, is_selected=False)
+            .values(product_deleted=True, is_selected=False, version=_next_version())
         )
+        invalidate_product(self.session, product_id)
         result = await self.session.execute(query)
         await self.session.flush()
         return result.rowcount
@@ -178,7 +667,8 @@ class CartRepository:
         query = (
             update(CartItemModel)
             .where(CartItemModel.product_id == product_id)
-            .values(**fields)
+            .values(**fields, version=_next_version())
         )
+        invalidate_product(self.session, product_id)
         await self.session.execute(query)
         await self.session.flush()
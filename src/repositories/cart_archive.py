@@ -0,0 +1,244 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import (
+    BigInteger,
+    and_,
+    cast,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.invalidation import invalidate_user
+from src.db.models import (
+    CartActivityModel,
+    CartArchiveChangeModel,
+    CartArchiveModel,
+    CartItemModel,
+)
+from src.repositories.cart import ITEM_DOCUMENT_COLUMNS, item_from_document
+
+
+def _contains_product(product_id):
+    """product_ids архива содержит товар (@> — использует GIN-индекс)."""
+    return CartArchiveModel.product_ids.contains(array([product_id]))
+
+
+async def _skip_product_stats(session: AsyncSession, skip: bool) -> None:
+    """Включает и выключает триггеры cart_product_stats до конца транзакции.
+
+    Перенос в архив не меняет счётчики: архивные позиции в них учитываются.
+    """
+    await session.execute(
+        select(
+            func.set_config("cart.product_stats_skip", "on" if skip else "off", True)
+        )
+    )
+
+
+class CartArchiveRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def touch(self, user_id: uuid.UUID) -> None:
+        """Отметка обращения пользователя к корзине."""
+        query = insert(CartActivityModel).values(
+            user_id=user_id, last_seen_at=func.now()
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[CartActivityModel.user_id],
+            set_={"last_seen_at": query.excluded.last_seen_at},
+        )
+        await self.session.execute(query)
+
+    async def get_many(self, user_ids: list[uuid.UUID]) -> list[CartArchiveModel]:
+        """Архивы указанных пользователей (без возврата в cart_items)."""
+        query = select(CartArchiveModel).where(CartArchiveModel.user_id.in_(user_ids))
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def exists(self, user_id: uuid.UUID) -> bool:
+        """Есть ли у пользователя архивная корзина."""
+        query = select(exists().where(CartArchiveModel.user_id == user_id))
+        return bool(await self.session.scalar(query))
+
+    async def lock_changes(self) -> None:
+        """Блокировка журнала изменений до конца транзакции (SHARE).
+
+        Ждёт завершения webhook'ов, уже записавших изменение, и не даёт начаться
+        новым: после неё журнал содержит все изменения, которых не видно в
+        cart_items, а cart_items — все изменения журнала. Webhook'и пишут журнал
+        до UPDATE cart_items, поэтому взаимных блокировок нет.
+        """
+        await self.session.execute(
+            text(f"LOCK TABLE {CartArchiveChangeModel.__tablename__} IN SHARE MODE")
+        )
+
+    async def last_change_id(self) -> int:
+        return await self.session.scalar(
+            select(func.coalesce(func.max(CartArchiveChangeModel.id), 0))
+        )
+
+    async def log_change(self, product_id: int, fields: dict[str, Any]) -> None:
+        """Запись изменения товара в журнал для архивных корзин."""
+        await self.session.execute(
+            insert(CartArchiveChangeModel).values(product_id=product_id, fields=fields)
+        )
+
+    async def archive_idle(
+        self, idle_since: datetime, limit: int, change_id: int
+    ) -> tuple[int, int]:
+        """Переносит корзины, неактивные с idle_since, из cart_items в архив.
+
+        Одним оператором: отметки активности удаляются, позиции удаляются из
+        cart_items и сворачиваются в одну строку архива на пользователя.
+        Возвращает число обработанных пользователей и заархивированных корзин
+        (у пустых корзин удаляется только отметка активности). Счётчики
+        cart_product_stats не меняются — архивные позиции в них учитываются.
+        """
+        idle_users = (
+            select(CartActivityModel.user_id)
+            .where(CartActivityModel.last_seen_at < idle_since)
+            .order_by(CartActivityModel.last_seen_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        released = (
+            delete(CartActivityModel)
+            .where(CartActivityModel.user_id.in_(idle_users))
+            .returning(CartActivityModel.user_id)
+            .cte("released")
+        )
+        moved = (
+            delete(CartItemModel)
+            .where(CartItemModel.user_id.in_(select(released.c.user_id)))
+            .returning(*CartItemModel.__table__.columns)
+            .cte("moved")
+        )
+        item = func.jsonb_build_object(
+            *(
+                part
+                for column in ITEM_DOCUMENT_COLUMNS
+                for part in (literal_column(f"'{column.key}'"), moved.c[column.key])
+            )
+        )
+        archive = insert(CartArchiveModel).from_select(
+            ["user_id", "items", "product_ids", "change_id"],
+            select(
+                moved.c.user_id,
+                func.jsonb_agg(aggregate_order_by(item, moved.c.created_at)),
+                func.array_agg(moved.c.product_id),
+                cast(literal(change_id), BigInteger),
+            ).group_by(moved.c.user_id),
+        )
+        # Архив уже есть (корзину заархивировали, а пользователь добавил товар
+        # без чтения корзины) — позиции дописываются, журнал применяется с
+        # более раннего изменения (применение изменений идемпотентно)
+        archive = archive.on_conflict_do_update(
+            index_elements=[CartArchiveModel.user_id],
+            set_={
+                "items": CartArchiveModel.items.op("||")(archive.excluded["items"]),
+                "product_ids": CartArchiveModel.product_ids.op("||")(
+                    archive.excluded.product_ids
+                ),
+                "change_id": func.least(
+                    CartArchiveModel.change_id, archive.excluded.change_id
+                ),
+                "archived_at": func.now(),
+            },
+        )
+        archived = archive.returning(CartArchiveModel.user_id).cte("archived")
+
+        query = select(
+            select(func.count()).select_from(released).scalar_subquery(),
+            select(func.count()).select_from(archived).scalar_subquery(),
+        )
+        await _skip_product_stats(self.session, True)
+        result = await self.session.execute(query)
+        counts = tuple(result.one())
+        await _skip_product_stats(self.session, False)
+        return counts
+
+    async def take(self, user_id: uuid.UUID) -> CartArchiveModel | None:
+        """Удаляет архив пользователя и возвращает его (None — архива нет)."""
+        query = (
+            delete(CartArchiveModel)
+            .where(CartArchiveModel.user_id == user_id)
+            .returning(CartArchiveModel)
+        )
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none()
+
+    async def get_changes(
+        self, after: int, product_ids: list[int]
+    ) -> list[CartArchiveChangeModel]:
+        """Изменения товаров после after в порядке записи."""
+        query = (
+            select(CartArchiveChangeModel)
+            .where(
+                CartArchiveChangeModel.id > after,
+                CartArchiveChangeModel.product_id.in_(product_ids),
+            )
+            .order_by(CartArchiveChangeModel.id)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def restore(self, user_id: uuid.UUID, items: list[dict[str, Any]]) -> None:
+        """Возвращает позиции архива в cart_items.
+
+        Товар, который пользователь успел добавить заново, не перезаписывается.
+        """
+        invalidate_user(self.session, user_id)
+        if not items:
+            return
+        query = (
+            insert(CartItemModel)
+            .values([item_from_document(user_id, item) for item in items])
+            .on_conflict_do_nothing()
+        )
+        await self.session.execute(query)
+
+    async def lock_pending(self, limit: int) -> list[CartArchiveModel]:
+        """Архивы, для которых в журнале есть неприменённые изменения.
+
+        Строки блокируются (SKIP LOCKED — пропускаются возвращаемые прямо сейчас).
+        """
+        pending = (
+            select(CartArchiveModel.user_id)
+            .join(
+                CartArchiveChangeModel,
+                and_(
+                    _contains_product(CartArchiveChangeModel.product_id),
+                    CartArchiveModel.change_id < CartArchiveChangeModel.id,
+                ),
+            )
+            .distinct()
+            .limit(limit)
+        )
+        query = (
+            select(CartArchiveModel)
+            .where(CartArchiveModel.user_id.in_(pending))
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def prune_changes(self) -> int:
+        """Удаляет изменения, уже учтённые всеми архивами с этим товаром."""
+        needed = exists().where(
+            _contains_product(CartArchiveChangeModel.product_id),
+            CartArchiveModel.change_id < CartArchiveChangeModel.id,
+        )
+        result = await self.session.execute(
+            delete(CartArchiveChangeModel).where(~needed)
+        )
+        return result.rowcount
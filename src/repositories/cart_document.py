@@ -0,0 +1,579 @@
+import uuid
+from collections.abc import AsyncIterator, Callable, Collection, Mapping, Sequence
+from datetime import UTC, datetime
+from typing import Any, NamedTuple
+
+from sqlalchemy import Row, any_, bindparam, column, delete, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.invalidation import invalidate_product, invalidate_user
+from src.db.models import CartDocumentModel, CartDocumentProductModel, CartItemModel
+from src.repositories.cart import (
+    ITEM_DOCUMENT_COLUMNS,
+    ROW_CHANGED,
+    ROW_DELETED,
+    ROW_UNCHANGED,
+    item_from_document,
+    item_to_document,
+)
+
+
+class CheckoutRow(NamedTuple):
+    """Позиция снапшота оформления — те же поля, что у строк CartRepository."""
+
+    id: uuid.UUID
+    product_id: int
+    quantity: int
+    product_name: str
+    product_image: str | None
+    price: int
+    total_price: int
+    total_items: int
+
+
+# Изменение позиции в документе: меняет словарь на месте и возвращает её
+# состояние (ROW_UNCHANGED, ROW_CHANGED или ROW_DELETED)
+ItemChange = Callable[[dict[str, Any]], str]
+
+
+def _effective_price(item: dict[str, Any]) -> int:
+    if item["price_changed"] and item["current_price"] is not None:
+        return item["current_price"]
+    return item["product_price"]
+
+
+def _is_orderable(item: dict[str, Any]) -> bool:
+    return (
+        item["is_selected"] and not item["out_of_stock"] and not item["product_deleted"]
+    )
+
+
+def _to_model(user_id: uuid.UUID, item: dict[str, Any]) -> CartItemModel:
+    """Позиция документа как CartItemModel (вне сессии, только для чтения)."""
+    return CartItemModel(**item_from_document(user_id, item))
+
+
+def _touch(item: dict[str, Any]) -> str:
+    item["version"] += 1
+    item["updated_at"] = datetime.now(UTC).isoformat()
+    return ROW_CHANGED
+
+
+def _export_query():
+    """cart_items из документов: колонки в порядке таблицы cart_items."""
+    items = (
+        func.jsonb_to_recordset(CartDocumentModel.items)
+        .table_valued(*(column(c.key, c.type) for c in ITEM_DOCUMENT_COLUMNS))
+        .render_derived(name="item", with_types=True)
+    )
+    columns = {
+        c.key: CartDocumentModel.user_id if c.key == "user_id" else items.c[c.key]
+        for c in CartItemModel.__table__.columns
+    }
+    query = select(*(columns[key].label(key) for key in columns)).select_from(
+        CartDocumentModel
+    )
+    return query.join(items, true()), columns
+
+
+class CartDocumentRepository:
+    """Хранилище корзин «документ на пользователя» (cart_documents).
+
+    Корзина читается одной строкой по первичному ключу. Каждое изменение
+    блокирует документ (FOR UPDATE), меняет позиции в памяти и записывает
+    документ целиком вместе с итогами. Webhook находит затронутые корзины по
+    индексу cart_document_products и переписывает каждую из них.
+    """
+
+    # Архив холодных корзин работает только с cart_items
+    archivable = False
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _load(
+        self, user_id: uuid.UUID, lock: bool = False
+    ) -> CartDocumentModel | None:
+        query = select(CartDocumentModel).where(CartDocumentModel.user_id == user_id)
+        if lock:
+            query = query.with_for_update()
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none()
+
+    async def _load_or_create(self, user_id: uuid.UUID) -> CartDocumentModel:
+        """Документ пользователя с блокировкой; пустой создаётся при отсутствии."""
+        document = await self._load(user_id, lock=True)
+        if document is None:
+            await self.session.execute(
+                insert(CartDocumentModel)
+                .values(user_id=user_id, items=[], total_price=0, total_items=0)
+                .on_conflict_do_nothing()
+            )
+            document = await self._load(user_id, lock=True)
+        return document
+
+    async def _save(
+        self, document: CartDocumentModel, items: list[dict[str, Any]]
+    ) -> None:
+        """Записывает позиции и итоги, поддерживает индекс товар → корзины."""
+        invalidate_user(self.session, document.user_id)
+        before = {item["product_id"] for item in document.items}
+        after = {item["product_id"] for item in items}
+
+        if items:
+            orderable = [item for item in items if _is_orderable(item)]
+            document.items = items
+            document.total_price = sum(
+                _effective_price(item) * item["quantity"] for item in orderable
+            )
+            document.total_items = sum(item["quantity"] for item in orderable)
+        else:
+            await self.session.delete(document)
+
+        if before - after:
+            await self.session.execute(
+                delete(CartDocumentProductModel).where(
+                    CartDocumentProductModel.user_id == document.user_id,
+                    CartDocumentProductModel.product_id.in_(before - after),
+                )
+            )
+        if after - before:
+            await self.session.execute(
+                insert(CartDocumentProductModel)
+                .values(
+                    [
+                        {"product_id": product_id, "user_id": document.user_id}
+                        for product_id in after - before
+                    ]
+                )
+                .on_conflict_do_nothing()
+            )
+        await self.session.flush()
+
+    async def _apply(
+        self, user_id: uuid.UUID, change: ItemChange
+    ) -> list[tuple[CartItemModel, str]]:
+        """Применяет изменение к позициям; возвращает всю корзину с состояниями."""
+        document = await self._load(user_id, lock=True)
+        if document is None:
+            return []
+        return await self._apply_to(document, change)
+
+    async def _apply_to(
+        self, document: CartDocumentModel, change: ItemChange
+    ) -> list[tuple[CartItemModel, str]]:
+        items = [dict(item) for item in document.items]
+        states = [change(item) for item in items]
+        if any(state != ROW_UNCHANGED for state in states):
+            await self._save(
+                document,
+                [item for item, state in zip(items, states) if state != ROW_DELETED],
+            )
+        return [
+            (_to_model(document.user_id, item), state)
+            for item, state in zip(items, states)
+        ]
+
+    # ─── Чтение ──────────────────────────────────────────────────
+
+    async def get_by_user(self, user_id: uuid.UUID) -> list[CartItemModel]:
+        document = await self._load(user_id)
+        if document is None:
+            return []
+        return [_to_model(user_id, item) for item in document.items]
+
+    async def get_fields_by_user(
+        self, user_id: uuid.UUID, columns: Collection[str]
+    ) -> list[CartItemModel]:
+        # Документ читается целиком: отбирать колонки незачем
+        return await self.get_by_user(user_id)
+
+    async def get_by_users(self, user_ids: list[uuid.UUID]) -> list[CartItemModel]:
+        ids = bindparam("user_ids", user_ids, type_=ARRAY(UUID(as_uuid=True)))
+        query = (
+            select(CartDocumentModel)
+            .where(CartDocumentModel.user_id == any_(ids))
+            .order_by(func.array_position(ids, CartDocumentModel.user_id))
+        )
+        result = await self.session.execute(query)
+        return [
+            _to_model(document.user_id, item)
+            for document in result.scalars().all()
+            for item in document.items
+        ]
+
+    async def get_item(
+        self, item_id: uuid.UUID, user_id: uuid.UUID
+    ) -> CartItemModel | None:
+        for item in await self.get_by_user(user_id):
+            if item.id == item_id:
+                return item
+        return None
+
+    async def get_by_user_and_product(
+        self, user_id: uuid.UUID, product_id: int
+    ) -> CartItemModel | None:
+        for item in await self.get_by_user(user_id):
+            if item.product_id == product_id:
+                return item
+        return None
+
+    async def get_list_selected_items(self, user_id: uuid.UUID) -> list[CartItemModel]:
+        return [item for item in await self.get_by_user(user_id) if item.is_selected]
+
+    async def _checkout_rows(self, user_id: uuid.UUID, lock: bool) -> list[CheckoutRow]:
+        document = await self._load(user_id, lock=lock)
+        if document is None:
+            return []
+        items = sorted(
+            (item for item in document.items if _is_orderable(item)),
+            key=lambda item: (item["created_at"], item["id"]),
+        )
+        total_price = sum(_effective_price(item) * item["quantity"] for item in items)
+        total_items = sum(item["quantity"] for item in items)
+        return [
+            CheckoutRow(
+                id=uuid.UUID(item["id"]),
+                product_id=item["product_id"],
+                quantity=item["quantity"],
+                product_name=item["product_name"],
+                product_image=item["product_image"],
+                price=_effective_price(item),
+                total_price=total_price,
+                total_items=total_items,
+            )
+            for item in items
+        ]
+
+    async def get_checkout_snapshot(self, user_id: uuid.UUID) -> list[CheckoutRow]:
+        return await self._checkout_rows(user_id, lock=False)
+
+    async def lock_checkout_snapshot(self, user_id: uuid.UUID) -> list[CheckoutRow]:
+        return await self._checkout_rows(user_id, lock=True)
+
+    async def stream_items(
+        self,
+        batch_size: int,
+        *,
+        after: uuid.UUID | None = None,
+        updated_since: datetime | None = None,
+        product_id: int | None = None,
+        flags: Mapping[str, bool] | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Позиции всех документов в формате строк cart_items, в порядке id."""
+        query, columns = _export_query()
+        query = query.order_by(columns["id"])
+
+        if after is not None:
+            query = query.where(columns["id"] > after)
+        if updated_since is not None:
+            query = query.where(columns["updated_at"] >= updated_since)
+        if product_id is not None:
+            query = query.where(columns["product_id"] == product_id)
+        for flag, value in (flags or {}).items():
+            query = query.where(columns[flag].is_(value))
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await self.session.stream(
+            query.execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+
+    # ─── Изменения пользователя ──────────────────────────────────
+
+    async def _add(self, item: CartItemModel) -> list[tuple[CartItemModel, str]]:
+        """Добавляет позицию; товар уже в корзине — увеличивает его количество."""
+        document = await self._load_or_create(item.user_id)
+        existing = {entry["product_id"] for entry in document.items}
+        if item.product_id in existing:
+
+            def change(entry: dict[str, Any]) -> str:
+                if entry["product_id"] != item.product_id:
+                    return ROW_UNCHANGED
+                entry["quantity"] += item.quantity
+                return _touch(entry)
+
+            return await self._apply_to(document, change)
+
+        now = datetime.now(UTC)
+        item.id = item.id or uuid.uuid4()
+        item.price_changed = item.price_changed or False
+        item.out_of_stock = item.out_of_stock or False
+        item.product_deleted = item.product_deleted or False
+        item.is_selected = True if item.is_selected is None else item.is_selected
+        item.version = 1
+        item.created_at = item.updated_at = now
+        new_item = item_to_document(item)
+
+        rows = [
+            (_to_model(item.user_id, entry), ROW_UNCHANGED) for entry in document.items
+        ]
+        await self._save(document, [*document.items, new_item])
+        return [*rows, (_to_model(item.user_id, new_item), ROW_CHANGED)]
+
+    async def create(self, item: CartItemModel) -> CartItemModel:
+        rows = await self._add(item)
+        return next(
+            model
+            for model, state in rows
+            if state == ROW_CHANGED and model.product_id == item.product_id
+        )
+
+    async def create_returning_cart(
+        self, item: CartItemModel
+    ) -> list[tuple[CartItemModel, str]]:
+        return await self._add(item)
+
+    async def _update_item(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None,
+        change_entry: Callable[[dict[str, Any]], None],
+    ) -> CartItemModel | None:
+        """Изменение одной позиции; None — позиции нет или версия не совпала."""
+
+        def change(entry: dict[str, Any]) -> str:
+            if entry["id"] != str(item_id) or expected_version not in (
+                None,
+                entry["version"],
+            ):
+                return ROW_UNCHANGED
+            change_entry(entry)
+            return _touch(entry)
+
+        rows = await self._apply(user_id, change)
+        for model, state in rows:
+            if state == ROW_CHANGED:
+                return model
+        return None
+
+    async def update_quantity(
+        self, item: CartItemModel, quantity: int, expected_version: int | None = None
+    ) -> CartItemModel | None:
+        return await self._update_item(
+            item.user_id,
+            item.id,
+            expected_version,
+            lambda entry: entry.update(quantity=quantity),
+        )
+
+    async def add_quantity(
+        self, user_id: uuid.UUID, item_id: uuid.UUID, delta: int
+    ) -> CartItemModel | None:
+        def add(entry: dict[str, Any]) -> None:
+            entry["quantity"] += delta
+
+        return await self._update_item(user_id, item_id, None, add)
+
+    async def update_selection(
+        self,
+        item: CartItemModel,
+        is_selected: bool,
+        expected_version: int | None = None,
+    ) -> CartItemModel | None:
+        return await self._update_item(
+            item.user_id,
+            item.id,
+            expected_version,
+            lambda entry: entry.update(is_selected=is_selected),
+        )
+
+    async def update_item_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+        **values: Any,
+    ) -> list[tuple[CartItemModel, str]]:
+        def change(entry: dict[str, Any]) -> str:
+            if entry["id"] != str(item_id) or expected_version not in (
+                None,
+                entry["version"],
+            ):
+                return ROW_UNCHANGED
+            entry.update(values)
+            return _touch(entry)
+
+        return await self._apply(user_id, change)
+
+    async def add_quantity_returning_cart(
+        self, user_id: uuid.UUID, item_id: uuid.UUID, delta: int
+    ) -> list[tuple[CartItemModel, str]]:
+        def change(entry: dict[str, Any]) -> str:
+            if entry["id"] != str(item_id):
+                return ROW_UNCHANGED
+            entry["quantity"] += delta
+            return _touch(entry)
+
+        return await self._apply(user_id, change)
+
+    async def update_items_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        values: dict[uuid.UUID, dict[str, Any]],
+        versions: dict[uuid.UUID, int],
+    ) -> list[tuple[CartItemModel, str]]:
+        def change(entry: dict[str, Any]) -> str:
+            item_id = uuid.UUID(entry["id"])
+            item_values = values.get(item_id)
+            if (
+                item_values is None
+                or versions.get(item_id, entry["version"]) != entry["version"]
+            ):
+                return ROW_UNCHANGED
+            entry.update(item_values)
+            return _touch(entry)
+
+        return await self._apply(user_id, change)
+
+    async def delete_item_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+    ) -> list[tuple[CartItemModel, str]]:
+        def change(entry: dict[str, Any]) -> str:
+            if entry["id"] == str(item_id) and expected_version in (
+                None,
+                entry["version"],
+            ):
+                return ROW_DELETED
+            return ROW_UNCHANGED
+
+        return await self._apply(user_id, change)
+
+    async def bulk_update_items(
+        self,
+        user_id: uuid.UUID,
+        quantities: dict[uuid.UUID, int],
+        selections: dict[uuid.UUID, bool],
+        removals: list[uuid.UUID],
+        versions: dict[uuid.UUID, int],
+    ) -> list[tuple[CartItemModel, str]]:
+        def change(entry: dict[str, Any]) -> str:
+            item_id = uuid.UUID(entry["id"])
+            if versions.get(item_id, entry["version"]) != entry["version"]:
+                return ROW_UNCHANGED
+            if item_id in removals:
+                return ROW_DELETED
+            if item_id not in quantities and item_id not in selections:
+                return ROW_UNCHANGED
+            entry["quantity"] = quantities.get(item_id, entry["quantity"])
+            entry["is_selected"] = selections.get(item_id, entry["is_selected"])
+            return _touch(entry)
+
+        return await self._apply(user_id, change)
+
+    async def update_selection_for_all(
+        self, user_id: uuid.UUID, is_selected: bool
+    ) -> list[tuple[CartItemModel, str]]:
+        def change(entry: dict[str, Any]) -> str:
+            if is_selected and (entry["out_of_stock"] or entry["product_deleted"]):
+                return ROW_UNCHANGED
+            entry["is_selected"] = is_selected
+            return _touch(entry)
+
+        return await self._apply(user_id, change)
+
+    async def delete_item(
+        self, item: CartItemModel, expected_version: int | None = None
+    ) -> bool:
+        rows = await self.delete_item_returning_cart(
+            item.user_id, item.id, expected_version
+        )
+        return any(state == ROW_DELETED for _, state in rows)
+
+    async def _delete_where(
+        self, user_id: uuid.UUID, matches: Callable[[dict[str, Any]], bool]
+    ) -> int:
+        rows = await self._apply(
+            user_id,
+            lambda entry: ROW_DELETED if matches(entry) else ROW_UNCHANGED,
+        )
+        return sum(state == ROW_DELETED for _, state in rows)
+
+    async def delete_all(self, user_id: uuid.UUID) -> int:
+        return await self._delete_where(user_id, lambda entry: True)
+
+    async def delete_items(self, user_id: uuid.UUID, item_ids: list[uuid.UUID]) -> int:
+        ids = {str(item_id) for item_id in item_ids}
+        return await self._delete_where(user_id, lambda entry: entry["id"] in ids)
+
+    async def delete_selected_items(self, user_id: uuid.UUID, items: list[int]) -> int:
+        return await self._delete_where(
+            user_id, lambda entry: entry["product_id"] in items
+        )
+
+    # ─── Webhook'и Product Service ───────────────────────────────
+
+    async def _update_product(self, product_id: int, fields: dict[str, Any]) -> int:
+        """Обновляет позиции товара во всех содержащих его корзинах.
+
+        Документы блокируются в порядке user_id — параллельные webhook'и не
+        взаимоблокируются. Возвращает количество изменённых позиций.
+        """
+        invalidate_product(self.session, product_id)
+        query = (
+            select(CartDocumentModel)
+            .where(
+                CartDocumentModel.user_id.in_(
+                    select(CartDocumentProductModel.user_id).where(
+                        CartDocumentProductModel.product_id == product_id
+                    )
+                )
+            )
+            .order_by(CartDocumentModel.user_id)
+            .with_for_update()
+        )
+        documents = (await self.session.execute(query)).scalars().all()
+
+        def change(entry: dict[str, Any]) -> str:
+            if entry["product_id"] != product_id:
+                return ROW_UNCHANGED
+            entry.update(fields)
+            if "current_price" in fields:
+                entry["price_changed"] = (
+                    entry["product_price"] != fields["current_price"]
+                )
+            return _touch(entry)
+
+        affected = 0
+        for document in documents:
+            rows = await self._apply_to(document, change)
+            affected += sum(state == ROW_CHANGED for _, state in rows)
+        return affected
+
+    async def mark_price_changed(
+        self,
+        product_id: int,
+        new_price: int,
+        new_name: str,
+        new_image: str | None,
+    ) -> int:
+        return await self._update_product(
+            product_id,
+            {
+                "current_price": new_price,
+                "product_name": new_name,
+                "product_image": new_image,
+            },
+        )
+
+    async def mark_out_of_stock(self, product_id: int, value: bool) -> int:
+        fields = {"out_of_stock": value}
+        if value is True:
+            fields["is_selected"] = False
+        return await self._update_product(product_id, fields)
+
+    async def mark_deleted(self, product_id: int) -> int:
+        return await self._update_product(
+            product_id, {"product_deleted": True, "is_selected": False}
+        )
+
+    async def update_by_product_id(self, product_id: int, **fields: Any) -> None:
+        await self._update_product(product_id, fields)
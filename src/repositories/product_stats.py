@@ -0,0 +1,153 @@
+from collections.abc import Sequence
+
+from sqlalchemy import (
+    Boolean,
+    Integer,
+    Row,
+    any_,
+    bindparam,
+    column,
+    func,
+    select,
+    true,
+    union,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import CartArchiveModel, CartItemModel, CartProductStatsModel
+
+
+class ProductStatsRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_many(self, product_ids: list[int]) -> list[CartProductStatsModel]:
+        """Счётчики товаров; товаров без строки счётчика в результате нет."""
+        query = select(CartProductStatsModel).where(
+            CartProductStatsModel.product_id.in_(product_ids)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_next_product_ids(self, after: int | None, limit: int) -> list[int]:
+        """Следующая пачка ID товаров из cart_items и cart_product_stats.
+
+        Каждая сторона UNION ограничена LIMIT отдельно: DISTINCT по индексу
+        product_id останавливается после limit товаров, а не читает cart_items
+        до конца.
+        """
+        item_ids = (
+            select(CartItemModel.product_id.label("product_id"))
+            .distinct()
+            .order_by(CartItemModel.product_id)
+            .limit(limit)
+        )
+        stats_ids = (
+            select(CartProductStatsModel.product_id.label("product_id"))
+            .order_by(CartProductStatsModel.product_id)
+            .limit(limit)
+        )
+        if after is not None:
+            item_ids = item_ids.where(CartItemModel.product_id > after)
+            stats_ids = stats_ids.where(CartProductStatsModel.product_id > after)
+
+        ids = union(item_ids.subquery().select(), stats_ids.subquery().select())
+        ids = ids.subquery()
+        query = select(ids.c.product_id).order_by(ids.c.product_id).limit(limit)
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def lock_many(self, product_ids: list[int]) -> list[CartProductStatsModel]:
+        """Блокирует строки счётчиков до конца транзакции.
+
+        Пока блокировка удерживается, триггеры параллельных изменений
+        cart_items ждут её, поэтому пересчёт не теряет их дельты.
+        """
+        query = (
+            select(CartProductStatsModel)
+            .where(CartProductStatsModel.product_id.in_(product_ids))
+            .order_by(CartProductStatsModel.product_id)
+            .with_for_update()
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def compute_many(self, product_ids: list[int]) -> Sequence[Row]:
+        """Фактические значения счётчиков по cart_items и архиву корзин.
+
+        Архивные позиции берутся в том виде, в каком лежат в cart_archive:
+        изменения из журнала попадают в счётчики, когда задача архивации
+        применяет их к архиву.
+        """
+        ids = bindparam("product_ids", product_ids, type_=ARRAY(Integer))
+        live = select(
+            CartItemModel.product_id, CartItemModel.quantity, CartItemModel.is_selected
+        ).where(CartItemModel.product_id == any_(ids))
+
+        item = (
+            func.jsonb_to_recordset(CartArchiveModel.items)
+            .table_valued(
+                column("product_id", Integer),
+                column("quantity", Integer),
+                column("is_selected", Boolean),
+            )
+            .render_derived("item", with_types=True)
+        )
+        archived = (
+            select(item.c.product_id, item.c.quantity, item.c.is_selected)
+            .select_from(CartArchiveModel)
+            .join(item, true())
+            .where(
+                CartArchiveModel.product_ids.overlap(ids),
+                item.c.product_id == any_(ids),
+            )
+        )
+
+        rows = union_all(live, archived).subquery()
+        query = select(
+            rows.c.product_id,
+            func.count().label("carts_count"),
+            func.sum(rows.c.quantity).label("total_quantity"),
+            func.coalesce(
+                func.sum(rows.c.quantity).filter(rows.c.is_selected), 0
+            ).label("selected_quantity"),
+        ).group_by(rows.c.product_id)
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def apply_deltas(self, deltas: list[dict]) -> None:
+        """Прибавляет изменения к счётчикам (строки — в порядке product_id).
+
+        Для изменений архивных позиций, которые не проходят через триггеры
+        cart_items.
+        """
+        if not deltas:
+            return
+        query = insert(CartProductStatsModel).values(
+            sorted(deltas, key=lambda delta: delta["product_id"])
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[CartProductStatsModel.product_id],
+            set_={
+                field: getattr(CartProductStatsModel, field) + query.excluded[field]
+                for field in ("carts_count", "total_quantity", "selected_quantity")
+            }
+            | {"updated_at": func.now()},
+        )
+        await self.session.execute(query)
+
+    async def insert_missing(self, rows: list[dict]) -> None:
+        """Создаёт отсутствующие строки счётчиков.
+
+        Строку, которую параллельно успел создать триггер, не трогает —
+        её поправит следующая сверка.
+        """
+        query = (
+            insert(CartProductStatsModel)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[CartProductStatsModel.product_id])
+        )
+        await self.session.execute(query)
+        await self.session.flush()
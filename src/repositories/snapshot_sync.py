@@ -0,0 +1,124 @@
+from collections.abc import Sequence
+from datetime import datetime
+
+from sqlalchemy import Row, delete, exists, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import (
+    CartArchiveChangeModel,
+    CartItemModel,
+    CartProductStatsModel,
+    CartProductSyncModel,
+)
+
+
+class SnapshotSyncRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_next_product_ids(
+        self, checked_before: datetime, limit: int
+    ) -> list[int]:
+        """Пачка товаров из корзин, не сверявшихся после checked_before.
+
+        Первыми идут товары, которые есть во многих корзинах и дольше всего
+        не сверялись: приоритет — carts_count × возраст последней сверки
+        (никогда не сверявшиеся — с начала эпохи).
+        """
+        stats = CartProductStatsModel
+        sync = CartProductSyncModel
+        age = func.extract(
+            "epoch", func.now() - func.coalesce(sync.checked_at, func.to_timestamp(0))
+        )
+        query = (
+            select(stats.product_id)
+            .outerjoin(sync, sync.product_id == stats.product_id)
+            .where(
+                stats.carts_count > 0,
+                or_(sync.checked_at.is_(None), sync.checked_at < checked_before),
+            )
+            .order_by((stats.carts_count * age).desc(), stats.product_id)
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_last_changes(self, product_ids: list[int]) -> dict[int, int]:
+        """Последняя запись журнала cart_archive_changes по каждому товару.
+
+        Каждый webhook пишет журнал до UPDATE cart_items, поэтому запись
+        меняется при любом изменении товара, в том числе в архивных корзинах.
+        Товаров без записей нет в ответе.
+        """
+        query = (
+            select(
+                CartArchiveChangeModel.product_id, func.max(CartArchiveChangeModel.id)
+            )
+            .where(CartArchiveChangeModel.product_id.in_(product_ids))
+            .group_by(CartArchiveChangeModel.product_id)
+        )
+        result = await self.session.execute(query)
+        return dict(result.all())
+
+    async def lock_webhooks(self) -> None:
+        """Останавливает webhook'и до конца транзакции.
+
+        SHARE ROW EXCLUSIVE на журнале cart_archive_changes ждёт webhook'и,
+        уже записавшие журнал, и не даёт начаться новым (они пишут журнал
+        первым оператором), а сам журнал писать разрешает.
+        """
+        await self.session.execute(
+            text(
+                f"LOCK TABLE {CartArchiveChangeModel.__tablename__} "
+                "IN SHARE ROW EXCLUSIVE MODE"
+            )
+        )
+
+    async def get_snapshots(self, product_ids: list[int]) -> Sequence[Row]:
+        """Различные снапшоты товаров в cart_items (обычно один-два на товар).
+
+        price — цена, которую видит пользователь: current_price после
+        webhook'а или product_price из снапшота.
+        """
+        query = (
+            select(
+                CartItemModel.product_id,
+                func.coalesce(
+                    CartItemModel.current_price, CartItemModel.product_price
+                ).label("price"),
+                CartItemModel.product_name,
+                CartItemModel.product_image,
+                CartItemModel.out_of_stock,
+                CartItemModel.product_deleted,
+            )
+            .distinct()
+            .where(CartItemModel.product_id.in_(product_ids))
+        )
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def mark_checked(self, product_ids: list[int]) -> None:
+        """Отмечает товары сверенными сейчас."""
+        query = insert(CartProductSyncModel).values(
+            [
+                {"product_id": product_id, "checked_at": func.now()}
+                for product_id in product_ids
+            ]
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[CartProductSyncModel.product_id],
+            set_={"checked_at": query.excluded.checked_at},
+        )
+        await self.session.execute(query)
+
+    async def prune(self) -> int:
+        """Удаляет отметки товаров, которых больше нет в корзинах."""
+        in_carts = exists().where(
+            CartProductStatsModel.product_id == CartProductSyncModel.product_id,
+            CartProductStatsModel.carts_count > 0,
+        )
+        result = await self.session.execute(
+            delete(CartProductSyncModel).where(~in_carts)
+        )
+        return result.rowcount
@@ -0,0 +1,170 @@
+"""Интерфейс хранилища корзин и выбор реализации (CART_STORAGE_BACKEND).
+
+rows (CartRepository) — строка cart_items на позицию: дешёвые webhook'и
+(один UPDATE по индексу product_id), чтение корзины — range scan по user_id.
+document (CartDocumentRepository) — корзина одной строкой cart_documents:
+чтение по первичному ключу, но webhook переписывает каждую корзину с товаром.
+"""
+
+import uuid
+from collections.abc import AsyncIterator, Collection, Mapping, Sequence
+from datetime import datetime
+from typing import Any, Protocol
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.db.models import CartItemModel
+from src.repositories.cart import CartRepository
+from src.repositories.cart_document import CartDocumentRepository
+
+# Позиция корзины с состоянием после изменения (ROW_UNCHANGED, ROW_CHANGED,
+# ROW_DELETED из src.repositories.cart)
+CartRows = list[tuple[CartItemModel, str]]
+
+
+class CartStorage(Protocol):
+    """Операции хранилища, которыми пользуются CartService, выгрузка и прогрев.
+
+    Позиции возвращаются как CartItemModel; методы *_returning_cart
+    возвращают всю корзину с состояниями позиций. Версия позиции
+    проверяется, только если передана ожидаемая (expected_version, versions):
+    изменение с несовпавшей версией не применяется (None / False для методов
+    одной позиции). create добавляет количество к позиции товара, если
+    товар уже в корзине.
+    """
+
+    # Корзины переносятся в архив холодных корзин; иначе CartService не
+    # обращается к архиву
+    archivable: bool
+
+    # Чтение
+    async def get_by_user(self, user_id: uuid.UUID) -> list[CartItemModel]: ...
+
+    async def get_fields_by_user(
+        self, user_id: uuid.UUID, columns: Collection[str]
+    ) -> Sequence[Any]: ...
+
+    async def get_by_users(self, user_ids: list[uuid.UUID]) -> list[CartItemModel]: ...
+
+    async def get_item(
+        self, item_id: uuid.UUID, user_id: uuid.UUID
+    ) -> CartItemModel | None: ...
+
+    async def get_by_user_and_product(
+        self, user_id: uuid.UUID, product_id: int
+    ) -> CartItemModel | None: ...
+
+    async def get_list_selected_items(self, user_id: uuid.UUID) -> Sequence[Any]: ...
+
+    async def get_checkout_snapshot(self, user_id: uuid.UUID) -> Sequence[Any]: ...
+
+    async def lock_checkout_snapshot(self, user_id: uuid.UUID) -> Sequence[Any]: ...
+
+    def stream_items(
+        self,
+        batch_size: int,
+        *,
+        after: uuid.UUID | None = None,
+        updated_since: datetime | None = None,
+        product_id: int | None = None,
+        flags: Mapping[str, bool] | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[Sequence[Any]]: ...
+
+    # Изменения пользователя
+    async def create(self, item: CartItemModel) -> CartItemModel: ...
+
+    async def create_returning_cart(self, item: CartItemModel) -> CartRows: ...
+
+    async def update_quantity(
+        self, item: CartItemModel, quantity: int, expected_version: int | None = None
+    ) -> CartItemModel | None: ...
+
+    async def add_quantity(
+        self, user_id: uuid.UUID, item_id: uuid.UUID, delta: int
+    ) -> CartItemModel | None: ...
+
+    async def update_selection(
+        self,
+        item: CartItemModel,
+        is_selected: bool,
+        expected_version: int | None = None,
+    ) -> CartItemModel | None: ...
+
+    async def update_item_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+        **values: Any,
+    ) -> CartRows: ...
+
+    async def add_quantity_returning_cart(
+        self, user_id: uuid.UUID, item_id: uuid.UUID, delta: int
+    ) -> CartRows: ...
+
+    async def update_items_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        values: dict[uuid.UUID, dict[str, Any]],
+        versions: dict[uuid.UUID, int],
+    ) -> CartRows: ...
+
+    async def delete_item_returning_cart(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        expected_version: int | None = None,
+    ) -> CartRows: ...
+
+    async def bulk_update_items(
+        self,
+        user_id: uuid.UUID,
+        quantities: dict[uuid.UUID, int],
+        selections: dict[uuid.UUID, bool],
+        removals: list[uuid.UUID],
+        versions: dict[uuid.UUID, int],
+    ) -> CartRows: ...
+
+    async def update_selection_for_all(
+        self, user_id: uuid.UUID, is_selected: bool
+    ) -> CartRows: ...
+
+    async def delete_item(
+        self, item: CartItemModel, expected_version: int | None = None
+    ) -> bool: ...
+
+    async def delete_all(self, user_id: uuid.UUID) -> int: ...
+
+    async def delete_items(
+        self, user_id: uuid.UUID, item_ids: list[uuid.UUID]
+    ) -> int: ...
+
+    async def delete_selected_items(
+        self, user_id: uuid.UUID, items: list[int]
+    ) -> int: ...
+
+    # Webhook'и Product Service
+    async def mark_price_changed(
+        self,
+        product_id: int,
+        new_price: int,
+        new_name: str,
+        new_image: str | None,
+    ) -> int: ...
+
+    async def mark_out_of_stock(self, product_id: int, value: bool) -> int: ...
+
+    async def mark_deleted(self, product_id: int) -> int: ...
+
+
+_BACKENDS: dict[str, type[CartStorage]] = {
+    "rows": CartRepository,
+    "document": CartDocumentRepository,
+}
+
+
+def get_cart_storage(session: AsyncSession, backend: str | None = None) -> CartStorage:
+    """Хранилище корзин; по умолчанию — из CART_STORAGE_BACKEND."""
+    return _BACKENDS[backend or settings.CART_STORAGE_BACKEND](session)
@@ -1,8 +1,18 @@
 import uuid
 from datetime import datetime
-from decimal import Decimal
+from functools import lru_cache
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    create_model,
+    field_validator,
+    model_validator,
+)
+
+from src.schemas.money import Kopecks
 
 
 class AddToCartSchema(BaseModel):
@@ -18,6 +28,48 @@ class ItemSelectionSchema(BaseModel):
     is_selected: bool = Field(..., description="Выбран ли товар для оформления заказа")
 
 
+class CartItemOperationSchema(BaseModel):
+    """Изменения одной позиции в пакетном обновлении корзины."""
+
+    item_id: uuid.UUID = Field(..., description="ID записи корзины")
+    quantity: int | None = Field(None, description="Новое количество товара", ge=1)
+    is_selected: bool | None = Field(None, description="Новый статус выбора товара")
+    remove: bool = Field(False, description="Удалить позицию из корзины")
+    version: int | None = Field(
+        None,
+        description="Ожидаемая версия позиции: при несовпадении изменения "
+        "не применяются (409)",
+        ge=1,
+    )
+
+    @model_validator(mode="after")
+    def check_operation(self) -> "CartItemOperationSchema":
+        has_update = self.quantity is not None or self.is_selected is not None
+        if self.remove and has_update:
+            raise ValueError("remove cannot be combined with quantity or is_selected")
+        if not self.remove and not has_update:
+            raise ValueError("operation must set quantity, is_selected or remove")
+        return self
+
+
+class BulkUpdateItemsSchema(BaseModel):
+    operations: list[CartItemOperationSchema] = Field(
+        ...,
+        description="Изменения позиций, не больше одной операции на позицию",
+        min_length=1,
+        max_length=100,
+    )
+
+    @field_validator("operations")
+    @classmethod
+    def check_unique_items(
+        cls, value: list[CartItemOperationSchema]
+    ) -> list[CartItemOperationSchema]:
+        if len({operation.item_id for operation in value}) != len(value):
+            raise ValueError("each item_id may appear only once")
+        return value
+
+
 class CartItemResponseSchema(BaseModel):
     """Ответ с данными одного элемента корзины."""
 
@@ -28,19 +80,24 @@ class CartItemResponseSchema(BaseModel):
 
     # Снапшот товара на момент добавления
     product_name: str = Field(..., description="Название товара на момент добавления")
-    product_price: Decimal = Field(..., description="Цена товара на момент добавления")
+    product_price: Kopecks = Field(
+        ..., description="Цена товара на момент добавления (в копейках)"
+    )
     product_image: str | None = Field(None, description="URL изображения товара")
 
     # Флаги синхронизации (обновляются через webhook'и)
     price_changed: bool = Field(
         ..., description="True если цена изменилась с момента добавления"
     )
-    current_price: Decimal | None = Field(
+    current_price: Kopecks | None = Field(
         None,
         description="Актуальная цена — заполняется webhook'ом при изменении цены",
     )
     out_of_stock: bool = Field(..., description="True если товар закончился на складе")
     product_deleted: bool = Field(..., description="True если товар удалён из каталога")
+    version: int = Field(
+        ..., description="Версия позиции — для If-Match при изменении и удалении"
+    )
 
     created_at: datetime = Field(..., description="Дата добавления в корзину")
     updated_at: datetime = Field(..., description="Дата последнего изменения")
@@ -61,5 +118,80 @@ class CartResponseSchema(BaseModel):
     items: list[CartItemResponseSchema] = Field(
         ..., description="Список товаров в корзине"
     )
-    total_price: Decimal = Field(..., description="Общая стоимость корзины")
+    total_price: Kopecks = Field(..., description="Общая стоимость корзины")
     total_items: int = Field(..., description="Общее количество единиц товара")
+
+
+# Поля позиции в компактном ответе (?view=minimal): количество, цены, выбор
+# и флаги — без названия, изображения, версии и дат
+MINIMAL_ITEM_FIELDS = frozenset(
+    {
+        "id",
+        "product_id",
+        "quantity",
+        "is_selected",
+        "product_price",
+        "current_price",
+        "price_changed",
+        "out_of_stock",
+        "product_deleted",
+    }
+)
+
+
+@lru_cache(maxsize=64)
+def cart_fields_schemas(
+    fields: frozenset[str],
+) -> tuple[type[BaseModel], type[BaseModel]]:
+    """Схемы позиции и корзины, в позициях которой только поля fields.
+
+    Поля берутся из CartItemResponseSchema вместе с описаниями и
+    сериализаторами (копейки). Схемы создаются один раз на набор полей.
+    """
+    item_schema = create_model(
+        "CartItemFieldsSchema",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (field.annotation, field)
+            for name, field in CartItemResponseSchema.model_fields.items()
+            if name in fields
+        },
+    )
+    cart_schema = create_model(
+        "CartFieldsResponseSchema",
+        items=(list[item_schema], CartResponseSchema.model_fields["items"]),
+        total_price=(int, CartResponseSchema.model_fields["total_price"]),
+        total_items=(int, CartResponseSchema.model_fields["total_items"]),
+    )
+    return item_schema, cart_schema
+
+
+class CartItemChangeSchema(BaseModel):
+    """Расхождение позиции со свежими данными Product Service."""
+
+    item_id: uuid.UUID = Field(..., description="ID записи корзины")
+    product_id: int = Field(..., description="ID товара в Product Service")
+    changes: list[
+        Literal["price", "name", "image", "out_of_stock", "back_in_stock", "deleted"]
+    ] = Field(..., description="Что изменилось")
+    old_price: Kopecks = Field(..., description="Цена, которую видел пользователь")
+    new_price: Kopecks | None = Field(
+        None, description="Актуальная цена (None — товар удалён)"
+    )
+
+
+class CartValidationSchema(BaseModel):
+    """Результат проверки выбранных товаров перед оформлением заказа."""
+
+    valid: bool = Field(..., description="True — выбранные товары не изменились")
+    changes: list[CartItemChangeSchema] = Field(
+        ..., description="Изменившиеся позиции (уже применены к корзине)"
+    )
+    conflicts: list[CartItemChangeSchema] = Field(
+        [],
+        description=(
+            "Расхождения, не применённые: позицию изменили во время проверки, "
+            "корзину нужно проверить заново"
+        ),
+    )
+    cart: CartResponseSchema = Field(..., description="Корзина после проверки")
@@ -1,7 +1,11 @@
 import uuid
-from decimal import Decimal
+from datetime import datetime
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from src.config import settings
+from src.schemas.money import Kopecks
 
 
 class ProductUpdatedWebhook(BaseModel):
@@ -19,12 +23,14 @@ class InternalCartItemSchema(BaseModel):
     product_id: int = Field(..., description="ID товара в Product Service")
     quantity: int = Field(..., description="Количество товара")
     product_name: str = Field(..., description="Название товара")
-    product_price: Decimal = Field(..., description="Цена товара на момент добавления")
+    product_price: Kopecks = Field(
+        ..., description="Цена товара на момент добавления (в копейках)"
+    )
     product_image: str | None = Field(None, description="URL изображения товара")
     price_changed: bool = Field(
         ..., description="True если цена изменилась с момента добавления"
     )
-    current_price: Decimal | None = Field(
+    current_price: Kopecks | None = Field(
         None, description="Актуальная цена (если изменилась)"
     )
     out_of_stock: bool = Field(..., description="True если товар закончился на складе")
@@ -33,8 +39,130 @@ class InternalCartItemSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CartBatchRequestSchema(BaseModel):
+    """Запрос корзин нескольких пользователей."""
+
+    # Длина проверяется до удаления дубликатов: иначе список из миллиона
+    # одинаковых id разбирался бы целиком
+    user_ids: list[uuid.UUID] = Field(
+        ...,
+        description="ID пользователей (дубликаты игнорируются)",
+        min_length=1,
+        max_length=settings.CART_BATCH_MAX_USERS,
+    )
+
+    @field_validator("user_ids")
+    @classmethod
+    def deduplicate(cls, value: list[uuid.UUID]) -> list[uuid.UUID]:
+        return list(dict.fromkeys(value))
+
+
+class UserCartSchema(BaseModel):
+    """Корзина одного пользователя в пакетном ответе."""
+
+    user_id: uuid.UUID = Field(..., description="ID пользователя")
+    items: list[InternalCartItemSchema] = Field(
+        ..., description="Позиции корзины (пустой список, если корзина пуста)"
+    )
+
+
+class CartBatchResponseSchema(BaseModel):
+    """Корзины нескольких пользователей в порядке запроса."""
+
+    carts: list[UserCartSchema] = Field(..., description="Корзины пользователей")
+
+
 class WebhookResponseSchema(BaseModel):
     """Стандартный ответ webhook-эндпоинта."""
 
     status: str = Field("ok", description="Статус обработки")
     affected_rows: int = Field(..., description="Количество затронутых строк")
+
+
+class CheckoutSnapshotItemSchema(BaseModel):
+    """Позиция снапшота корзины для оформления заказа."""
+
+    id: uuid.UUID = Field(..., description="ID записи корзины")
+    product_id: int = Field(..., description="ID товара в Product Service")
+    quantity: int = Field(..., description="Количество товара")
+    product_name: str = Field(..., description="Название товара")
+    product_image: str | None = Field(None, description="URL изображения товара")
+    price: Kopecks = Field(
+        ..., description="Эффективная цена (current_price, если цена изменилась)"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CheckoutSnapshotSchema(BaseModel):
+    """Согласованный снапшот выбранных доступных товаров для Order Service."""
+
+    items: list[CheckoutSnapshotItemSchema] = Field(
+        ..., description="Выбранные товары, доступные для заказа"
+    )
+    total_price: Kopecks = Field(..., description="Общая стоимость выбранных товаров")
+    total_items: int = Field(..., description="Общее количество единиц товара")
+    version: str = Field(
+        ...,
+        description="Версия снапшота — передаётся обратно при очистке корзины",
+    )
+
+
+class CartExportParamsSchema(BaseModel):
+    """Формат, фильтры и ключ продолжения потоковой выгрузки cart_items."""
+
+    format: Literal["ndjson", "csv"] = Field("ndjson", description="Формат выгрузки")
+    updated_since: datetime | None = Field(
+        None, description="Только позиции, изменённые не раньше этого момента"
+    )
+    product_id: int | None = Field(None, description="Только позиции с этим товаром")
+    is_selected: bool | None = Field(None, description="Фильтр по флагу is_selected")
+    price_changed: bool | None = Field(
+        None, description="Фильтр по флагу price_changed"
+    )
+    out_of_stock: bool | None = Field(None, description="Фильтр по флагу out_of_stock")
+    product_deleted: bool | None = Field(
+        None, description="Фильтр по флагу product_deleted"
+    )
+    after: uuid.UUID | None = Field(
+        None,
+        description="Ключ продолжения: id последней полученной строки "
+        "(строки выгружаются в порядке id)",
+    )
+    limit: int | None = Field(None, description="Максимум строк в выгрузке", ge=1)
+
+
+class ProductStatsSchema(BaseModel):
+    """Сколько корзин содержат товар."""
+
+    product_id: int = Field(..., description="ID товара в Product Service")
+    carts_count: int = Field(0, description="Количество корзин с товаром")
+    total_quantity: int = Field(0, description="Суммарное количество во всех корзинах")
+    selected_quantity: int = Field(
+        0, description="Количество в позициях, выбранных для оформления"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductStatsBatchRequestSchema(BaseModel):
+    """Запрос счётчиков нескольких товаров."""
+
+    # Длина проверяется до удаления дубликатов, как в CartBatchRequestSchema
+    product_ids: list[int] = Field(
+        ...,
+        description="ID товаров (дубликаты игнорируются)",
+        min_length=1,
+        max_length=settings.PRODUCT_STATS_BATCH_MAX_PRODUCTS,
+    )
+
+    @field_validator("product_ids")
+    @classmethod
+    def deduplicate(cls, value: list[int]) -> list[int]:
+        return list(dict.fromkeys(value))
+
+
+class ProductStatsBatchResponseSchema(BaseModel):
+    """Счётчики товаров в порядке запроса."""
+
+    stats: list[ProductStatsSchema] = Field(..., description="Счётчики товаров")
@@ -0,0 +1,18 @@
+from typing import Annotated
+
+from pydantic import PlainSerializer
+
+
+def format_kopecks(value: int) -> str:
+    """Форматирует сумму в копейках для ответа API.
+
+    Формат совпадает с прежним представлением Numeric(10, 2): "12345.00".
+    """
+    return f"{value}.00"
+
+
+# Денежная сумма в копейках. Внутри сервиса и в БД — целое число,
+# в строку превращается только при сериализации ответа.
+Kopecks = Annotated[
+    int, PlainSerializer(format_kopecks, return_type=str, when_used="json")
+]
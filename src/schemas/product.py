@@ -10,3 +10,6 @@ class ProductResponseSchema(BaseModel):
     images: list[str] = Field(
         default_factory=list, description="URL изображений товара"
     )
+    in_stock: bool | None = Field(
+        None, description="Есть ли товар в наличии; None — не передаётся"
+    )
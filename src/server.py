@@ -0,0 +1,27 @@
+"""Production-запуск API: `python -m src.server`.
+
+Поднимает API_WORKERS процессов uvicorn на uvloop/httptools. При остановке
+uvicorn перестаёт принимать соединения и ждёт завершения активных запросов
+не дольше API_GRACEFUL_SHUTDOWN_TIMEOUT секунд.
+"""
+
+import uvicorn
+
+from src.config import settings
+
+
+def main() -> None:
+    uvicorn.run(
+        "src.main:app",
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        workers=settings.API_WORKERS,
+        loop="uvloop",
+        http="httptools",
+        timeout_graceful_shutdown=settings.API_GRACEFUL_SHUTDOWN_TIMEOUT,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,126 @@
+import hashlib
 import uuid
-from decimal import Decimal
+from collections.abc import Collection, Sequence
+from typing import Any
 
 import structlog
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import settings
 from src.db.models import CartItemModel
-from src.exceptions import NotFoundException
-from src.repositories.cart import CartRepository
+from src.exceptions import (
+    CartServiceException,
+    ConflictException,
+    NotFoundException,
+)
+from src.repositories.cart import ROW_CHANGED, ROW_DELETED, ROW_UNCHANGED
+from src.repositories.storage import CartStorage, get_cart_storage
 from src.schemas.cart import (
+    CartItemChangeSchema,
+    CartItemOperationSchema,
     CartItemResponseSchema,
     CartResponseSchema,
     CartItemSelectedResponseSchema,
+    CartValidationSchema,
+    cart_fields_schemas,
+)
+from src.schemas.internal import (
+    CheckoutSnapshotItemSchema,
+    CheckoutSnapshotSchema,
+    InternalCartItemSchema,
+    UserCartSchema,
 )
+from src.services.cart_archive import CartArchiveService
+from src.schemas.product import ProductResponseSchema
 from src.services.product_client import ProductClient
 
 
 logger = structlog.get_logger(__name__)
 
 
+# Колонки, по которым считаются итоги корзины (см. CartService._totals)
+_TOTALS_COLUMNS = frozenset(
+    {
+        "quantity",
+        "product_price",
+        "current_price",
+        "price_changed",
+        "is_selected",
+        "out_of_stock",
+        "product_deleted",
+    }
+)
+
+
+def _snapshot_diff(
+    item: CartItemModel, product: ProductResponseSchema | None
+) -> tuple[dict, list[str]]:
+    """Новые значения колонок позиции по свежим данным товара и виды изменений.
+
+    Значения те же, что выставляют webhook'и: current_price и price_changed,
+    снапшот названия и изображения, out_of_stock и product_deleted со
+    снятием выбора. product None — товара больше нет в Product Service.
+    """
+    if product is None:
+        return {"product_deleted": True, "is_selected": False}, ["deleted"]
+
+    values: dict = {}
+    changes = []
+    seen_price = (
+        item.current_price if item.current_price is not None else item.product_price
+    )
+    if seen_price != product.price:
+        values["current_price"] = product.price
+        values["price_changed"] = item.product_price != product.price
+        changes.append("price")
+    if item.product_name != product.title:
+        values["product_name"] = product.title
+        changes.append("name")
+    image = product.images[0] if product.images else None
+    if item.product_image != image:
+        values["product_image"] = image
+        changes.append("image")
+    if product.in_stock is False and not item.out_of_stock:
+        values.update(out_of_stock=True, is_selected=False)
+        changes.append("out_of_stock")
+    elif product.in_stock is True and item.out_of_stock:
+        values["out_of_stock"] = False
+        changes.append("back_in_stock")
+    return values, changes
+
+
+def _snapshot_version(rows) -> str:
+    """Версия снапшота — хеш от состава, количеств и эффективных цен позиций."""
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(f"{row.id}:{row.product_id}:{row.quantity}:{row.price};".encode())
+    return digest.hexdigest()[:16]
+
+
 class CartService:
     def __init__(
-        self, session: AsyncSession, product_client: ProductClient | None = None
+        self,
+        session: AsyncSession,
+        product_client: ProductClient | None = None,
+        storage: CartStorage | None = None,
     ) -> None:
         self.session = session
-        self.repo = CartRepository(session)
+        self.repo = storage or get_cart_storage(session)
+        self.archive = CartArchiveService(session) if self.repo.archivable else None
         self.product_client = product_client
 
+    async def _activate(self, user_id: uuid.UUID) -> None:
+        """Отметка обращения к корзине; архивная корзина возвращается в cart_items."""
+        if self.archive is not None and await self.archive.activate(user_id):
+            await self.session.commit()
+            self.archive.mark_touched(user_id)
+
+    async def _log_product_change(self, product_id: int, **fields: Any) -> None:
+        """Запись изменения товара для архивных корзин, если они есть."""
+        if self.archive is not None:
+            await self.archive.log_product_change(product_id, **fields)
+
     # ─── Public API (v1) ─────────────────────────────────────────
 
     async def get_cart(self, user_id: uuid.UUID) -> CartResponseSchema:
@@ -35,12 +130,43 @@ class CartService:
         Возвращает список товаров из снапшотов с флагами изменений,
         общую стоимость и общее количество единиц товара.
         Если цена изменилась — для подсчёта total_price используется current_price.
+        Архивная корзина при первом обращении возвращается из архива.
         """
+        await self._activate(user_id)
         items = await self.repo.get_by_user(user_id)
 
-        item_responses = [CartItemResponseSchema.model_validate(item) for item in items]
+        logger.info("cart_fetched", user_id=str(user_id), items_count=len(items))
+        return self._build_cart(items)
+
+    async def get_cart_fields(
+        self, user_id: uuid.UUID, fields: frozenset[str]
+    ) -> BaseModel:
+        """
+        Получить корзину, в позициях которой только поля fields.
+
+        Из БД читаются только эти колонки и колонки, нужные для итогов.
+        """
+        await self._activate(user_id)
+        items = await self.repo.get_fields_by_user(user_id, fields | _TOTALS_COLUMNS)
+        item_schema, cart_schema = cart_fields_schemas(fields)
+        total_price, total_items = self._totals(items)
+
+        logger.info(
+            "cart_fetched",
+            user_id=str(user_id),
+            items_count=len(items),
+            fields=len(fields),
+        )
+        return cart_schema(
+            items=[item_schema.model_validate(item) for item in items],
+            total_price=total_price,
+            total_items=total_items,
+        )
 
-        total_price = Decimal(0)
+    @staticmethod
+    def _totals(items: Sequence) -> tuple[int, int]:
+        """Итоги по выбранным доступным товарам: сумма и количество единиц."""
+        total_price = 0
         total_items = 0
         for item in items:
             if item.out_of_stock or item.product_deleted or not item.is_selected:
@@ -53,19 +179,80 @@ class CartService:
             )
             total_price += effective_price * item.quantity
             total_items += item.quantity
+        return total_price, total_items
 
-        logger.info("cart_fetched", user_id=str(user_id), items_count=len(items))
-
+    @classmethod
+    def _build_cart(cls, items: list[CartItemModel]) -> CartResponseSchema:
+        """Собирает ответ корзины и считает итоги по выбранным доступным товарам."""
+        total_price, total_items = cls._totals(items)
         return CartResponseSchema(
-            items=item_responses,
+            items=[CartItemResponseSchema.model_validate(item) for item in items],
             total_price=total_price,
             total_items=total_items,
         )
 
+    @classmethod
+    def _cart_from_rows(
+        cls, rows: list[tuple[CartItemModel, str]]
+    ) -> CartResponseSchema:
+        """Корзина из результата изменения с возвратом корзины (без удалённых)."""
+        return cls._build_cart([item for item, state in rows if state != ROW_DELETED])
+
+    @staticmethod
+    def _ensure_touched(
+        rows: list[tuple[CartItemModel, str]],
+        user_id: uuid.UUID,
+        item_ids: Collection[uuid.UUID],
+    ) -> None:
+        """Проверяет, что изменение нашло все позиции.
+
+        Позиция есть в корзине, но не изменена — не совпала ожидаемая версия.
+
+        Raises:
+            NotFoundException: позиция не найдена или не принадлежит пользователю
+            ConflictException: версия позиции не совпала с If-Match / version
+        """
+        touched = {item.id for item, state in rows if state != ROW_UNCHANGED}
+        missing = set(item_ids) - touched
+        if not missing:
+            return
+
+        in_cart = {item.id for item, _ in rows}
+        if missing - in_cart:
+            raise NotFoundException(
+                f"Cart items {sorted(map(str, missing - in_cart))} not found "
+                f"for user={user_id}"
+            )
+        raise ConflictException(
+            f"Cart items {sorted(map(str, missing))} were modified concurrently"
+        )
+
+    @staticmethod
+    def _not_applied(
+        user_id: uuid.UUID, item_id: uuid.UUID, expected_version: int | None
+    ) -> CartServiceException:
+        """Ошибка для изменения, не нашедшего позицию после её чтения."""
+        if expected_version is not None:
+            return ConflictException(
+                f"Cart item with id={item_id} was modified concurrently"
+            )
+        return NotFoundException(
+            f"Cart item with id={item_id} not found for user={user_id}"
+        )
+
+    @staticmethod
+    def _ensure_version(item: CartItemModel, expected_version: int | None) -> None:
+        if expected_version is not None and item.version != expected_version:
+            raise ConflictException(
+                f"Cart item with id={item.id} has version={item.version}, "
+                f"expected {expected_version}"
+            )
+
     async def get_list_selected_items(
         self, user_id: uuid.UUID
     ) -> list[CartItemSelectedResponseSchema]:
         """Возвращает список выбранных пользователем товаров."""
+        await self._activate(user_id)
         selected_items = await self.repo.get_list_selected_items(user_id)
         return [
             CartItemSelectedResponseSchema.model_validate(item)
@@ -73,32 +260,57 @@ class CartService:
         ]
 
     async def add_item(
-        self, user_id: uuid.UUID, product_id: int, quantity: int
-    ) -> CartItemResponseSchema:
+        self,
+        user_id: uuid.UUID,
+        product_id: int,
+        quantity: int,
+        return_cart: bool = False,
+    ) -> CartItemResponseSchema | CartResponseSchema:
         """
         Добавить товар в корзину.
 
-        Если товар уже есть — увеличивает quantity.
-        Иначе запрашивает снапшот у Product Service и создаёт новую запись.
+        Если товар уже есть — атомарно увеличивает quantity.
+        Иначе запрашивает снапшот у Product Service и создаёт новую запись;
+        если параллельный запрос успел добавить тот же товар, количество
+        прибавляется к его позиции. При return_cart=True изменение и чтение
+        корзины выполняются одним запросом и возвращается вся корзина.
 
         Raises:
             NotFoundException: товар не найден в Product Service
             ServiceUnavailableException: Product Service недоступен
         """
+        await self._activate(user_id)
         existing_item = await self.repo.get_by_user_and_product(user_id, product_id)
 
         if existing_item is not None:
-            logger.info(
-                "cart_item_duplicate_quantity_increased",
-                user_id=str(user_id),
-                product_id=product_id,
-                new_quantity=existing_item.quantity + quantity,
-            )
-            updated = await self.repo.update_quantity(
-                existing_item, existing_item.quantity + quantity
-            )
-            await self.session.commit()
-            return CartItemResponseSchema.model_validate(updated)
+            if return_cart:
+                rows = await self.repo.add_quantity_returning_cart(
+                    user_id, existing_item.id, quantity
+                )
+                updated = next(
+                    (
+                        item
+                        for item, state in rows
+                        if item.id == existing_item.id and state == ROW_CHANGED
+                    ),
+                    None,
+                )
+            else:
+                updated = await self.repo.add_quantity(
+                    user_id, existing_item.id, quantity
+                )
+            # None — позицию удалили параллельно: товар добавляется заново
+            if updated is not None:
+                await self.session.commit()
+                logger.info(
+                    "cart_item_duplicate_quantity_increased",
+                    user_id=str(user_id),
+                    product_id=product_id,
+                    new_quantity=updated.quantity,
+                )
+                if return_cart:
+                    return self._cart_from_rows(rows)
+                return CartItemResponseSchema.model_validate(updated)
 
         # Запрашиваем снапшот товара у Product Service
         product = await self.product_client.get_product(product_id)
@@ -109,11 +321,14 @@ class CartService:
             product_id=product.id,
             quantity=quantity,
             product_name=product.title,
-            product_price=Decimal(product.price),
+            product_price=product.price,
             product_image=product_image,
             is_selected=True,
         )
-        created = await self.repo.create(item)
+        if return_cart:
+            rows = await self.repo.create_returning_cart(item)
+        else:
+            created = await self.repo.create(item)
         await self.session.commit()
 
         logger.info(
@@ -122,24 +337,45 @@ class CartService:
             product_id=product_id,
             quantity=quantity,
         )
+        if return_cart:
+            return self._cart_from_rows(rows)
         return CartItemResponseSchema.model_validate(created)
 
     async def update_quantity(
-        self, user_id: uuid.UUID, item_id: uuid.UUID, quantity: int
-    ) -> CartItemResponseSchema:
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        quantity: int,
+        return_cart: bool = False,
+        expected_version: int | None = None,
+    ) -> CartItemResponseSchema | CartResponseSchema:
         """
         Изменить количество товара в корзине.
 
+        При return_cart=True возвращает всю корзину (один запрос к БД).
+        С expected_version изменение применяется, только если версия позиции
+        совпадает (compare-and-swap без блокировок).
+
         Raises:
             NotFoundException: запись не найдена или не принадлежит пользователю
+            ConflictException: версия позиции не совпала с expected_version
         """
-        item = await self.repo.get_item(item_id, user_id)
-        if item is None:
-            raise NotFoundException(
-                f"Cart item with id={item_id} not found for user={user_id}"
+        await self._activate(user_id)
+        if return_cart:
+            rows = await self.repo.update_item_returning_cart(
+                user_id, item_id, expected_version, quantity=quantity
             )
-
-        updated = await self.repo.update_quantity(item, quantity)
+            self._ensure_touched(rows, user_id, [item_id])
+        else:
+            item = await self.repo.get_item(item_id, user_id)
+            if item is None:
+                raise NotFoundException(
+                    f"Cart item with id={item_id} not found for user={user_id}"
+                )
+            self._ensure_version(item, expected_version)
+            updated = await self.repo.update_quantity(item, quantity, expected_version)
+            if updated is None:
+                raise self._not_applied(user_id, item_id, expected_version)
         await self.session.commit()
 
         logger.info(
@@ -148,24 +384,46 @@ class CartService:
             item_id=str(item_id),
             quantity=quantity,
         )
+        if return_cart:
+            return self._cart_from_rows(rows)
         return CartItemResponseSchema.model_validate(updated)
 
     async def change_item_selection(
-        self, user_id: uuid.UUID, item_id: uuid.UUID, is_selected: bool
-    ) -> CartItemResponseSchema:
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        is_selected: bool,
+        return_cart: bool = False,
+        expected_version: int | None = None,
+    ) -> CartItemResponseSchema | CartResponseSchema:
         """
         Изменить статус выбора товара в корзине.
 
+        При return_cart=True возвращает всю корзину (один запрос к БД).
+        С expected_version изменение применяется, только если версия совпадает.
+
         Raises:
             NotFoundException: запись не найдена или не принадлежит пользователю
+            ConflictException: версия позиции не совпала с expected_version
         """
-        item = await self.repo.get_item(item_id, user_id)
-        if item is None:
-            raise NotFoundException(
-                f"Cart item with id={item_id} not found for user={user_id}"
+        await self._activate(user_id)
+        if return_cart:
+            rows = await self.repo.update_item_returning_cart(
+                user_id, item_id, expected_version, is_selected=is_selected
             )
-
-        updated = await self.repo.update_selection(item, is_selected)
+            self._ensure_touched(rows, user_id, [item_id])
+        else:
+            item = await self.repo.get_item(item_id, user_id)
+            if item is None:
+                raise NotFoundException(
+                    f"Cart item with id={item_id} not found for user={user_id}"
+                )
+            self._ensure_version(item, expected_version)
+            updated = await self.repo.update_selection(
+                item, is_selected, expected_version
+            )
+            if updated is None:
+                raise self._not_applied(user_id, item_id, expected_version)
         await self.session.commit()
 
         logger.info(
@@ -174,6 +432,8 @@ class CartService:
             item_id=str(item_id),
             is_selected=is_selected,
         )
+        if return_cart:
+            return self._cart_from_rows(rows)
         return CartItemResponseSchema.model_validate(updated)
 
     async def select_all(
@@ -182,9 +442,10 @@ class CartService:
         """Выбрать или снять выбор со всех доступных товаров корзины.
 
         При is_selected=True игнорирует товары с out_of_stock=True или product_deleted=True.
-        Возвращает обновлённую корзину.
+        Возвращает обновлённую корзину — её читает тот же запрос, что и обновляет.
         """
-        await self.repo.update_selection_for_all(user_id, is_selected)
+        await self._activate(user_id)
+        rows = await self.repo.update_selection_for_all(user_id, is_selected)
         await self.session.commit()
 
         logger.info(
@@ -192,22 +453,89 @@ class CartService:
             user_id=str(user_id),
             is_selected=is_selected,
         )
-        return await self.get_cart(user_id)
+        return self._cart_from_rows(rows)
 
-    async def remove_item(self, user_id: uuid.UUID, item_id: uuid.UUID) -> None:
+    async def bulk_update_items(
+        self, user_id: uuid.UUID, operations: list[CartItemOperationSchema]
+    ) -> CartResponseSchema:
+        """
+        Применить изменения нескольких позиций в одной транзакции.
+
+        Количество и выбор обновляются одним UPDATE, удаление — одним DELETE;
+        оба выполняются вместе с чтением корзины одним запросом.
+        Возвращает обновлённую корзину.
+
+        Raises:
+            NotFoundException: хотя бы одна позиция не найдена или не принадлежит
+                пользователю (изменения не применяются)
+            ConflictException: версия хотя бы одной позиции не совпала с
+                переданной (изменения не применяются)
+        """
+        quantities = {
+            op.item_id: op.quantity for op in operations if op.quantity is not None
+        }
+        selections = {
+            op.item_id: op.is_selected
+            for op in operations
+            if op.is_selected is not None
+        }
+        removals = [op.item_id for op in operations if op.remove]
+        versions = {
+            op.item_id: op.version for op in operations if op.version is not None
+        }
+
+        await self._activate(user_id)
+        rows = await self.repo.bulk_update_items(
+            user_id, quantities, selections, removals, versions
+        )
+
+        try:
+            self._ensure_touched(rows, user_id, [op.item_id for op in operations])
+        except (NotFoundException, ConflictException):
+            await self.session.rollback()
+            raise
+        await self.session.commit()
+
+        logger.info(
+            "cart_items_bulk_updated",
+            user_id=str(user_id),
+            updated=len(operations) - len(removals),
+            removed=len(removals),
+        )
+        return self._cart_from_rows(rows)
+
+    async def remove_item(
+        self,
+        user_id: uuid.UUID,
+        item_id: uuid.UUID,
+        return_cart: bool = False,
+        expected_version: int | None = None,
+    ) -> CartResponseSchema | None:
         """
         Удалить товар из корзины.
 
+        При return_cart=True возвращает оставшуюся корзину (один запрос к БД).
+        С expected_version позиция удаляется, только если версия совпадает.
+
         Raises:
             NotFoundException: запись не найдена или не принадлежит пользователю
+            ConflictException: версия позиции не совпала с expected_version
         """
-        item = await self.repo.get_item(item_id, user_id)
-        if item is None:
-            raise NotFoundException(
-                f"Cart item with id={item_id} not found for user={user_id}"
+        await self._activate(user_id)
+        if return_cart:
+            rows = await self.repo.delete_item_returning_cart(
+                user_id, item_id, expected_version
             )
-
-        await self.repo.delete_item(item)
+            self._ensure_touched(rows, user_id, [item_id])
+        else:
+            item = await self.repo.get_item(item_id, user_id)
+            if item is None:
+                raise NotFoundException(
+                    f"Cart item with id={item_id} not found for user={user_id}"
+                )
+            self._ensure_version(item, expected_version)
+            if not await self.repo.delete_item(item, expected_version):
+                raise self._not_applied(user_id, item_id, expected_version)
         await self.session.commit()
 
         logger.info(
@@ -215,23 +543,118 @@ class CartService:
             user_id=str(user_id),
             item_id=str(item_id),
         )
+        return self._cart_from_rows(rows) if return_cart else None
 
     async def delete_selected_items(self, user_id: uuid.UUID, items: list[int]) -> int:
+        await self._activate(user_id)
         deleted_count = await self.repo.delete_selected_items(user_id, items)
         await self.session.commit()
         return deleted_count
 
-    async def clear_cart(self, user_id: uuid.UUID) -> None:
-        """Очистить всю корзину пользователя."""
+    async def clear_cart(
+        self, user_id: uuid.UUID, return_cart: bool = False
+    ) -> CartResponseSchema | None:
+        """Очистить всю корзину пользователя.
+
+        При return_cart=True возвращает пустую корзину.
+        """
+        await self._activate(user_id)
         await self.repo.delete_all(user_id)
         await self.session.commit()
 
         logger.info("cart_cleared", user_id=str(user_id))
+        return self._build_cart([]) if return_cart else None
+
+    async def validate_selected(self, user_id: uuid.UUID) -> CartValidationSchema:
+        """
+        Перепроверить выбранные товары в Product Service перед оформлением заказа.
+
+        Товары запрашиваются параллельно (не больше CART_VALIDATE_CONCURRENCY
+        одновременно, с учётом кеша ProductClient), поэтому проверка длится
+        примерно как самый медленный запрос, а не их сумма. На время запросов
+        соединение с БД возвращается в пул. Расхождения применяются одним
+        UPDATE, который возвращает обновлённую корзину; позиции, изменённые
+        во время запросов (версия не совпала), не обновляются и попадают в
+        conflicts.
+
+        Raises:
+            ServiceUnavailableException: Product Service недоступен
+        """
+        await self._activate(user_id)
+        items = await self.repo.get_by_user(user_id)
+        await self.session.commit()
+
+        selected = [
+            item for item in items if item.is_selected and not item.product_deleted
+        ]
+        products = await self.product_client.get_products(
+            list({item.product_id for item in selected}),
+            settings.CART_VALIDATE_CONCURRENCY,
+        )
+
+        values = {}
+        versions = {}
+        changes = []
+        for item in selected:
+            product = products.get(item.product_id)
+            item_values, kinds = _snapshot_diff(item, product)
+            if not kinds:
+                continue
+            values[item.id] = item_values
+            versions[item.id] = item.version
+            changes.append(
+                CartItemChangeSchema(
+                    item_id=item.id,
+                    product_id=item.product_id,
+                    changes=kinds,
+                    old_price=item.current_price
+                    if item.price_changed and item.current_price is not None
+                    else item.product_price,
+                    new_price=product.price if product is not None else None,
+                )
+            )
+
+        conflicts = []
+        if values:
+            rows = await self.repo.update_items_returning_cart(
+                user_id, values, versions
+            )
+            await self.session.commit()
+            # Позиции, удалённые параллельно, не изменены — о них не сообщаем
+            states = {item.id: state for item, state in rows}
+            conflicts = [
+                change
+                for change in changes
+                if states.get(change.item_id) == ROW_UNCHANGED
+            ]
+            changes = [
+                change
+                for change in changes
+                if states.get(change.item_id) == ROW_CHANGED
+            ]
+            cart = self._cart_from_rows(rows)
+        else:
+            cart = self._build_cart(items)
+
+        logger.info(
+            "cart_validated",
+            user_id=str(user_id),
+            checked=len(selected),
+            changed=len(changes),
+            conflicts=len(conflicts),
+        )
+        return CartValidationSchema(
+            valid=not changes and not conflicts,
+            changes=changes,
+            conflicts=conflicts,
+            cart=cart,
+        )
 
     # ─── Internal API (webhooks + Order Service) ──────────────────
 
     async def get_user_cart(self, user_id: uuid.UUID) -> list[CartItemModel]:
         """Получить корзину пользователя (используется Order Service)."""
+        await self._activate(user_id)
         items = await self.repo.get_by_user(user_id)
 
         logger.info(
@@ -241,8 +664,103 @@ class CartService:
         )
         return items
 
+    async def get_user_carts(self, user_ids: list[uuid.UUID]) -> list[UserCartSchema]:
+        """Получить корзины нескольких пользователей одним запросом.
+
+        Корзины возвращаются в порядке user_ids, включая пустые. Архивные
+        корзины читаются из архива, но не возвращаются в cart_items: пакетное
+        чтение — не обращение пользователя к корзине.
+        """
+        items = await self.repo.get_by_users(user_ids)
+
+        grouped: dict[uuid.UUID, list[CartItemModel]] = {
+            user_id: [] for user_id in user_ids
+        }
+        for item in items:
+            grouped[item.user_id].append(item)
+
+        archived = await self.archive.get_items(user_ids) if self.archive else {}
+        for user_id, archived_items in archived.items():
+            # Товар, добавленный заново после архивации, берётся из cart_items —
+            # как при возврате корзины
+            present = {item.product_id for item in grouped[user_id]}
+            grouped[user_id].extend(
+                item for item in archived_items if item.product_id not in present
+            )
+            grouped[user_id].sort(key=lambda item: item.created_at)
+
+        logger.info(
+            "carts_batch_retrieved",
+            users_count=len(user_ids),
+            items_count=sum(len(user_items) for user_items in grouped.values()),
+            archived_count=len(archived),
+        )
+        return [
+            UserCartSchema(
+                user_id=user_id,
+                items=[
+                    InternalCartItemSchema.model_validate(item) for item in user_items
+                ],
+            )
+            for user_id, user_items in grouped.items()
+        ]
+
+    async def get_checkout_snapshot(self, user_id: uuid.UUID) -> CheckoutSnapshotSchema:
+        """
+        Получить снапшот корзины для оформления заказа.
+
+        Возвращает выбранные доступные товары с эффективными ценами, итоги и
+        версию снапшота. Данные читаются одним запросом в транзакции
+        REPEATABLE READ, поэтому webhook'и не могут изменить их посередине.
+        """
+        await self._activate(user_id)
+        await self.session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        rows = await self.repo.get_checkout_snapshot(user_id)
+
+        logger.info(
+            "checkout_snapshot_retrieved",
+            user_id=str(user_id),
+            items_count=len(rows),
+        )
+        return CheckoutSnapshotSchema(
+            items=[CheckoutSnapshotItemSchema.model_validate(row) for row in rows],
+            total_price=rows[0].total_price if rows else 0,
+            total_items=rows[0].total_items if rows else 0,
+            version=_snapshot_version(rows),
+        )
+
+    async def clear_checkout_snapshot(self, user_id: uuid.UUID, version: str) -> int:
+        """
+        Удалить из корзины ровно те позиции, что вошли в снапшот с данной версией.
+
+        Возвращает количество удалённых строк.
+
+        Raises:
+            ConflictException: корзина изменилась после получения снапшота
+        """
+        rows = await self.repo.lock_checkout_snapshot(user_id)
+        if _snapshot_version(rows) != version:
+            await self.session.rollback()
+            raise ConflictException(
+                f"Checkout snapshot version={version} is outdated for user={user_id}"
+            )
+
+        deleted = await self.repo.delete_items(user_id, [row.id for row in rows])
+        await self.session.commit()
+
+        logger.info(
+            "checkout_snapshot_cleared",
+            user_id=str(user_id),
+            version=version,
+            deleted_rows=deleted,
+        )
+        return deleted
+
     async def clear_user_cart(self, user_id: uuid.UUID) -> int:
         """Очистить корзину пользователя. Возвращает количество удалённых строк."""
+        await self._activate(user_id)
         deleted = await self.repo.delete_all(user_id)
         await self.session.commit()
 
@@ -259,20 +777,30 @@ class CartService:
         new_price: int,
         new_name: str,
         new_image: str | None,
+        *,
+        commit: bool = True,
     ) -> int:
         """
         Обработать webhook «товар обновлён».
 
         Обновляет снапшоты и ставит price_changed если цена изменилась.
-        Возвращает количество затронутых строк.
+        Возвращает количество затронутых строк. commit=False оставляет
+        изменения в транзакции вызывающего (сверка снапшотов).
         """
+        await self._log_product_change(
+            product_id,
+            current_price=new_price,
+            product_name=new_name,
+            product_image=new_image,
+        )
         rows = await self.repo.mark_price_changed(
             product_id=product_id,
             new_price=new_price,
             new_name=new_name,
             new_image=new_image,
         )
-        await self.session.commit()
+        if commit:
+            await self.session.commit()
 
         logger.info(
             "product_updated_handled",
@@ -282,10 +810,12 @@ class CartService:
         )
         return rows
 
-    async def handle_out_of_stock(self, product_id: int) -> int:
+    async def handle_out_of_stock(self, product_id: int, *, commit: bool = True) -> int:
         """Обработать webhook 'товар закончился'."""
+        await self._log_product_change(product_id, out_of_stock=True, is_selected=False)
         rows = await self.repo.mark_out_of_stock(product_id, value=True)
-        await self.session.commit()
+        if commit:
+            await self.session.commit()
 
         logger.info(
             "product_out_of_stock_handled",
@@ -294,10 +824,14 @@ class CartService:
         )
         return rows
 
-    async def handle_back_in_stock(self, product_id: int) -> int:
+    async def handle_back_in_stock(
+        self, product_id: int, *, commit: bool = True
+    ) -> int:
         """Обработать webhook 'товар снова в наличии'."""
+        await self._log_product_change(product_id, out_of_stock=False)
         rows = await self.repo.mark_out_of_stock(product_id, value=False)
-        await self.session.commit()
+        if commit:
+            await self.session.commit()
 
         logger.info(
             "product_back_in_stock_handled",
@@ -306,10 +840,16 @@ class CartService:
         )
         return rows
 
-    async def handle_product_deleted(self, product_id: int) -> int:
+    async def handle_product_deleted(
+        self, product_id: int, *, commit: bool = True
+    ) -> int:
         """Обработать webhook 'товар удалён'."""
+        await self._log_product_change(
+            product_id, product_deleted=True, is_selected=False
+        )
         rows = await self.repo.mark_deleted(product_id)
-        await self.session.commit()
+        if commit:
+            await self.session.commit()
 
         logger.info(
             "product_deleted_handled",
@@ -0,0 +1,244 @@
+"""Архив холодных корзин.
+
+Корзины, к которым не обращались CART_ARCHIVE_IDLE_DAYS дней, фоновая задача
+(src.jobs.cart_archive) переносит из cart_items в cart_archive — одна строка
+JSONB на пользователя. Горячая таблица и её индексы содержат только активные
+корзины, а webhook'и не обновляют архивные позиции: изменение товара одной
+строкой пишется в журнал cart_archive_changes и применяется при возврате
+корзины. При первом обращении пользователя корзина возвращается в cart_items.
+
+Архивные позиции продолжают учитываться в cart_product_stats: перенос в архив
+не вызывает триггеры счётчиков, а изменения архивных позиций (применение
+журнала, возврат корзины) прибавляются к счётчикам явно.
+"""
+
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.db.models import CartArchiveChangeModel, CartArchiveModel, CartItemModel
+from src.repositories.cart import item_from_document
+from src.repositories.cart_archive import CartArchiveRepository
+from src.repositories.product_stats import ProductStatsRepository
+
+logger = structlog.get_logger(__name__)
+
+
+# Пользователи, чья активность недавно отмечена этим процессом (monotonic).
+# Пока отметка свежая, корзина не может попасть в архив, поэтому ни отметка,
+# ни проверка архива не нужны.
+_touched: dict[uuid.UUID, float] = {}
+_TOUCHED_MAX_SIZE = 100_000
+
+
+def apply_changes(
+    items: list[dict[str, Any]], changes: list[CartArchiveChangeModel]
+) -> list[dict[str, Any]]:
+    """Применяет журнал изменений товаров к позициям архива.
+
+    Изменение задаёт абсолютные значения колонок, поэтому повторное
+    применение не меняет данных позиции (только увеличивает version).
+    """
+    items = [dict(item) for item in items]
+    for change in changes:
+        for item in items:
+            if item["product_id"] != change.product_id:
+                continue
+            item.update(change.fields)
+            if "current_price" in change.fields:
+                item["price_changed"] = (
+                    item["product_price"] != change.fields["current_price"]
+                )
+            item["version"] = item.get("version", 1) + 1
+            item["updated_at"] = change.created_at.isoformat()
+    return items
+
+
+def stats_deltas(
+    replacements: Iterable[tuple[list[dict[str, Any]], list[dict[str, Any]]]],
+) -> list[dict[str, int]]:
+    """Изменения счётчиков cart_product_stats при замене позиций (old, new).
+
+    Одна строка на товар — как требует INSERT ... ON CONFLICT DO UPDATE.
+    """
+    deltas: dict[int, list[int]] = defaultdict(lambda: [0, 0, 0])
+    for old_items, new_items in replacements:
+        for sign, items in ((-1, old_items), (1, new_items)):
+            for item in items:
+                delta = deltas[item["product_id"]]
+                delta[0] += sign
+                delta[1] += sign * item["quantity"]
+                if item["is_selected"]:
+                    delta[2] += sign * item["quantity"]
+    return [
+        {
+            "product_id": product_id,
+            "carts_count": carts,
+            "total_quantity": quantity,
+            "selected_quantity": selected,
+        }
+        for product_id, (carts, quantity, selected) in deltas.items()
+        if carts or quantity or selected
+    ]
+
+
+class CartArchiveService:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.repo = CartArchiveRepository(session)
+        self.stats = ProductStatsRepository(session)
+
+    async def activate(self, user_id: uuid.UUID) -> bool:
+        """Отмечает обращение к корзине и возвращает её из архива.
+
+        Не чаще раза в CART_ACTIVITY_TOUCH_INTERVAL секунд на пользователя
+        в процессе. True — в сессии есть изменения: после их коммита нужно
+        вызвать mark_touched.
+        """
+        touched_at = _touched.get(user_id)
+        if (
+            touched_at is not None
+            and time.monotonic() - touched_at < settings.CART_ACTIVITY_TOUCH_INTERVAL
+        ):
+            return False
+
+        # Отметка — до проверки архива: если задача архивации сейчас переносит
+        # корзину, отметка дождётся её коммита и архив будет виден
+        await self.repo.touch(user_id)
+        await self.rehydrate(user_id)
+        return True
+
+    @staticmethod
+    def mark_touched(user_id: uuid.UUID) -> None:
+        """Запоминает закоммиченную отметку обращения.
+
+        Только после коммита: если отметка или возврат из архива откатились
+        (таймаут, ошибка), следующий запрос должен повторить их, а не
+        показывать пустую корзину до конца интервала.
+        """
+        if len(_touched) >= _TOUCHED_MAX_SIZE:
+            _touched.clear()
+        _touched[user_id] = time.monotonic()
+
+    async def log_product_change(self, product_id: int, **fields: Any) -> None:
+        """Запись изменения товара для архивных корзин.
+
+        Вызывается до обновления cart_items в той же транзакции (см.
+        CartArchiveRepository.lock_changes).
+        """
+        await self.repo.log_change(product_id, fields)
+
+    async def get_items(
+        self, user_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, list[CartItemModel]]:
+        """Позиции архивных корзин пользователей без возврата в cart_items.
+
+        Для чтений, которые не считаются обращением пользователя (пакетное
+        чтение): изменения из журнала применяются в памяти, как при возврате.
+        """
+        archives = await self.repo.get_many(user_ids)
+        if not archives:
+            return {}
+
+        return {
+            archive.user_id: [
+                CartItemModel(**item_from_document(archive.user_id, item))
+                for item in items
+            ]
+            for archive, items in zip(
+                archives, await self._apply_pending(archives), strict=True
+            )
+        }
+
+    async def rehydrate(self, user_id: uuid.UUID) -> bool:
+        """Возвращает архивную корзину в cart_items; False — архива нет."""
+        if not await self.repo.exists(user_id):
+            return False
+
+        await self.repo.lock_changes()
+        archive = await self.repo.take(user_id)
+        if archive is None:
+            # Корзину уже вернул параллельный запрос
+            return False
+
+        changes = await self.repo.get_changes(archive.change_id, archive.product_ids)
+        items = apply_changes(archive.items, changes)
+        await self.repo.restore(user_id, items)
+        # Триггер cart_items уже учёл вернувшиеся позиции (без тех, что
+        # пользователь добавил заново), вклад архива вычитается
+        await self.stats.apply_deltas(stats_deltas([(archive.items, [])]))
+
+        logger.info(
+            "cart_rehydrated",
+            user_id=str(user_id),
+            items_count=len(items),
+            changes_applied=len(changes),
+            archived_at=archive.archived_at.isoformat(),
+        )
+        return True
+
+    async def archive_idle(self, limit: int) -> tuple[int, int]:
+        """Переносит в архив пачку корзин без обращений CART_ARCHIVE_IDLE_DAYS дней.
+
+        Возвращает число обработанных пользователей и заархивированных корзин.
+        """
+        idle_since = datetime.now(UTC) - timedelta(days=settings.CART_ARCHIVE_IDLE_DAYS)
+        await self.repo.lock_changes()
+        change_id = await self.repo.last_change_id()
+        return await self.repo.archive_idle(idle_since, limit, change_id)
+
+    async def fold_changes(self, limit: int) -> int:
+        """Применяет накопленный журнал к пачке архивов.
+
+        Иначе журнал рос бы, пока не вернут самую старую корзину с товаром.
+        Возвращает число обновлённых архивов.
+        """
+        await self.repo.lock_changes()
+        change_id = await self.repo.last_change_id()
+        archives = await self.repo.lock_pending(limit)
+        if not archives:
+            return 0
+
+        replacements = []
+        for archive, items in zip(
+            archives, await self._apply_pending(archives), strict=True
+        ):
+            replacements.append((archive.items, items))
+            archive.items = items
+            archive.change_id = change_id
+        await self.session.flush()
+        await self.stats.apply_deltas(stats_deltas(replacements))
+        return len(archives)
+
+    async def _apply_pending(
+        self, archives: list[CartArchiveModel]
+    ) -> list[list[dict[str, Any]]]:
+        """Позиции каждого архива с применёнными изменениями из журнала."""
+        changes = await self.repo.get_changes(
+            min(archive.change_id for archive in archives),
+            list(
+                {
+                    product_id
+                    for archive in archives
+                    for product_id in archive.product_ids
+                }
+            ),
+        )
+        return [
+            apply_changes(
+                archive.items,
+                [change for change in changes if change.id > archive.change_id],
+            )
+            for archive in archives
+        ]
+
+    async def prune_changes(self) -> int:
+        """Удаляет из журнала изменения, уже учтённые всеми архивами."""
+        return await self.repo.prune_changes()
@@ -0,0 +1,178 @@
+"""Живые обновления корзины по Server-Sent Events.
+
+Соединение подписывается на корзину пользователя в реестре процесса.
+Инвалидации с шины (LISTEN/NOTIFY) только выставляют флаг «корзина
+изменилась» у затронутых подписок; поток перечитывает корзину короткой
+сессией и отправляет клиенту разницу с последним отправленным состоянием.
+Флаг вместо очереди событий даёт естественный backpressure: медленный клиент
+получает одну актуальную дельту вместо накопившейся очереди, а простаивающее
+соединение не держит ни соединения с БД, ни буферов.
+"""
+
+import asyncio
+import json
+import uuid
+import weakref
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from typing import Any
+
+import structlog
+
+from src.config import settings
+from src.db.database import async_session_maker
+from src.db.invalidation import Invalidation, invalidation_bus
+from src.exceptions import ServiceUnavailableException
+from src.services.cart import CartService
+
+logger = structlog.get_logger(__name__)
+
+
+class _Subscription:
+    __slots__ = ("changed", "product_ids", "user_id")
+
+    def __init__(self, user_id: uuid.UUID) -> None:
+        self.user_id = user_id
+        self.changed = asyncio.Event()
+        self.product_ids: set[int] = set()
+
+
+def _format_event(event: str, data: dict[str, Any]) -> str:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _diff(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any] | None:
+    """Дельта между состояниями корзины; None — изменений нет.
+
+    upserted — новые и изменённые позиции целиком, removed — id удалённых,
+    итоги передаются всегда.
+    """
+    old_items = {item["id"]: item for item in old["items"]}
+    new_items = {item["id"]: item for item in new["items"]}
+
+    upserted = [
+        item for item_id, item in new_items.items() if old_items.get(item_id) != item
+    ]
+    removed = [item_id for item_id in old_items if item_id not in new_items]
+    totals = {key: value for key, value in new.items() if key != "items"}
+
+    if not upserted and not removed and all(old[key] == totals[key] for key in totals):
+        return None
+    return {"upserted": upserted, "removed": removed, **totals}
+
+
+class CartEventHub:
+    """Реестр SSE-подписок процесса по пользователям и товарам в их корзинах."""
+
+    def __init__(self) -> None:
+        self._by_user: dict[uuid.UUID, set[_Subscription]] = defaultdict(set)
+        self._by_product: dict[int, set[_Subscription]] = defaultdict(set)
+        self._connections = 0
+        self._fetch_semaphore = asyncio.Semaphore(
+            settings.CART_EVENTS_MAX_CONCURRENT_FETCHES
+        )
+
+    def on_invalidation(self, invalidation: Invalidation) -> None:
+        """Подписчик шины инвалидации: помечает затронутые подписки."""
+        if invalidation.full:
+            for subscriptions in self._by_user.values():
+                for subscription in subscriptions:
+                    subscription.changed.set()
+            return
+
+        for user_id in invalidation.user_ids:
+            for subscription in self._by_user.get(user_id, ()):
+                subscription.changed.set()
+        for product_id in invalidation.product_ids:
+            for subscription in self._by_product.get(product_id, ()):
+                subscription.changed.set()
+
+    def stats(self) -> dict:
+        return {"connections": self._connections, "users": len(self._by_user)}
+
+    def _register(self, user_id: uuid.UUID) -> _Subscription:
+        subscription = _Subscription(user_id)
+        self._by_user[user_id].add(subscription)
+        self._connections += 1
+        return subscription
+
+    def _unregister(self, subscription: _Subscription) -> None:
+        subscriptions = self._by_user.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            # Уже снята: finally потока и финализатор вызывают это оба
+            return
+        self._track_products(subscription, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._by_user[subscription.user_id]
+        self._connections -= 1
+
+    def _track_products(self, subscription: _Subscription, product_ids: set[int]):
+        """Обновляет индекс товаров, по которым подписка получает инвалидации."""
+        for product_id in subscription.product_ids - product_ids:
+            subscriptions = self._by_product[product_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._by_product[product_id]
+        for product_id in product_ids - subscription.product_ids:
+            self._by_product[product_id].add(subscription)
+        subscription.product_ids = product_ids
+
+    async def _fetch(self, subscription: _Subscription) -> dict[str, Any]:
+        # Короткая сессия на каждое чтение: простаивающий поток не держит
+        # соединение пула, а семафор сглаживает всплеск после webhook'а
+        async with self._fetch_semaphore, async_session_maker() as session:
+            cart = await CartService(session).get_cart(subscription.user_id)
+
+        self._track_products(subscription, {item.product_id for item in cart.items})
+        return cart.model_dump(mode="json")
+
+    def open(self, user_id: uuid.UUID) -> AsyncIterator[str]:
+        """Регистрирует подписку и возвращает поток событий для StreamingResponse.
+
+        Raises:
+            ServiceUnavailableException: исчерпан CART_EVENTS_MAX_CONNECTIONS.
+        """
+        if self._connections >= settings.CART_EVENTS_MAX_CONNECTIONS:
+            raise ServiceUnavailableException("Too many cart event streams")
+        # Слот занимается сразу после проверки лимита: иначе одновременные
+        # open() успели бы пройти проверку до регистрации подписок
+        subscription = self._register(user_id)
+        stream = self._stream(subscription)
+        # Если клиент отключится до начала чтения, генератор не запустится и
+        # его finally не выполнится — подписку снимет финализатор
+        weakref.finalize(stream, self._unregister, subscription)
+        return stream
+
+    async def _stream(self, subscription: _Subscription) -> AsyncIterator[str]:
+        user_id = subscription.user_id
+        logger.info("cart_events_connected", user_id=str(user_id))
+        try:
+            yield f"retry: {settings.CART_EVENTS_RETRY_MS}\n\n"
+            state = await self._fetch(subscription)
+            yield _format_event("snapshot", state)
+
+            while True:
+                try:
+                    async with asyncio.timeout(settings.CART_EVENTS_HEARTBEAT_INTERVAL):
+                        await subscription.changed.wait()
+                except TimeoutError:
+                    if invalidation_bus.connected:
+                        yield ": heartbeat\n\n"
+                        continue
+                    # Без LISTEN-соединения уведомления теряются —
+                    # сверяем корзину по таймеру
+
+                # Сброс до чтения: изменение во время чтения вызовет ещё одно
+                subscription.changed.clear()
+                new_state = await self._fetch(subscription)
+                delta = _diff(state, new_state)
+                state = new_state
+                yield _format_event("delta", delta) if delta else ": heartbeat\n\n"
+        finally:
+            self._unregister(subscription)
+            logger.info("cart_events_disconnected", user_id=str(user_id))
+
+
+cart_event_hub = CartEventHub()
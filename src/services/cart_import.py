@@ -0,0 +1,324 @@
+"""Массовый импорт корзин из старой платформы через COPY.
+
+Файл (NDJSON или CSV) читается потоком и грузится пачками по
+IMPORT_BATCH_SIZE строк: пачка копируется через COPY во временную таблицу,
+затем одним INSERT ... ON CONFLICT сливается в cart_items. Слияние пачки и
+запись прогресса выполняются в одной транзакции — повторный запуск с тем же
+job_id продолжает импорт с первой незагруженной строки.
+
+Поля записи: user_id, product_id, quantity и необязательные product_name,
+product_price (копейки), product_image, is_selected, created_at. Позиции без
+снапшота (названия или цены) дозаполняются из Product Service (hydrate) или
+пропускаются.
+"""
+
+import csv
+import json
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Literal
+
+import asyncpg
+import structlog
+
+from src.config import settings
+from src.db.invalidation import invalidation_payloads
+from src.schemas.product import ProductResponseSchema
+from src.services.product_client import ProductClient
+
+logger = structlog.get_logger(__name__)
+
+
+ImportFormat = Literal["ndjson", "csv"]
+# keep — существующая позиция остаётся как есть (живые данные важнее),
+# replace — перезаписывается данными из файла. Оба режима идемпотентны.
+ConflictPolicy = Literal["keep", "replace"]
+
+_STAGING_TABLE = "cart_import_staging"
+_STAGING_COLUMNS = (
+    "user_id",
+    "product_id",
+    "quantity",
+    "product_name",
+    "product_price",
+    "product_image",
+    "is_selected",
+    "created_at",
+)
+
+_CREATE_STAGING = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} (
+        user_id uuid NOT NULL,
+        product_id integer NOT NULL,
+        quantity integer NOT NULL,
+        product_name varchar(255) NOT NULL,
+        product_price bigint NOT NULL,
+        product_image varchar(512),
+        is_selected boolean NOT NULL,
+        created_at timestamptz
+    ) ON COMMIT DELETE ROWS
+"""
+
+_ON_CONFLICT = {
+    "keep": "DO NOTHING",
+    "replace": """DO UPDATE SET
+        quantity = EXCLUDED.quantity,
+        product_name = EXCLUDED.product_name,
+        product_price = EXCLUDED.product_price,
+        product_image = EXCLUDED.product_image,
+        is_selected = EXCLUDED.is_selected,
+        price_changed = false,
+        current_price = NULL,
+        version = cart_items.version + 1,
+        updated_at = now()""",
+}
+
+# Внутри пачки дубликат (user_id, product_id) схлопывается до последней записи:
+# ON CONFLICT не может обновить одну строку дважды за оператор.
+# (xmax = 0) отличает вставленные строки от обновлённых. Пользователям без
+# отметки активности она ставится по дате корзины — иначе старые корзины
+# никогда не попадут в архив.
+_MERGE = """
+    WITH merged AS (
+        INSERT INTO cart_items (
+            id, user_id, product_id, quantity, product_name, product_price,
+            product_image, price_changed, out_of_stock, is_selected,
+            product_deleted, created_at, updated_at
+        )
+        SELECT DISTINCT ON (user_id, product_id)
+            gen_random_uuid(), user_id, product_id, quantity, product_name,
+            product_price, product_image, false, false, is_selected,
+            false, coalesce(created_at, now()), now()
+        FROM {staging}
+        ORDER BY user_id, product_id, created_at DESC NULLS LAST
+        ON CONFLICT (user_id, product_id) {on_conflict}
+        RETURNING (xmax = 0) AS inserted, user_id
+    ),
+    activity AS (
+        INSERT INTO cart_activity (user_id, last_seen_at)
+        SELECT user_id, max(coalesce(created_at, now()))
+        FROM {staging}
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO NOTHING
+    )
+    SELECT
+        count(*) FILTER (WHERE inserted) AS inserted,
+        count(*) FILTER (WHERE NOT inserted) AS updated,
+        coalesce(array_agg(DISTINCT user_id::text), '{{}}') AS user_ids
+    FROM merged
+"""
+
+_LOAD_PROGRESS = """
+    SELECT rows_processed, inserted, updated, skipped, completed
+    FROM cart_import_progress WHERE job_id = $1
+"""
+
+_SAVE_PROGRESS = """
+    INSERT INTO cart_import_progress AS p
+        (job_id, rows_processed, inserted, updated, skipped, completed, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6, now())
+    ON CONFLICT (job_id) DO UPDATE SET
+        rows_processed = EXCLUDED.rows_processed,
+        inserted = EXCLUDED.inserted,
+        updated = EXCLUDED.updated,
+        skipped = EXCLUDED.skipped,
+        completed = EXCLUDED.completed,
+        updated_at = EXCLUDED.updated_at
+"""
+
+_NOTIFY = "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload"
+
+_TRUE_VALUES = {"true", "1", "t", "yes"}
+
+
+@dataclass
+class ImportProgress:
+    """Накопленный прогресс импорта (строки считаются по файлу)."""
+
+    rows_processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    completed: bool = False
+
+
+def _read_records(path: Path, import_format: ImportFormat) -> Iterator[dict]:
+    with path.open(encoding="utf-8", newline="") as file:
+        if import_format == "csv":
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _optional(value: Any) -> Any:
+    # Пустая ячейка CSV означает отсутствие значения
+    return None if value is None or value == "" else value
+
+
+def _parse_record(record: dict) -> dict | None:
+    """Приводит запись файла к типам staging-таблицы; None — запись невалидна."""
+    try:
+        quantity = int(record["quantity"])
+        if quantity < 1:
+            return None
+
+        price = _optional(record.get("product_price"))
+        is_selected = _optional(record.get("is_selected"))
+        created_at = _optional(record.get("created_at"))
+        return {
+            "user_id": uuid.UUID(str(record["user_id"])),
+            "product_id": int(record["product_id"]),
+            "quantity": quantity,
+            "product_name": _optional(record.get("product_name")),
+            "product_price": int(price) if price is not None else None,
+            "product_image": _optional(record.get("product_image")),
+            "is_selected": True
+            if is_selected is None
+            else str(is_selected).lower() in _TRUE_VALUES,
+            "created_at": datetime.fromisoformat(created_at)
+            if isinstance(created_at, str)
+            else None,
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class CartImporter:
+    """Загрузка файла корзин в cart_items пачками COPY + слияние."""
+
+    def __init__(
+        self,
+        connection: asyncpg.Connection,
+        job_id: str,
+        on_conflict: ConflictPolicy = "keep",
+        product_client: ProductClient | None = None,
+    ) -> None:
+        self.connection = connection
+        self.job_id = job_id
+        self.on_conflict = on_conflict
+        self.product_client = product_client
+        # Товары повторяются между корзинами — каждый запрашивается один раз
+        self._products: dict[int, ProductResponseSchema | None] = {}
+
+    async def run(
+        self, path: Path, import_format: ImportFormat, batch_size: int
+    ) -> ImportProgress:
+        progress = await self._load_progress()
+        if progress.completed:
+            logger.info("cart_import_already_completed", job_id=self.job_id)
+            return progress
+
+        await self.connection.execute(_CREATE_STAGING)
+        merge = _MERGE.format(
+            staging=_STAGING_TABLE, on_conflict=_ON_CONFLICT[self.on_conflict]
+        )
+
+        logger.info(
+            "cart_import_started",
+            job_id=self.job_id,
+            path=str(path),
+            resume_from=progress.rows_processed,
+        )
+        started = time.perf_counter()
+        resumed_from = progress.rows_processed
+
+        records = islice(_read_records(path, import_format), resumed_from, None)
+        while batch := list(islice(records, batch_size)):
+            rows = [row for row in map(_parse_record, batch) if row is not None]
+            if self.product_client is not None:
+                await self._hydrate(rows)
+            rows = [
+                row
+                for row in rows
+                if row["product_name"] is not None and row["product_price"] is not None
+            ]
+
+            async with self.connection.transaction():
+                await self.connection.copy_records_to_table(
+                    _STAGING_TABLE,
+                    records=[tuple(row[c] for c in _STAGING_COLUMNS) for row in rows],
+                    columns=_STAGING_COLUMNS,
+                )
+                result = await self.connection.fetchrow(merge)
+                await self._notify(result["user_ids"])
+
+                progress.rows_processed += len(batch)
+                progress.inserted += result["inserted"]
+                progress.updated += result["updated"]
+                progress.skipped += len(batch) - len(rows)
+                await self._save_progress(progress)
+
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "cart_import_progress",
+                job_id=self.job_id,
+                rows_processed=progress.rows_processed,
+                inserted=progress.inserted,
+                updated=progress.updated,
+                skipped=progress.skipped,
+                rows_per_second=round(
+                    (progress.rows_processed - resumed_from) / elapsed
+                ),
+            )
+
+        progress.completed = True
+        await self._save_progress(progress)
+        logger.info("cart_import_completed", job_id=self.job_id, **vars(progress))
+        return progress
+
+    async def _hydrate(self, rows: list[dict]) -> None:
+        """Дозаполняет снапшоты позиций без названия или цены из Product Service."""
+        incomplete = [
+            row
+            for row in rows
+            if row["product_name"] is None or row["product_price"] is None
+        ]
+        missing = list(
+            {row["product_id"] for row in incomplete} - self._products.keys()
+        )
+        if missing:
+            products = await self.product_client.get_products(
+                missing, settings.IMPORT_HYDRATE_CONCURRENCY
+            )
+            for product_id in missing:
+                self._products[product_id] = products.get(product_id)
+
+        for row in incomplete:
+            product = self._products[row["product_id"]]
+            if product is None:
+                continue
+            if row["product_name"] is None:
+                row["product_name"] = product.title
+            if row["product_price"] is None:
+                row["product_price"] = product.price
+            if row["product_image"] is None and product.images:
+                row["product_image"] = product.images[0]
+
+    async def _notify(self, user_ids: list[str]) -> None:
+        """Инвалидация корзин затронутых пользователей в транзакции пачки."""
+        if not user_ids or not settings.INVALIDATION_ENABLED:
+            return
+        payloads = list(invalidation_payloads(f"u:{user_id}" for user_id in user_ids))
+        await self.connection.execute(_NOTIFY, settings.INVALIDATION_CHANNEL, payloads)
+
+    async def _load_progress(self) -> ImportProgress:
+        row = await self.connection.fetchrow(_LOAD_PROGRESS, self.job_id)
+        return ImportProgress(**dict(row)) if row else ImportProgress()
+
+    async def _save_progress(self, progress: ImportProgress) -> None:
+        await self.connection.execute(
+            _SAVE_PROGRESS,
+            self.job_id,
+            progress.rows_processed,
+            progress.inserted,
+            progress.updated,
+            progress.skipped,
+            progress.completed,
+        )
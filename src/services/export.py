@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from typing import Any
+
+import structlog
+from sqlalchemy import Row
+
+from src.config import settings
+from src.db.database import background_session_maker, internal_session_maker
+from src.db.models import CartItemModel
+from src.repositories.storage import get_cart_storage
+from src.schemas.internal import CartExportParamsSchema
+from src.services.cart import CartService
+
+logger = structlog.get_logger(__name__)
+
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+_EXPORT_COLUMNS = [column.name for column in CartItemModel.__table__.columns]
+_EXPORT_FLAGS = ("is_selected", "price_changed", "out_of_stock", "product_deleted")
+
+
+def _to_text(value: Any) -> Any:
+    """Приводит значения БД к JSON/CSV-совместимому виду."""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_ndjson(rows: Sequence[Row]) -> str:
+    return "".join(
+        json.dumps(
+            {column: _to_text(value) for column, value in zip(_EXPORT_COLUMNS, row)},
+            ensure_ascii=False,
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows: Sequence[Sequence[Any]]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_to_text(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def export_cart_items(params: CartExportParamsSchema) -> AsyncIterator[str]:
+    """Потоковая выгрузка позиций корзин (включая архивные) в NDJSON или CSV.
+
+    Открывает собственную сессию из пула background на всё время стрима:
+    сессия из зависимостей запроса не должна жить дольше обработчика, а долгая
+    выгрузка не должна занимать соединения internal API. Память постоянна —
+    в ней только одна пачка из EXPORT_BATCH_SIZE строк.
+    """
+    encode = _encode_ndjson if params.format == "ndjson" else _encode_csv
+    exported = 0
+
+    if params.format == "csv":
+        yield _encode_csv([_EXPORT_COLUMNS])
+
+    flags = {
+        flag: getattr(params, flag)
+        for flag in _EXPORT_FLAGS
+        if getattr(params, flag) is not None
+    }
+    async with background_session_maker() as session:
+        repo = get_cart_storage(session)
+        async for rows in repo.stream_items(
+            settings.EXPORT_BATCH_SIZE,
+            after=params.after,
+            updated_since=params.updated_since,
+            product_id=params.product_id,
+            flags=flags,
+            limit=params.limit,
+        ):
+            exported += len(rows)
+            yield encode(rows)
+
+    logger.info(
+        "cart_items_exported",
+        export_format=params.format,
+        rows=exported,
+        after=str(params.after) if params.after else None,
+    )
+
+
+async def stream_user_carts(user_ids: list[uuid.UUID]) -> AsyncIterator[str]:
+    """Потоковый JSON-ответ пакетного чтения корзин.
+
+    Формат совпадает с CartBatchResponseSchema. Корзины читаются пачками по
+    CART_BATCH_STREAM_THRESHOLD пользователей, каждая пачка — короткой сессией
+    (вместе с архивными корзинами, см. CartService.get_user_carts), поэтому в
+    памяти держится не больше одной пачки.
+    """
+    batch_size = settings.CART_BATCH_STREAM_THRESHOLD
+    separator = ""
+    items_count = 0
+
+    yield '{"carts":['
+    for start in range(0, len(user_ids), batch_size):
+        async with internal_session_maker() as session:
+            carts = await CartService(session).get_user_carts(
+                user_ids[start : start + batch_size]
+            )
+        for cart in carts:
+            yield separator + cart.model_dump_json()
+            separator = ","
+            items_count += len(cart.items)
+    yield "]}"
+
+    logger.info(
+        "carts_batch_streamed",
+        users_count=len(user_ids),
+        items_count=items_count,
+    )
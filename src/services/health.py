@@ -0,0 +1,145 @@
+import asyncio
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+import httpx
+import structlog
+from aio_pika.exceptions import AMQPConnectionError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.db.database import engine
+from src.messaging.broker import broker
+from src.repositories.storage import get_cart_storage
+from src.services.product_client import ProductClient
+
+logger = structlog.get_logger(__name__)
+
+
+# Статусы отдельных проверок
+CHECK_OK = "ok"
+CHECK_FAILED = "failed"
+CHECK_DISABLED = "disabled"
+
+_WARMUP_RETRY_DELAY = 2.0  # секунды
+
+
+class HealthService:
+    """Проверки готовности сервиса с кешированием результатов.
+
+    Результат каждой проверки кешируется на HEALTH_CHECK_CACHE_TTL секунд,
+    а одновременные пробы ждут одну и ту же проверку — частые readiness-пробы
+    не нагружают БД, RabbitMQ и Product Service.
+    """
+
+    def __init__(self, product_client: ProductClient) -> None:
+        self.product_client = product_client
+        self.warmed_up = False
+        self._cache: dict[str, tuple[float, str]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def readiness(self) -> tuple[bool, dict[str, str]]:
+        """Возвращает признак готовности и статусы всех проверок."""
+        checks = {"warmup": CHECK_OK if self.warmed_up else CHECK_FAILED}
+        (
+            checks["database"],
+            checks["broker"],
+            checks["product_service"],
+        ) = await asyncio.gather(
+            self._cached("database", self._check_database),
+            self._cached("broker", self._check_broker),
+            self._cached("product_service", self._check_product_service),
+        )
+
+        ready = self.warmed_up and all(
+            checks[name] != CHECK_FAILED for name in settings.READINESS_REQUIRED_CHECKS
+        )
+        return ready, checks
+
+    async def warm_up(self) -> None:
+        """Прогрев пула соединений и prepared statements до готовности.
+
+        Открывает DB_WARMUP_CONNECTIONS соединений одновременно и выполняет на
+        каждом горячие запросы корзины — asyncpg кеширует подготовленные
+        выражения на соединении, SQLAlchemy кеширует их компиляцию.
+        Повторяет попытки, пока БД недоступна.
+        """
+        while True:
+            try:
+                await asyncio.gather(
+                    *(
+                        self._warm_up_connection()
+                        for _ in range(settings.DB_WARMUP_CONNECTIONS)
+                    )
+                )
+                break
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning("db_warmup_failed", error=str(e))
+                await asyncio.sleep(_WARMUP_RETRY_DELAY)
+
+        self.warmed_up = True
+        logger.info("db_warmup_completed", connections=settings.DB_WARMUP_CONNECTIONS)
+
+    async def _warm_up_connection(self) -> None:
+        nil_id = uuid.UUID(int=0)
+        async with (
+            engine.connect() as connection,
+            AsyncSession(bind=connection) as session,
+        ):
+            repo = get_cart_storage(session)
+            await repo.get_by_user(nil_id)
+            await repo.get_item(nil_id, nil_id)
+            await repo.get_by_user_and_product(nil_id, 0)
+            await repo.get_list_selected_items(nil_id)
+            await repo.get_checkout_snapshot(nil_id)
+
+    def _fresh(self, name: str) -> str | None:
+        cached = self._cache.get(name)
+        if cached and time.monotonic() - cached[0] < settings.HEALTH_CHECK_CACHE_TTL:
+            return cached[1]
+        return None
+
+    async def _cached(self, name: str, check: Callable[[], Awaitable[str]]) -> str:
+        if (result := self._fresh(name)) is not None:
+            return result
+
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            # Пока ждали блокировку, результат мог обновить другой запрос
+            if (result := self._fresh(name)) is not None:
+                return result
+
+            try:
+                result = await asyncio.wait_for(
+                    check(), timeout=settings.HEALTH_CHECK_TIMEOUT
+                )
+            except (
+                SQLAlchemyError,
+                OSError,  # в том числе TimeoutError от wait_for
+                AMQPConnectionError,
+                httpx.HTTPError,
+            ) as e:
+                logger.warning("health_check_failed", check=name, error=str(e))
+                result = CHECK_FAILED
+
+            self._cache[name] = (time.monotonic(), result)
+            return result
+
+    async def _check_database(self) -> str:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return CHECK_OK
+
+    async def _check_broker(self) -> str:
+        if settings.API_ONLY:
+            return CHECK_DISABLED
+        if await broker.ping(timeout=settings.HEALTH_CHECK_TIMEOUT):
+            return CHECK_OK
+        return CHECK_FAILED
+
+    async def _check_product_service(self) -> str:
+        if await self.product_client.ping(timeout=settings.HEALTH_CHECK_TIMEOUT):
+            return CHECK_OK
+        return CHECK_FAILED
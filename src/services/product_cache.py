@@ -0,0 +1,71 @@
+"""Кеш ответов Product Service в памяти процесса.
+
+Записи живут PRODUCT_CACHE_TTL секунд и сбрасываются уведомлениями шины
+инвалидации: webhook'и и сверка снапшотов помечают изменённые товары
+(p:<product_id>). Пока LISTEN-соединение шины не установлено, уведомления
+теряются, поэтому кеш не используется — запросы идут в Product Service.
+"""
+
+import time
+from collections import OrderedDict
+
+from src.config import settings
+from src.db.invalidation import Invalidation, invalidation_bus
+from src.schemas.product import ProductResponseSchema
+
+
+class ProductCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        # Увеличивается при каждой инвалидации товаров: ответ, запрошенный
+        # до неё, не кладётся в кеш (мог прийти до изменения товара)
+        self.generation = 0
+        self._entries: OrderedDict[int, tuple[float, ProductResponseSchema]] = (
+            OrderedDict()
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return settings.PRODUCT_CACHE_TTL > 0 and invalidation_bus.connected
+
+    def get(self, product_id: int) -> ProductResponseSchema | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(product_id)
+        if entry is None or time.monotonic() - entry[0] > settings.PRODUCT_CACHE_TTL:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, product: ProductResponseSchema, generation: int) -> None:
+        """Кладёт ответ, запрошенный при данном generation."""
+        if not self.enabled or generation != self.generation:
+            return
+        self._entries[product.id] = (time.monotonic(), product)
+        self._entries.move_to_end(product.id)
+        while len(self._entries) > settings.PRODUCT_CACHE_MAX_SIZE:
+            self._entries.popitem(last=False)
+
+    def on_invalidation(self, invalidation: Invalidation) -> None:
+        """Подписчик шины инвалидации: сбрасывает изменённые товары."""
+        if not invalidation.full and not invalidation.product_ids:
+            return
+        self.generation += 1
+        if invalidation.full:
+            self._entries.clear()
+            return
+        for product_id in invalidation.product_ids:
+            self._entries.pop(product_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+product_cache = ProductCache()
@@ -1,11 +1,18 @@
 import asyncio
+import time
 
 import httpx
 import structlog
 
 from src.config import settings
-from src.exceptions import NotFoundException, ServiceUnavailableException
+from src.context import remaining_time, request_timings
+from src.exceptions import (
+    DeadlineExceededException,
+    NotFoundException,
+    ServiceUnavailableException,
+)
 from src.schemas.product import ProductResponseSchema
+from src.services.product_cache import ProductCache
 
 logger = structlog.get_logger(__name__)
 
@@ -16,26 +23,75 @@ _RETRY_BACKOFF_BASE = 0.5  # секунды: 0.5 → 1.0 → 2.0
 
 
 class ProductClient:
-    """Клиент для запросов к internal API Product Service."""
+    """Клиент для запросов к internal API Product Service.
 
-    def __init__(self, client: httpx.AsyncClient) -> None:
+    С cache ответы get_product берутся из кеша процесса, пока он действителен
+    (см. ProductCache).
+    """
+
+    def __init__(
+        self, client: httpx.AsyncClient, cache: ProductCache | None = None
+    ) -> None:
         self._base_url = settings.PRODUCT_SERVICE_URL.rstrip("/")
         self.client = client
+        self.cache = cache
+
+    async def _get(self, url: str) -> httpx.Response:
+        """GET-запрос с учётом времени в счётчиках текущего HTTP-запроса.
+
+        Таймаут запроса не превышает остаток дедлайна входящего запроса.
+        """
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededException()
+
+        timeout = self.client.timeout
+        if remaining is not None:
+            timeout = httpx.Timeout(
+                min(remaining, timeout.read or remaining),
+                connect=min(remaining, timeout.connect or remaining),
+            )
+
+        started = time.perf_counter()
+        try:
+            return await self.client.get(url, timeout=timeout)
+        finally:
+            timings = request_timings.get()
+            if timings is not None:
+                timings.product_calls += 1
+                timings.product_time += time.perf_counter() - started
+
+    async def ping(self, timeout: float) -> bool:
+        """Проверка доступности Product Service (GET /health)."""
+        try:
+            response = await self.client.get(
+                f"{self._base_url}/health", timeout=timeout
+            )
+        except httpx.HTTPError:
+            return False
+        return response.is_success
 
     async def get_product(self, product_id: int) -> ProductResponseSchema:
         """
         Получить данные товара из Product Service.
 
         Запрашивает GET /internal/products/{product_id}.
-        При сетевых ошибках выполняет до 3 попыток с экспоненциальным backoff.
+        При сетевых ошибках выполняет до 3 попыток с экспоненциальным backoff;
+        попытки, не укладывающиеся в дедлайн запроса, не выполняются.
         Возвращает ProductResponseSchema.
         """
+        if self.cache is not None:
+            cached = self.cache.get(product_id)
+            if cached is not None:
+                return cached
+            generation = self.cache.generation
+
         url = f"{self._base_url}/internal/products/{product_id}"
         last_exc: Exception | None = None
 
         for attempt in range(1, _MAX_RETRIES + 1):
             try:
-                response = await self.client.get(url)
+                response = await self._get(url)
 
                 if response.status_code == httpx.codes.NOT_FOUND:
                     raise NotFoundException(
@@ -43,7 +99,10 @@ class ProductClient:
                     )
 
                 response.raise_for_status()
-                return ProductResponseSchema.model_validate(response.json())
+                product = ProductResponseSchema.model_validate(response.json())
+                if self.cache is not None:
+                    self.cache.put(product, generation)
+                return product
 
             except NotFoundException:
                 # 404 — детерминированная ошибка, ретрай бессмысленен
@@ -58,8 +117,15 @@ class ProductClient:
                     max_retries=_MAX_RETRIES,
                     error=str(exc),
                 )
-                if attempt < _MAX_RETRIES:
-                    await asyncio.sleep(_RETRY_BACKOFF_BASE * (2 ** (attempt - 1)))
+                if attempt == _MAX_RETRIES:
+                    break
+
+                backoff = _RETRY_BACKOFF_BASE * (2 ** (attempt - 1))
+                remaining = remaining_time()
+                if remaining is not None and remaining <= backoff:
+                    # Следующая попытка не успеет до дедлайна
+                    break
+                await asyncio.sleep(backoff)
 
             except httpx.HTTPStatusError as exc:
                 logger.error(
@@ -75,9 +141,30 @@ class ProductClient:
         logger.error(
             "product_service_unavailable",
             product_id=product_id,
-            attempts=_MAX_RETRIES,
+            attempts=attempt,
             error=str(last_exc),
         )
         raise ServiceUnavailableException(
             f"Product Service is temporarily unavailable: {last_exc}"
         )
+
+    async def get_products(
+        self, product_ids: list[int], concurrency: int
+    ) -> dict[int, ProductResponseSchema]:
+        """
+        Получить данные нескольких товаров с ограниченной конкурентностью.
+
+        Одновременно выполняется не больше concurrency запросов get_product.
+        Товары, не найденные в Product Service, в результат не попадают.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(product_id: int) -> ProductResponseSchema | None:
+            async with semaphore:
+                try:
+                    return await self.get_product(product_id)
+                except NotFoundException:
+                    return None
+
+        products = await asyncio.gather(*(fetch(pid) for pid in product_ids))
+        return {product.id: product for product in products if product is not None}
@@ -0,0 +1,68 @@
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.repositories.product_stats import ProductStatsRepository
+from src.schemas.internal import ProductStatsSchema
+
+logger = structlog.get_logger(__name__)
+
+
+_STATS_FIELDS = ("carts_count", "total_quantity", "selected_quantity")
+
+
+class ProductStatsService:
+    """Счётчики популярности товаров: в скольких корзинах лежит товар."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.repo = ProductStatsRepository(session)
+
+    async def get_stats(self, product_ids: list[int]) -> list[ProductStatsSchema]:
+        """Счётчики товаров в порядке product_ids; нет в корзинах — нули."""
+        stats = {row.product_id: row for row in await self.repo.get_many(product_ids)}
+        return [
+            ProductStatsSchema.model_validate(stats[product_id])
+            if product_id in stats
+            else ProductStatsSchema(product_id=product_id)
+            for product_id in product_ids
+        ]
+
+    async def reconcile(self, product_ids: list[int]) -> int:
+        """Сверяет счётчики пачки товаров с cart_items и архивом корзин.
+
+        Исправляет расхождения; возвращает количество исправленных счётчиков.
+        """
+        stored = {row.product_id: row for row in await self.repo.lock_many(product_ids)}
+        actual = {
+            row.product_id: row for row in await self.repo.compute_many(product_ids)
+        }
+
+        corrected = 0
+        missing = []
+        for product_id in product_ids:
+            row = actual.get(product_id)
+            expected = {
+                field: getattr(row, field) if row else 0 for field in _STATS_FIELDS
+            }
+
+            stats = stored.get(product_id)
+            if stats is None:
+                if row is not None:
+                    missing.append({"product_id": product_id, **expected})
+                continue
+
+            if any(getattr(stats, field) != expected[field] for field in _STATS_FIELDS):
+                logger.warning(
+                    "product_stats_drift",
+                    product_id=product_id,
+                    stored={field: getattr(stats, field) for field in _STATS_FIELDS},
+                    actual=expected,
+                )
+                for field, value in expected.items():
+                    setattr(stats, field, value)
+                corrected += 1
+
+        if missing:
+            await self.repo.insert_missing(missing)
+        await self.session.flush()
+        return corrected + len(missing)
@@ -0,0 +1,142 @@
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+
+import structlog
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.repositories.snapshot_sync import SnapshotSyncRepository
+from src.schemas.product import ProductResponseSchema
+from src.services.cart import CartService
+
+logger = structlog.get_logger(__name__)
+
+
+def diff_snapshots(
+    snapshots: Sequence[Row], product: ProductResponseSchema | None
+) -> list[str]:
+    """Какие webhook'и пропущены для товара, судя по его снапшотам в корзинах.
+
+    product None — товара больше нет в Product Service. Удалённые позиции
+    не сравниваются: webhook'а «товар снова доступен» нет.
+    """
+    active = [row for row in snapshots if not row.product_deleted]
+    if not active:
+        return []
+    if product is None:
+        return ["deleted"]
+
+    actions = []
+    image = product.images[0] if product.images else None
+    if any(
+        row.price != product.price
+        or row.product_name != product.title
+        or row.product_image != image
+        for row in active
+    ):
+        actions.append("updated")
+    if product.in_stock is False and not all(row.out_of_stock for row in active):
+        actions.append("out_of_stock")
+    if product.in_stock is True and any(row.out_of_stock for row in active):
+        actions.append("back_in_stock")
+    return actions
+
+
+def archived_actions(product: ProductResponseSchema | None) -> list[str]:
+    """Изменения для товара, который есть только в архивных корзинах.
+
+    Архивные снапшоты не читаются: текущее состояние товара записывается в
+    журнал архива и применяется при возврате корзины.
+    """
+    if product is None:
+        return ["deleted"]
+    actions = ["updated"]
+    if product.in_stock is False:
+        actions.append("out_of_stock")
+    elif product.in_stock is True:
+        actions.append("back_in_stock")
+    return actions
+
+
+class SnapshotSyncService:
+    """Сверка снапшотов товаров в корзинах с Product Service.
+
+    Расхождения исправляются теми же обработчиками, что и webhook'и
+    (CartService.handle_*), поэтому результат не отличается от доставленного
+    webhook'а: те же флаги, версии позиций, журнал архива и инвалидация.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.repo = SnapshotSyncRepository(session)
+        self.cart = CartService(session)
+
+    async def apply(
+        self,
+        product_ids: list[int],
+        products: dict[int, ProductResponseSchema],
+        last_changes: dict[int, int],
+    ) -> Counter[str]:
+        """Применяет пропущенные изменения пачки товаров и отмечает её сверенной.
+
+        products — ответ Product Service; товаров, которых в нём нет, больше
+        не существует. last_changes — последние записи журнала webhook'ов,
+        прочитанные до запроса в Product Service: товар, для которого после
+        них пришёл webhook, пропускается — ответ Product Service мог устареть. Webhook'и на время
+        применения пачки останавливаются. Возвращает число применённых
+        изменений по видам.
+        """
+        await self.repo.lock_webhooks()
+        current = await self.repo.get_last_changes(product_ids)
+        snapshots = defaultdict(list)
+        for row in await self.repo.get_snapshots(product_ids):
+            snapshots[row.product_id].append(row)
+
+        applied: Counter[str] = Counter()
+        for product_id in product_ids:
+            if current.get(product_id) != last_changes.get(product_id):
+                applied["skipped"] += 1
+                logger.info("snapshot_sync_skipped", product_id=product_id)
+                continue
+
+            product = products.get(product_id)
+            if not snapshots[product_id]:
+                for action in archived_actions(product):
+                    await self._apply_action(product_id, product, action)
+                applied["archived"] += 1
+                continue
+
+            for action in diff_snapshots(snapshots[product_id], product):
+                await self._apply_action(product_id, product, action)
+                applied[action] += 1
+                logger.info(
+                    "snapshot_drift_corrected", product_id=product_id, action=action
+                )
+
+        await self.repo.mark_checked(product_ids)
+        await self.session.commit()
+        return applied
+
+    async def _apply_action(
+        self, product_id: int, product: ProductResponseSchema | None, action: str
+    ) -> None:
+        """Изменение тем же обработчиком, что и webhook, без отдельного коммита."""
+        if action == "deleted":
+            await self.cart.handle_product_deleted(product_id, commit=False)
+        elif action == "updated":
+            await self.cart.handle_product_updated(
+                product_id,
+                new_price=product.price,
+                new_name=product.title,
+                new_image=product.images[0] if product.images else None,
+                commit=False,
+            )
+        elif action == "out_of_stock":
+            await self.cart.handle_out_of_stock(product_id, commit=False)
+        else:
+            await self.cart.handle_back_in_stock(product_id, commit=False)
+
+    async def prune(self) -> int:
+        pruned = await self.repo.prune()
+        await self.session.commit()
+        return pruned
@@ -0,0 +1,284 @@
+"""Сравнение хранилищ корзин: `python -m src.storage_benchmark`.
+
+Для каждого хранилища (rows, document) создаёт синтетические корзины в
+настроенной БД, прогоняет смеси операций через CartService и пишет в лог
+пропускную способность и перцентили задержек по каждой операции, затем
+удаляет свои данные. Товары берутся из диапазона ID от --product-base, чтобы
+не пересекаться с настоящими. Пример:
+
+    python -m src.storage_benchmark --carts 5000 --items 10 --products 200
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from datetime import UTC, datetime
+
+import uvloop
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from src.db.database import async_session_maker
+from src.db.models import (
+    CartActivityModel,
+    CartArchiveChangeModel,
+    CartDocumentModel,
+    CartDocumentProductModel,
+    CartItemModel,
+)
+from src.logger import get_logger, setup_logging
+from src.repositories.cart import item_to_document
+from src.repositories.storage import get_cart_storage
+from src.services.cart import CartService
+
+setup_logging()
+logger = get_logger(__name__)
+
+
+BACKENDS = ("rows", "document")
+
+# Доли операций: чтение корзины, изменение позиции, webhook «товар обновлён»
+MIXES: dict[str, dict[str, float]] = {
+    "read-heavy": {"read": 0.90, "update": 0.08, "webhook": 0.02},
+    "webhook-heavy": {"read": 0.40, "update": 0.10, "webhook": 0.50},
+}
+
+_SEED_CHUNK = 1000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Сравнение хранилищ корзин")
+    parser.add_argument("--carts", type=int, default=2000, help="Корзин")
+    parser.add_argument("--items", type=int, default=8, help="Позиций в корзине")
+    parser.add_argument(
+        "--products",
+        type=int,
+        default=500,
+        help="Различных товаров (меньше — больше корзин на один webhook)",
+    )
+    parser.add_argument(
+        "--operations", type=int, default=5000, help="Операций в каждой смеси"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=10, help="Одновременных операций"
+    )
+    parser.add_argument(
+        "--backend", choices=BACKENDS, action="append", help="Только эти хранилища"
+    )
+    parser.add_argument(
+        "--mix", choices=list(MIXES), action="append", help="Только эти смеси"
+    )
+    parser.add_argument(
+        "--product-base",
+        type=int,
+        default=900_000_000,
+        help="Первый ID синтетических товаров",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора")
+    return parser.parse_args()
+
+
+def _generate_carts(
+    args: argparse.Namespace, rng: random.Random
+) -> dict[uuid.UUID, list[CartItemModel]]:
+    now = datetime.now(UTC)
+    products = range(args.product_base, args.product_base + args.products)
+    carts = {}
+    for _ in range(args.carts):
+        user_id = uuid.uuid4()
+        carts[user_id] = [
+            CartItemModel(
+                id=uuid.uuid4(),
+                user_id=user_id,
+                product_id=product_id,
+                quantity=rng.randint(1, 3),
+                product_name=f"Benchmark product {product_id}",
+                product_price=rng.randint(100, 100_000) * 100,
+                product_image=None,
+                price_changed=False,
+                current_price=None,
+                out_of_stock=False,
+                is_selected=True,
+                product_deleted=False,
+                version=1,
+                created_at=now,
+                updated_at=now,
+            )
+            for product_id in rng.sample(products, min(args.items, args.products))
+        ]
+    return carts
+
+
+async def _seed(backend: str, carts: dict[uuid.UUID, list[CartItemModel]]) -> None:
+    """Массовая вставка корзин в формате хранилища."""
+    users = list(carts)
+    async with async_session_maker() as session:
+        for start in range(0, len(users), _SEED_CHUNK):
+            chunk = users[start : start + _SEED_CHUNK]
+            if backend == "rows":
+                await session.execute(
+                    insert(CartItemModel),
+                    [
+                        {
+                            column.key: getattr(item, column.key)
+                            for column in CartItemModel.__table__.columns
+                        }
+                        for user_id in chunk
+                        for item in carts[user_id]
+                    ],
+                )
+                continue
+
+            await session.execute(
+                insert(CartDocumentModel),
+                [
+                    {
+                        "user_id": user_id,
+                        "items": [item_to_document(item) for item in carts[user_id]],
+                        "total_price": sum(
+                            item.product_price * item.quantity
+                            for item in carts[user_id]
+                        ),
+                        "total_items": sum(item.quantity for item in carts[user_id]),
+                    }
+                    for user_id in chunk
+                ],
+            )
+            await session.execute(
+                insert(CartDocumentProductModel),
+                [
+                    {"product_id": item.product_id, "user_id": user_id}
+                    for user_id in chunk
+                    for item in carts[user_id]
+                ],
+            )
+        await session.commit()
+
+
+async def _cleanup(args: argparse.Namespace, users: list[uuid.UUID]) -> None:
+    """Удаляет синтетические корзины, отметки активности и журнал архива."""
+    async with async_session_maker() as session:
+        for start in range(0, len(users), _SEED_CHUNK):
+            chunk = users[start : start + _SEED_CHUNK]
+            for model in (CartItemModel, CartDocumentModel, CartActivityModel):
+                await session.execute(delete(model).where(model.user_id.in_(chunk)))
+        await session.execute(
+            delete(CartDocumentProductModel).where(
+                CartDocumentProductModel.product_id >= args.product_base
+            )
+        )
+        await session.execute(
+            delete(CartArchiveChangeModel).where(
+                CartArchiveChangeModel.product_id >= args.product_base
+            )
+        )
+        await session.commit()
+
+
+async def _operation(
+    backend: str,
+    name: str,
+    carts: dict[uuid.UUID, list[CartItemModel]],
+    users: list[uuid.UUID],
+    args: argparse.Namespace,
+    rng: random.Random,
+) -> None:
+    async with async_session_maker() as session:
+        service = CartService(session, storage=get_cart_storage(session, backend))
+        if name == "webhook":
+            product_id = args.product_base + rng.randrange(args.products)
+            await service.handle_product_updated(
+                product_id,
+                new_price=rng.randint(100, 100_000) * 100,
+                new_name=f"Benchmark product {product_id}",
+                new_image=None,
+            )
+            return
+
+        user_id = rng.choice(users)
+        if name == "read":
+            await service.get_cart(user_id)
+            return
+
+        item = rng.choice(carts[user_id])
+        await service.update_quantity(
+            user_id, item.id, rng.randint(1, 5), return_cart=True
+        )
+
+
+async def _run_mix(
+    backend: str,
+    mix: str,
+    carts: dict[uuid.UUID, list[CartItemModel]],
+    args: argparse.Namespace,
+    rng: random.Random,
+) -> None:
+    users = list(carts)
+    names = list(MIXES[mix])
+    queue = rng.choices(names, weights=list(MIXES[mix].values()), k=args.operations)
+    latencies: dict[str, list[float]] = defaultdict(list)
+
+    async def worker() -> None:
+        while queue:
+            name = queue.pop()
+            started = time.perf_counter()
+            await _operation(backend, name, carts, users, args, rng)
+            latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    logger.info(
+        "storage_benchmark_mix_completed",
+        backend=backend,
+        mix=mix,
+        operations=args.operations,
+        ops_per_second=round(args.operations / elapsed),
+    )
+    for name, values in latencies.items():
+        percentiles = (
+            statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+        )
+        logger.info(
+            "storage_benchmark_result",
+            backend=backend,
+            mix=mix,
+            operation=name,
+            count=len(values),
+            p50_ms=round(percentiles[49] * 1000, 2),
+            p95_ms=round(percentiles[94] * 1000, 2),
+            p99_ms=round(percentiles[98] * 1000, 2),
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    for backend in args.backend or BACKENDS:
+        for mix in args.mix or list(MIXES):
+            # Каждая смесь — на свежих данных: webhook'и предыдущей меняют цены
+            carts = _generate_carts(args, rng)
+            try:
+                await _seed(backend, carts)
+                logger.info(
+                    "storage_benchmark_seeded",
+                    backend=backend,
+                    carts=args.carts,
+                    items=args.carts * args.items,
+                    carts_per_product=round(args.carts * args.items / args.products),
+                )
+                await _run_mix(backend, mix, carts, args, rng)
+            finally:
+                await _cleanup(args, list(carts))
+
+
+def main() -> None:
+    uvloop.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
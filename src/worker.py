@@ -0,0 +1,62 @@
+"""Отдельный процесс RabbitMQ-консьюмера: `python -m src.worker`.
+
+Масштабируется независимо от API: HTTP-процессы при этом запускаются
+с API_ONLY=True и не подписываются на очереди. Здесь же выполняются
+периодические фоновые задачи (src.jobs).
+"""
+
+import asyncio
+import signal
+
+import uvloop
+
+from src.config import settings
+from src.jobs.cart_archive import run_cart_archiving
+from src.jobs.product_stats import run_product_stats_reconciliation
+from src.jobs.snapshot_sync import run_snapshot_sync
+from src.logger import get_logger, setup_logging
+from src.messaging.broker import broker, connect_broker
+from src.messaging.consumer import router as messaging_router
+
+setup_logging()
+logger = get_logger(__name__)
+
+broker.include_router(messaging_router)
+
+
+async def run() -> None:
+    """Подключает консьюмеры, запускает фоновые задачи и работает до SIGINT/SIGTERM."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await connect_broker()
+    # Задачи работают с cart_items: с CART_STORAGE_BACKEND=document они
+    # выключены (см. Settings.check_storage_backend)
+    jobs = []
+    if settings.PRODUCT_STATS_ENABLED:
+        jobs.append(asyncio.create_task(run_product_stats_reconciliation()))
+    if settings.CART_STORAGE_BACKEND == "rows":
+        jobs.append(asyncio.create_task(run_cart_archiving()))
+    if settings.SNAPSHOT_SYNC_ENABLED:
+        jobs.append(asyncio.create_task(run_snapshot_sync()))
+    logger.info("worker_started")
+
+    try:
+        await stop_event.wait()
+    finally:
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        # close() ждёт обработки полученных сообщений (graceful_timeout брокера)
+        await broker.close()
+        logger.info("worker_stopped")
+
+
+def main() -> None:
+    uvloop.run(run())
+
+
+if __name__ == "__main__":
+    main()